@@ -8,6 +8,7 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, date
+from itertools import chain
 import sys
 import os
 
@@ -27,7 +28,7 @@ st.write(data)
 # Ajouter le répertoire src au path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from src.db_connection import db
+from src.db_connection import db, CACHE_TTL_SECONDES
 
 # Configuration de la page
 st.set_page_config(
@@ -102,16 +103,10 @@ def show_login():
         
         elif role == "Professeur":
             # Recherche de professeur
-            search = st.text_input("🔍 Rechercher par nom ou prénom")
+            search = st.text_input("🔍 Rechercher par nom, prénom ou matricule")
             
             if search and len(search) >= 3:
-                profs = db.execute_to_dataframe("""
-                    SELECT p.id, p.matricule, p.nom, p.prenom, d.nom as departement
-                    FROM professeurs p
-                    JOIN departements d ON p.dept_id = d.id
-                    WHERE p.nom ILIKE %s OR p.prenom ILIKE %s
-                    LIMIT 10
-                """, (f"%{search}%", f"%{search}%"))
+                profs = db.search('professeur', search, limit=10)
                 
                 if not profs.empty:
                     prof_options = [
@@ -160,6 +155,29 @@ def show_student_interface():
     
     st.markdown('<div class="main-header">📅 Emplois du Temps des Examens</div>', unsafe_allow_html=True)
     
+    # Emploi du temps personnel (projection publiée, une lecture indexée)
+    st.markdown("### 🎫 Mon emploi du temps")
+    matricule = st.text_input("Matricule", placeholder="Ex: E2024000123")
+    
+    if matricule:
+        my_schedule = db.get_schedule_by_matricule(matricule, st.session_state.session_exam_id)
+        
+        if my_schedule.empty:
+            st.info("🔭 Aucun examen publié pour ce matricule")
+        else:
+            my_display = my_schedule.copy()
+            my_display['Date'] = pd.to_datetime(my_display['date_examen']).dt.strftime('%d/%m/%Y')
+            my_display['Heure'] = my_display['heure_debut'].astype(str)
+            my_display['Durée'] = my_display['duree_minutes'].astype(str) + ' min'
+            
+            st.dataframe(
+                my_display[['Date', 'Heure', 'Durée', 'code_module', 'nom_module', 'lieu', 'surveillant']],
+                use_container_width=True,
+                hide_index=True
+            )
+    
+    st.markdown("---")
+    
     st.markdown("### 🔍 Filtrer les examens")
     
     # Filtres
@@ -177,7 +195,7 @@ def show_student_interface():
             formations = db.get_formations_by_department(dept_id)
             formation_options = ["Toutes"] + formations['nom'].tolist()
         else:
-            formations = db.execute_to_dataframe("SELECT DISTINCT nom FROM formations ORDER BY nom")
+            formations = db.execute_to_dataframe("SELECT DISTINCT nom FROM formations ORDER BY nom", ttl=CACHE_TTL_SECONDES)
             formation_options = ["Toutes"] + formations['nom'].tolist()
         
         selected_formation = st.selectbox("Formation", formation_options)
@@ -188,7 +206,7 @@ def show_student_interface():
             FROM examens 
             WHERE session_id = 1 
             ORDER BY date_examen
-        """)
+        """, ttl=CACHE_TTL_SECONDES)
         date_options = ["Toutes"] + [d.strftime('%d/%m/%Y') for d in dates['date_examen']]
         selected_date = st.selectbox("Date", date_options)
     
@@ -229,49 +247,69 @@ def show_student_interface():
     
     query += " ORDER BY e.date_examen, e.heure_debut"
     
-    schedule = db.execute_to_dataframe(query, tuple(params) if params else None)
+    # Lecture par blocs: les premières lignes s'affichent avant la fin du chargement
+    chunks = db.iter_dataframes(query, tuple(params) if params else None, chunk_rows=500)
+    first_chunk = next(chunks, None)
     
-    if schedule.empty:
+    if first_chunk is None:
         st.info("🔭 Aucun examen trouvé avec ces critères")
     else:
-        # Statistiques
+        # Statistiques (mises à jour à chaque bloc reçu)
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("📚 Nombre d'examens", len(schedule))
+            metric_examens = st.empty()
         with col2:
-            dates_uniques = schedule['date_examen'].nunique()
-            st.metric("📅 Jours d'examens", dates_uniques)
+            metric_jours = st.empty()
         with col3:
-            formations_uniques = schedule['formation'].nunique()
-            st.metric("🎓 Formations", formations_uniques)
+            metric_formations = st.empty()
         
         st.markdown("---")
         
-        # Tableau du planning
+        # Tableau du planning: chaque bloc est ajouté au tableau affiché (add_rows)
         st.markdown("### 📋 Planning détaillé")
+        colonnes = ['Date', 'Heure', 'Durée', 'code_module', 'nom_module',
+                    'formation', 'departement', 'lieu', 'surveillant']
+        table = None
         
-        display_schedule = schedule.copy()
-        display_schedule['Date'] = pd.to_datetime(display_schedule['date_examen']).dt.strftime('%d/%m/%Y')
-        display_schedule['Heure'] = display_schedule['heure_debut'].astype(str)
-        display_schedule['Durée'] = display_schedule['duree_minutes'].astype(str) + ' min'
-        
-        st.dataframe(
-            display_schedule[['Date', 'Heure', 'Durée', 'code_module', 'nom_module', 
-                            'formation', 'departement', 'lieu', 'surveillant']],
-            use_container_width=True,
-            hide_index=True
-        )
+        # Seuls des compteurs sont conservés entre les blocs (pas les lignes)
+        nb_examens = 0
+        jours, formations = set(), set()
+        calendrier = {}  # (date, formation, département) -> nombre d'examens
+        for chunk in chain([first_chunk], chunks):
+            display_chunk = chunk.copy()
+            display_chunk['Date'] = pd.to_datetime(display_chunk['date_examen']).dt.strftime('%d/%m/%Y')
+            display_chunk['Heure'] = display_chunk['heure_debut'].astype(str)
+            display_chunk['Durée'] = display_chunk['duree_minutes'].astype(str) + ' min'
+            
+            if table is None:
+                table = st.dataframe(display_chunk[colonnes], use_container_width=True, hide_index=True)
+            else:
+                table.add_rows(display_chunk[colonnes])
+            
+            nb_examens += len(chunk)
+            jours.update(chunk['date_examen'].unique())
+            formations.update(chunk['formation'].unique())
+            for cle, n in chunk.groupby(['date_examen', 'formation', 'departement']).size().items():
+                calendrier[cle] = calendrier.get(cle, 0) + int(n)
+            
+            metric_examens.metric("📚 Nombre d'examens", nb_examens)
+            metric_jours.metric("📅 Jours d'examens", len(jours))
+            metric_formations.metric("🎓 Formations", len(formations))
         
         # Vue calendrier
         st.markdown("### 📆 Vue Calendrier")
         
+        repartition = pd.DataFrame(
+            [(*cle, n) for cle, n in calendrier.items()],
+            columns=['date_examen', 'formation', 'departement', 'nb_examens']
+        )
         fig = px.timeline(
-            schedule,
+            repartition,
             x_start='date_examen',
             x_end='date_examen',
             y='formation',
             color='departement',
-            hover_data=['code_module', 'lieu', 'heure_debut'],
+            hover_data=['nb_examens'],
             title="Répartition des examens"
         )
         st.plotly_chart(fig, use_container_width=True)
@@ -364,7 +402,7 @@ def main():
             
             # Afficher quelques statistiques globales (selon le rôle)
             try:
-                kpis = db.get_global_kpis()
+                kpis = db.get_global_kpis(st.session_state.session_exam_id)
                 
                 st.markdown("### 📊 Vue d'ensemble")
                 
@@ -3,11 +3,19 @@
 -- =====================================================
 
 -- Supprimer les tables existantes (pour réinitialisation)
+DROP VIEW IF EXISTS vue_kpis_globaux;
+DROP TABLE IF EXISTS prof_daily_load CASCADE;
+DROP TABLE IF EXISTS emplois_du_temps_etudiants CASCADE;
+DROP TABLE IF EXISTS kpis_session_departement CASCADE;
+DROP TABLE IF EXISTS optimizer_runs CASCADE;
+DROP TABLE IF EXISTS plans_candidats_examens CASCADE;
+DROP TABLE IF EXISTS plans_candidats CASCADE;
 DROP TABLE IF EXISTS conflits_detectes CASCADE;
 DROP TABLE IF EXISTS examens CASCADE;
 DROP TABLE IF EXISTS inscriptions CASCADE;
 DROP TABLE IF EXISTS enseignements CASCADE;
 DROP TABLE IF EXISTS professeurs CASCADE;
+DROP TABLE IF EXISTS fermetures_lieux CASCADE;
 DROP TABLE IF EXISTS lieux_examen CASCADE;
 DROP TABLE IF EXISTS modules CASCADE;
 DROP TABLE IF EXISTS etudiants CASCADE;
@@ -15,6 +23,12 @@ DROP TABLE IF EXISTS formations CASCADE;
 DROP TABLE IF EXISTS departements CASCADE;
 DROP TABLE IF EXISTS sessions_examen CASCADE;
 
+-- Recherche par similarité (index trigrammes)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Égalité sur les entiers dans les index GiST (contraintes d'exclusion)
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
 -- =====================================================
 -- TABLE: sessions_examen
 -- Périodes d'examens (semestre 1, semestre 2, rattrapage)
@@ -77,7 +91,8 @@ CREATE TABLE etudiants (
 
 CREATE INDEX idx_etudiants_formation ON etudiants(formation_id);
 CREATE INDEX idx_etudiants_promo ON etudiants(promo);
-CREATE INDEX idx_etudiants_matricule ON etudiants(matricule);
+CREATE INDEX idx_etudiants_matricule ON etudiants(matricule text_pattern_ops); -- Recherche par préfixe
+CREATE INDEX idx_etudiants_nom_trgm ON etudiants USING GIN ((nom || ' ' || prenom) gin_trgm_ops);
 
 -- =====================================================
 -- TABLE: modules
@@ -97,6 +112,8 @@ CREATE TABLE modules (
 
 CREATE INDEX idx_modules_formation ON modules(formation_id);
 CREATE INDEX idx_modules_semestre ON modules(semestre);
+CREATE INDEX idx_modules_code ON modules(code text_pattern_ops);
+CREATE INDEX idx_modules_nom_trgm ON modules USING GIN (nom gin_trgm_ops);
 
 -- =====================================================
 -- TABLE: professeurs
@@ -117,6 +134,8 @@ CREATE TABLE professeurs (
 );
 
 CREATE INDEX idx_professeurs_dept ON professeurs(dept_id);
+CREATE INDEX idx_professeurs_matricule ON professeurs(matricule text_pattern_ops);
+CREATE INDEX idx_professeurs_nom_trgm ON professeurs USING GIN ((nom || ' ' || prenom) gin_trgm_ops);
 
 -- =====================================================
 -- TABLE: enseignements
@@ -154,31 +173,47 @@ CREATE TABLE lieux_examen (
 CREATE INDEX idx_lieux_type ON lieux_examen(type);
 CREATE INDEX idx_lieux_capacite ON lieux_examen(capacite_examen);
 
+-- =====================================================
+-- TABLE: fermetures_lieux
+-- Fermetures temporaires (la salle reste disponible hors de la période)
+-- =====================================================
+CREATE TABLE fermetures_lieux (
+    id SERIAL PRIMARY KEY,
+    lieu_id INT NOT NULL REFERENCES lieux_examen(id) ON DELETE CASCADE,
+    periode DATERANGE NOT NULL, -- bornes incluses, NULL = sans limite
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX idx_fermetures_lieu ON fermetures_lieux USING gist (lieu_id, periode);
+
 -- =====================================================
 -- TABLE: inscriptions
 -- ~130,000 inscriptions (étudiants x modules)
+-- Partitionnée par session (voir creer_partitions_session)
 -- =====================================================
 CREATE TABLE inscriptions (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     etudiant_id INT NOT NULL REFERENCES etudiants(id) ON DELETE CASCADE,
     module_id INT NOT NULL REFERENCES modules(id) ON DELETE CASCADE,
     session_id INT NOT NULL REFERENCES sessions_examen(id) ON DELETE CASCADE,
     annee_universitaire VARCHAR(10) NOT NULL,
     note DECIMAL(5,2),
     statut VARCHAR(20) DEFAULT 'inscrit', -- inscrit, validé, ajourné
+    PRIMARY KEY (id, session_id),
     UNIQUE(etudiant_id, module_id, session_id)
-);
+) PARTITION BY LIST (session_id);
 
+-- Index créés sur chaque partition (le filtre sur la session est fait par l'élagage)
 CREATE INDEX idx_inscriptions_etudiant ON inscriptions(etudiant_id);
 CREATE INDEX idx_inscriptions_module ON inscriptions(module_id);
-CREATE INDEX idx_inscriptions_session ON inscriptions(session_id);
 
 -- =====================================================
 -- TABLE: examens
 -- Planning des examens
+-- Partitionnée par session (voir creer_partitions_session)
 -- =====================================================
 CREATE TABLE examens (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     module_id INT NOT NULL REFERENCES modules(id) ON DELETE CASCADE,
     session_id INT NOT NULL REFERENCES sessions_examen(id) ON DELETE CASCADE,
     prof_surveillant_id INT REFERENCES professeurs(id) ON DELETE SET NULL,
@@ -189,15 +224,22 @@ CREATE TABLE examens (
     nb_inscrits INT DEFAULT 0,
     statut VARCHAR(20) DEFAULT 'planifie', -- planifie, confirme, termine, annule
     observations TEXT,
+    -- Plage [début, fin) de l'examen, indexable pour les recherches de chevauchement (&&)
+    creneau TSRANGE GENERATED ALWAYS AS (
+        tsrange(date_examen + heure_debut,
+                date_examen + heure_debut + COALESCE(duree_minutes, 90) * INTERVAL '1 minute')
+    ) STORED,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, session_id)
+    -- Contraintes d'exclusion (double réservation) posées sur chaque partition
+) PARTITION BY LIST (session_id);
 
 CREATE INDEX idx_examens_date ON examens(date_examen);
 CREATE INDEX idx_examens_module ON examens(module_id);
-CREATE INDEX idx_examens_session ON examens(session_id);
 CREATE INDEX idx_examens_prof ON examens(prof_surveillant_id, date_examen);
 CREATE INDEX idx_examens_lieu ON examens(lieu_id, date_examen, heure_debut);
+CREATE INDEX idx_examens_creneau ON examens USING gist (creneau);
 
 -- =====================================================
 -- TABLE: conflits_detectes
@@ -205,18 +247,142 @@ CREATE INDEX idx_examens_lieu ON examens(lieu_id, date_examen, heure_debut);
 -- =====================================================
 CREATE TABLE conflits_detectes (
     id SERIAL PRIMARY KEY,
-    examen_id INT NOT NULL REFERENCES examens(id) ON DELETE CASCADE,
+    examen_id INT, -- NULL une fois l'examen supprimé (historique conservé)
+    session_id INT NOT NULL REFERENCES sessions_examen(id) ON DELETE CASCADE,
+    module_id INT NOT NULL REFERENCES modules(id) ON DELETE CASCADE,
+    cle VARCHAR(100) NOT NULL UNIQUE, -- type:session:module:jour:début:salle (stable d'une génération à l'autre)
     type_conflit VARCHAR(50) NOT NULL,
     description TEXT NOT NULL,
     severite INT DEFAULT 1 CHECK (severite BETWEEN 1 AND 5),
     resolu BOOLEAN DEFAULT FALSE,
     date_detection TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    date_resolution TIMESTAMP
+    date_resolution TIMESTAMP,
+    FOREIGN KEY (examen_id, session_id) REFERENCES examens(id, session_id) ON DELETE SET NULL (examen_id) -- PostgreSQL 15+
 );
 
-CREATE INDEX idx_conflits_examen ON conflits_detectes(examen_id);
+CREATE INDEX idx_conflits_examen ON conflits_detectes(examen_id, session_id);
+CREATE INDEX idx_conflits_session ON conflits_detectes(session_id, resolu);
+CREATE INDEX idx_conflits_module ON conflits_detectes(module_id);
 CREATE INDEX idx_conflits_type ON conflits_detectes(type_conflit);
 CREATE INDEX idx_conflits_resolu ON conflits_detectes(resolu);
+CREATE INDEX idx_conflits_ouverts ON conflits_detectes(examen_id, severite) WHERE resolu = FALSE;
+
+-- =====================================================
+-- TABLE: plans_candidats
+-- Versions améliorées du planning publié (amélioration continue)
+-- =====================================================
+CREATE TABLE plans_candidats (
+    id SERIAL PRIMARY KEY,
+    session_id INT NOT NULL REFERENCES sessions_examen(id) ON DELETE CASCADE,
+    objectif DOUBLE PRECISION NOT NULL,
+    delta_objectif DOUBLE PRECISION NOT NULL, -- Gain par rapport à la version précédente
+    voisinage VARCHAR(100), -- departement:ID, jour:N, salle:NOM
+    empreinte_plan VARCHAR(32) NOT NULL, -- Planning publié sur lequel le candidat a été calculé
+    statut VARCHAR(20) DEFAULT 'candidat', -- candidat, applique, obsolete
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX idx_plans_candidats_session ON plans_candidats(session_id, statut);
+
+CREATE TABLE plans_candidats_examens (
+    plan_id INT NOT NULL REFERENCES plans_candidats(id) ON DELETE CASCADE,
+    module_id INT NOT NULL REFERENCES modules(id) ON DELETE CASCADE,
+    date_examen DATE NOT NULL,
+    heure_debut TIME NOT NULL,
+    lieu_id INT REFERENCES lieux_examen(id) ON DELETE SET NULL,
+    prof_surveillant_id INT REFERENCES professeurs(id) ON DELETE SET NULL,
+    PRIMARY KEY (plan_id, module_id)
+);
+
+-- =====================================================
+-- TABLE: optimizer_runs
+-- Télémétrie de chaque exécution de l'optimiseur
+-- =====================================================
+CREATE TABLE optimizer_runs (
+    id SERIAL PRIMARY KEY,
+    session_id INT REFERENCES sessions_examen(id) ON DELETE CASCADE,
+    mode VARCHAR(20) NOT NULL, -- generation, souple, amelioration
+    statut VARCHAR(20) NOT NULL, -- OPTIMAL, FEASIBLE, INFEASIBLE, UNKNOWN, ERREUR, NON_LANCE
+    raison_arret VARCHAR(30), -- optimal, ecart_optimalite, stagnation, limite_temps
+    erreur TEXT,
+    nb_modules INT,
+    nb_inscriptions INT,
+    nb_lieux INT,
+    nb_professeurs INT,
+    nb_variables INT,
+    nb_contraintes INT,
+    temps_etapes JSONB, -- {chargement, variables, contraintes, objectif, resolution, sauvegarde}
+    temps_resolution DOUBLE PRECISION,
+    temps_total DOUBLE PRECISION,
+    nb_branches BIGINT,
+    nb_conflits BIGINT,
+    objectif DOUBLE PRECISION,
+    borne DOUBLE PRECISION,
+    parametres JSONB,
+    empreinte_donnees VARCHAR(64), -- SHA-256 des données d'entrée
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX idx_optimizer_runs_date ON optimizer_runs(created_at);
+CREATE INDEX idx_optimizer_runs_session ON optimizer_runs(session_id, created_at);
+
+-- =====================================================
+-- TABLE: kpis_session_departement
+-- KPIs pré-agrégés par session et département (voir rafraichir_kpis)
+-- =====================================================
+CREATE TABLE kpis_session_departement (
+    session_id INT NOT NULL REFERENCES sessions_examen(id) ON DELETE CASCADE,
+    dept_id INT NOT NULL REFERENCES departements(id) ON DELETE CASCADE,
+    nb_examens_planifies INT NOT NULL DEFAULT 0,
+    nb_modules_total INT NOT NULL DEFAULT 0,
+    nb_etudiants INT NOT NULL DEFAULT 0,
+    total_inscriptions INT NOT NULL DEFAULT 0,
+    nb_lieux_utilises INT NOT NULL DEFAULT 0,
+    capacite_moyenne_lieux NUMERIC(10, 2),
+    nb_conflits_non_resolus INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (session_id, dept_id)
+);
+
+-- =====================================================
+-- TABLE: emplois_du_temps_etudiants
+-- Emploi du temps de chaque étudiant, projeté à la publication du planning
+-- (voir publier_emplois_du_temps)
+-- =====================================================
+CREATE TABLE emplois_du_temps_etudiants (
+    etudiant_id INT NOT NULL REFERENCES etudiants(id) ON DELETE CASCADE,
+    session_id INT NOT NULL REFERENCES sessions_examen(id) ON DELETE CASCADE,
+    module_id INT NOT NULL REFERENCES modules(id) ON DELETE CASCADE,
+    matricule VARCHAR(20) NOT NULL,
+    date_examen DATE NOT NULL,
+    heure_debut TIME NOT NULL,
+    duree_minutes INT,
+    code_module VARCHAR(20) NOT NULL,
+    nom_module VARCHAR(200) NOT NULL,
+    lieu VARCHAR(100),
+    type_lieu VARCHAR(50),
+    surveillant TEXT,
+    PRIMARY KEY (etudiant_id, session_id, module_id)
+);
+
+CREATE INDEX idx_edt_matricule ON emplois_du_temps_etudiants(matricule, session_id);
+CREATE INDEX idx_edt_session_module ON emplois_du_temps_etudiants(session_id, module_id);
+
+-- =====================================================
+-- TABLE: prof_daily_load
+-- Surveillances par professeur et par jour, tenues à jour par les triggers
+-- de examens (voir maj_charge_surveillants)
+-- =====================================================
+CREATE TABLE prof_daily_load (
+    prof_id INT NOT NULL REFERENCES professeurs(id) ON DELETE CASCADE,
+    session_id INT NOT NULL REFERENCES sessions_examen(id) ON DELETE CASCADE,
+    date_examen DATE NOT NULL,
+    nb INT NOT NULL CHECK (nb > 0),
+    PRIMARY KEY (prof_id, session_id, date_examen)
+);
+
+CREATE INDEX idx_charge_date ON prof_daily_load(date_examen, prof_id);
+CREATE INDEX idx_charge_session ON prof_daily_load(session_id, prof_id);
 
 -- =====================================================
 -- VUES ANALYTIQUES
@@ -248,26 +414,6 @@ LEFT JOIN lieux_examen l ON e.lieu_id = l.id
 LEFT JOIN professeurs p ON e.prof_surveillant_id = p.id
 JOIN sessions_examen s ON e.session_id = s.id;
 
--- Vue: KPIs globaux pour le vice-doyen
-CREATE OR REPLACE VIEW vue_kpis_globaux AS
-SELECT 
-    d.nom as departement,
-    COUNT(DISTINCT e.id) as nb_examens_planifies,
-    COUNT(DISTINCT m.id) as nb_modules_total,
-    COUNT(DISTINCT et.id) as nb_etudiants,
-    SUM(e.nb_inscrits) as total_inscriptions,
-    COUNT(DISTINCT l.id) as nb_lieux_utilises,
-    AVG(l.capacite_examen) as capacite_moyenne_lieux,
-    COUNT(DISTINCT CASE WHEN c.resolu = FALSE THEN c.id END) as nb_conflits_non_resolus
-FROM departements d
-LEFT JOIN formations f ON f.dept_id = d.id
-LEFT JOIN modules m ON m.formation_id = f.id
-LEFT JOIN examens e ON e.module_id = m.id
-LEFT JOIN lieux_examen l ON e.lieu_id = l.id
-LEFT JOIN etudiants et ON et.formation_id = f.id
-LEFT JOIN conflits_detectes c ON c.examen_id = e.id
-GROUP BY d.id, d.nom;
-
 -- Vue: Occupation des salles par jour
 CREATE OR REPLACE VIEW vue_occupation_salles AS
 SELECT 
@@ -303,9 +449,10 @@ BEGIN
         COUNT(DISTINCT e.id) as nb_examens,
         STRING_AGG(m.code, ', ') as liste_modules
     FROM inscriptions i
-    JOIN examens e ON i.module_id = e.module_id
+    JOIN examens e ON i.module_id = e.module_id AND i.session_id = e.session_id
     JOIN modules m ON e.module_id = m.id
     WHERE e.session_id = session_exam_id
+      AND i.session_id = session_exam_id
     GROUP BY i.etudiant_id, e.date_examen
     HAVING COUNT(DISTINCT e.id) > 1;
 END;
@@ -359,6 +506,199 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+-- =====================================================
+-- AGRÉGATS KPI PAR SESSION
+-- =====================================================
+
+-- Fonction: Recalculer les KPIs d'une session (tous les départements ou un seul)
+-- Chaque indicateur vient d'une sous-requête agrégée indépendante: pas
+-- d'explosion étudiants x examens ni de COUNT(DISTINCT) pour la corriger
+CREATE OR REPLACE FUNCTION rafraichir_kpis(p_session_id INT, p_dept_id INT DEFAULT NULL)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO kpis_session_departement (
+        session_id, dept_id, nb_examens_planifies, nb_modules_total, nb_etudiants,
+        total_inscriptions, nb_lieux_utilises, capacite_moyenne_lieux,
+        nb_conflits_non_resolus, updated_at
+    )
+    SELECT 
+        p_session_id,
+        d.id,
+        COALESCE(ex.nb_examens, 0),
+        COALESCE(mo.nb_modules, 0),
+        COALESCE(et.nb_etudiants, 0),
+        COALESCE(ex.total_inscriptions, 0),
+        COALESCE(ex.nb_lieux, 0),
+        ex.capacite_moyenne,
+        COALESCE(co.nb_conflits, 0),
+        CURRENT_TIMESTAMP
+    FROM departements d
+    LEFT JOIN (
+        -- Modules et étudiants de la session: ceux qui y ont des inscriptions
+        SELECT f.dept_id, COUNT(DISTINCT i.module_id) as nb_modules
+        FROM inscriptions i
+        JOIN modules m ON i.module_id = m.id
+        JOIN formations f ON m.formation_id = f.id
+        WHERE i.session_id = p_session_id
+        GROUP BY f.dept_id
+    ) mo ON mo.dept_id = d.id
+    LEFT JOIN (
+        SELECT f.dept_id, COUNT(DISTINCT i.etudiant_id) as nb_etudiants
+        FROM inscriptions i
+        JOIN etudiants e ON i.etudiant_id = e.id
+        JOIN formations f ON e.formation_id = f.id
+        WHERE i.session_id = p_session_id
+        GROUP BY f.dept_id
+    ) et ON et.dept_id = d.id
+    LEFT JOIN (
+        SELECT 
+            f.dept_id,
+            COUNT(*) as nb_examens,
+            SUM(e.nb_inscrits) as total_inscriptions,
+            COUNT(DISTINCT e.lieu_id) as nb_lieux,
+            AVG(l.capacite_examen) as capacite_moyenne
+        FROM examens e
+        JOIN modules m ON e.module_id = m.id
+        JOIN formations f ON m.formation_id = f.id
+        LEFT JOIN lieux_examen l ON e.lieu_id = l.id
+        WHERE e.session_id = p_session_id
+        GROUP BY f.dept_id
+    ) ex ON ex.dept_id = d.id
+    LEFT JOIN (
+        SELECT f.dept_id, COUNT(*) as nb_conflits
+        FROM conflits_detectes c
+        JOIN modules m ON c.module_id = m.id
+        JOIN formations f ON m.formation_id = f.id
+        WHERE c.session_id = p_session_id
+          AND c.resolu = FALSE
+        GROUP BY f.dept_id
+    ) co ON co.dept_id = d.id
+    WHERE p_dept_id IS NULL OR d.id = p_dept_id
+    ON CONFLICT (session_id, dept_id) DO UPDATE SET
+        nb_examens_planifies = EXCLUDED.nb_examens_planifies,
+        nb_modules_total = EXCLUDED.nb_modules_total,
+        nb_etudiants = EXCLUDED.nb_etudiants,
+        total_inscriptions = EXCLUDED.total_inscriptions,
+        nb_lieux_utilises = EXCLUDED.nb_lieux_utilises,
+        capacite_moyenne_lieux = EXCLUDED.capacite_moyenne_lieux,
+        nb_conflits_non_resolus = EXCLUDED.nb_conflits_non_resolus,
+        updated_at = EXCLUDED.updated_at;
+END;
+$$ LANGUAGE plpgsql;
+
+-- =====================================================
+-- EMPLOIS DU TEMPS ÉTUDIANTS
+-- =====================================================
+
+-- Fonction: (Re)publier les emplois du temps d'une session (ou d'un seul module)
+-- Examens annulés exclus: republier le module d'un examen annulé retire ses lignes
+CREATE OR REPLACE FUNCTION publier_emplois_du_temps(p_session_id INT, p_module_id INT DEFAULT NULL)
+RETURNS INT AS $$
+DECLARE
+    nb_lignes INT;
+BEGIN
+    DELETE FROM emplois_du_temps_etudiants
+    WHERE session_id = p_session_id
+      AND (p_module_id IS NULL OR module_id = p_module_id);
+    
+    INSERT INTO emplois_du_temps_etudiants (
+        etudiant_id, session_id, module_id, matricule, date_examen, heure_debut,
+        duree_minutes, code_module, nom_module, lieu, type_lieu, surveillant
+    )
+    SELECT 
+        i.etudiant_id,
+        e.session_id,
+        e.module_id,
+        et.matricule,
+        e.date_examen,
+        e.heure_debut,
+        e.duree_minutes,
+        m.code,
+        m.nom,
+        l.nom,
+        l.type,
+        CONCAT(p.nom, ' ', p.prenom)
+    FROM examens e
+    JOIN inscriptions i ON i.module_id = e.module_id AND i.session_id = e.session_id
+    JOIN etudiants et ON i.etudiant_id = et.id
+    JOIN modules m ON e.module_id = m.id
+    LEFT JOIN lieux_examen l ON e.lieu_id = l.id
+    LEFT JOIN professeurs p ON e.prof_surveillant_id = p.id
+    WHERE e.session_id = p_session_id
+      AND i.session_id = p_session_id
+      AND e.statut IS DISTINCT FROM 'annule'
+      AND (p_module_id IS NULL OR e.module_id = p_module_id)
+    ON CONFLICT (etudiant_id, session_id, module_id) DO NOTHING;
+    
+    GET DIAGNOSTICS nb_lignes = ROW_COUNT;
+    RETURN nb_lignes;
+END;
+$$ LANGUAGE plpgsql;
+
+-- =====================================================
+-- PARTITIONS PAR SESSION
+-- =====================================================
+
+-- Fonction: Créer les partitions examens et inscriptions d'une session
+-- Les requêtes filtrées sur session_id ne lisent que ces partitions
+CREATE OR REPLACE FUNCTION creer_partitions_session(p_session_id INT)
+RETURNS VOID AS $$
+DECLARE
+    partition_examens TEXT := 'examens_s' || p_session_id;
+    partition_inscriptions TEXT := 'inscriptions_s' || p_session_id;
+BEGIN
+    IF to_regclass(partition_inscriptions) IS NULL THEN
+        EXECUTE format('CREATE TABLE %I PARTITION OF inscriptions FOR VALUES IN (%s)',
+                       partition_inscriptions, p_session_id);
+    END IF;
+    
+    IF to_regclass(partition_examens) IS NULL THEN
+        EXECUTE format('CREATE TABLE %I PARTITION OF examens FOR VALUES IN (%s)',
+                       partition_examens, p_session_id);
+        -- Pas de double réservation d'un lieu ni d'un surveillant dans la session (vérifié
+        -- en fin d'instruction: un UPDATE en masse peut échanger deux examens)
+        EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I EXCLUDE USING gist (lieu_id WITH =, creneau WITH &&)
+                        WHERE (statut IS DISTINCT FROM ''annule'') DEFERRABLE INITIALLY IMMEDIATE',
+                       partition_examens, partition_examens || '_excl_lieu');
+        EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I EXCLUDE USING gist (prof_surveillant_id WITH =, creneau WITH &&)
+                        WHERE (statut IS DISTINCT FROM ''annule'') DEFERRABLE INITIALLY IMMEDIATE',
+                       partition_examens, partition_examens || '_excl_surveillant');
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Procédure: Détacher les partitions d'une année universitaire vers le schéma archives
+-- Les tables détachées restent interrogeables (archives.examens_s<id>) mais ne sont plus
+-- parcourues par les requêtes du planning. DETACH verrouille examens et inscriptions:
+-- à lancer hors des périodes de saisie.
+CREATE OR REPLACE PROCEDURE archiver_annee(p_annee VARCHAR)
+LANGUAGE plpgsql AS $$
+DECLARE
+    s RECORD;
+    parent TEXT;
+BEGIN
+    CREATE SCHEMA IF NOT EXISTS archives;
+    
+    FOR s IN
+        SELECT id FROM sessions_examen
+        WHERE annee_universitaire = p_annee
+          AND statut IS DISTINCT FROM 'archivee'
+    LOOP
+        -- Conflits: projection du planning, référencent les examens détachés
+        DELETE FROM conflits_detectes WHERE session_id = s.id;
+        
+        FOREACH parent IN ARRAY ARRAY['examens', 'inscriptions'] LOOP
+            IF to_regclass(parent || '_s' || s.id) IS NOT NULL THEN
+                EXECUTE format('ALTER TABLE %I DETACH PARTITION %I', parent, parent || '_s' || s.id);
+                EXECUTE format('ALTER TABLE %I SET SCHEMA archives', parent || '_s' || s.id);
+            END IF;
+        END LOOP;
+        
+        UPDATE sessions_examen SET statut = 'archivee' WHERE id = s.id;
+    END LOOP;
+END;
+$$;
+
 -- =====================================================
 -- TRIGGERS
 -- =====================================================
@@ -394,6 +734,84 @@ BEFORE UPDATE ON examens
 FOR EACH ROW
 EXECUTE FUNCTION update_updated_at();
 
+-- Trigger: Partitions et KPIs initiaux créés avec la session
+CREATE OR REPLACE FUNCTION initialiser_nouvelle_session()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM creer_partitions_session(NEW.id);
+    PERFORM rafraichir_kpis(NEW.id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_initialiser_session
+AFTER INSERT ON sessions_examen
+FOR EACH ROW
+EXECUTE FUNCTION initialiser_nouvelle_session();
+
+-- Trigger: Charge journalière des surveillants (une fois par instruction)
+-- Les tables de transition contiennent toutes les lignes touchées: un INSERT
+-- en masse de tout un planning ne met à jour prof_daily_load qu'une fois
+CREATE OR REPLACE FUNCTION maj_charge_surveillants()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        -- Même instantané: les compteurs épuisés sont supprimés, les autres décrémentés
+        WITH a AS (
+            SELECT prof_surveillant_id, session_id, date_examen, COUNT(*) as nb
+            FROM anciens
+            WHERE prof_surveillant_id IS NOT NULL
+            GROUP BY prof_surveillant_id, session_id, date_examen
+        ), epuises AS (
+            DELETE FROM prof_daily_load c
+            USING a
+            WHERE c.prof_id = a.prof_surveillant_id
+              AND c.session_id = a.session_id
+              AND c.date_examen = a.date_examen
+              AND c.nb <= a.nb
+        )
+        UPDATE prof_daily_load c
+        SET nb = c.nb - a.nb
+        FROM a
+        WHERE c.prof_id = a.prof_surveillant_id
+          AND c.session_id = a.session_id
+          AND c.date_examen = a.date_examen
+          AND c.nb > a.nb;
+    END IF;
+    
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO prof_daily_load (prof_id, session_id, date_examen, nb)
+        SELECT prof_surveillant_id, session_id, date_examen, COUNT(*)
+        FROM nouveaux
+        WHERE prof_surveillant_id IS NOT NULL
+        GROUP BY prof_surveillant_id, session_id, date_examen
+        ON CONFLICT (prof_id, session_id, date_examen) DO UPDATE SET
+            nb = prof_daily_load.nb + EXCLUDED.nb;
+    END IF;
+    
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Une table de transition par événement: un trigger par événement
+CREATE TRIGGER trigger_charge_insert
+AFTER INSERT ON examens
+REFERENCING NEW TABLE AS nouveaux
+FOR EACH STATEMENT
+EXECUTE FUNCTION maj_charge_surveillants();
+
+CREATE TRIGGER trigger_charge_update
+AFTER UPDATE ON examens
+REFERENCING OLD TABLE AS anciens NEW TABLE AS nouveaux
+FOR EACH STATEMENT
+EXECUTE FUNCTION maj_charge_surveillants();
+
+CREATE TRIGGER trigger_charge_delete
+AFTER DELETE ON examens
+REFERENCING OLD TABLE AS anciens
+FOR EACH STATEMENT
+EXECUTE FUNCTION maj_charge_surveillants();
+
 -- =====================================================
 -- COMMENTAIRES SUR LES TABLES
 -- =====================================================
@@ -401,8 +819,14 @@ COMMENT ON TABLE departements IS 'Les 7 départements de la faculté';
 COMMENT ON TABLE formations IS '200+ offres de formation (L1-M2)';
 COMMENT ON TABLE etudiants IS '~13,000 étudiants inscrits';
 COMMENT ON TABLE modules IS 'Modules d''enseignement (6-9 par formation)';
-COMMENT ON TABLE inscriptions IS '~130,000 inscriptions étudiants-modules';
-COMMENT ON TABLE examens IS 'Planning des examens avec contraintes';
+COMMENT ON TABLE inscriptions IS '~130,000 inscriptions étudiants-modules (une partition par session)';
+COMMENT ON TABLE examens IS 'Planning des examens avec contraintes (une partition par session)';
 COMMENT ON TABLE lieux_examen IS 'Salles et amphithéâtres (capacité réduite en examen)';
+COMMENT ON TABLE fermetures_lieux IS 'Fermetures de salles limitées à une période';
 COMMENT ON TABLE professeurs IS 'Enseignants et surveillants';
-COMMENT ON TABLE conflits_detectes IS 'Détection automatique des conflits de planning';
\ No newline at end of file
+COMMENT ON TABLE conflits_detectes IS 'Détection automatique des conflits de planning';
+COMMENT ON TABLE plans_candidats IS 'Plans améliorés en arrière-plan, en attente de publication';
+COMMENT ON TABLE optimizer_runs IS 'Historique et télémétrie des exécutions de l''optimiseur';
+COMMENT ON TABLE emplois_du_temps_etudiants IS 'Emplois du temps par étudiant, reconstruits à la publication';
+COMMENT ON TABLE prof_daily_load IS 'Surveillances par professeur et par jour (maintenu par trigger)';
+COMMENT ON TABLE kpis_session_departement IS 'KPIs par session et département, rafraîchis à la sauvegarde du planning';
\ No newline at end of file
@@ -314,6 +314,13 @@ class DataGenerator:
         print(f"✅ {inscription_count} inscriptions créées\n")
         return inscription_count
     
+    def refresh_kpis(self):
+        """Agréger les KPIs de chaque session (départements et inscriptions créés)"""
+        print("📊 Calcul des KPIs par session...")
+        self.cursor.execute("SELECT rafraichir_kpis(id) FROM sessions_examen")
+        self.conn.commit()
+        print("✅ KPIs calculés\n")
+    
     def close(self):
         """Fermer la connexion"""
         self.cursor.close()
@@ -339,6 +346,7 @@ def main():
         generator.generate_professors(30)
         generator.generate_exam_locations()
         generator.generate_inscriptions(130000)
+        generator.refresh_kpis()
         
         print("\n" + "="*60)
         print("✅ GÉNÉRATION TERMINÉE AVEC SUCCÈS!")
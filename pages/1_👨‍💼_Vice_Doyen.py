@@ -13,6 +13,7 @@ import os
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from src.db_connection import db
+from src.analytics import get_proctor_analytics
 
 st.set_page_config(
     page_title="Vue Stratégique - Num_Exam",
@@ -43,7 +44,13 @@ st.markdown("""
 
 # KPIs Globaux
 try:
-    kpis = db.get_global_kpis()
+    # Données de tous les panneaux: une connexion, un instantané cohérent
+    panels = db.fetch_batch({
+        'kpis': (db.get_global_kpis, 1),
+        'daily_dist': (db.get_daily_exam_distribution, 1),
+        'room_occ': (db.get_room_occupation, 1),
+    })
+    kpis = panels['kpis']
     
     # Métriques totales
     st.markdown("### 📊 Indicateurs Globaux")
@@ -159,7 +166,7 @@ try:
     
     with col1:
         # Distribution des examens dans le temps
-        daily_dist = db.get_daily_exam_distribution(session_id=1)
+        daily_dist = panels['daily_dist']
         
         if not daily_dist.empty:
             fig_timeline = px.area(
@@ -173,7 +180,7 @@ try:
     
     with col2:
         # Occupation des salles
-        room_occ = db.get_room_occupation(session_id=1)
+        room_occ = panels['room_occ']
         
         if not room_occ.empty:
             # Taux moyen par type de lieu
@@ -194,7 +201,9 @@ try:
     # Statistiques professeurs
     st.markdown("### 👨‍🏫 Mobilisation des Professeurs")
     
-    prof_stats = db.get_professor_surveillance_stats(session_id=1)
+    # Indicateurs d'équité partagés avec les autres pages (calculés une fois par version du planning)
+    analytics = get_proctor_analytics(session_id=1)
+    prof_stats = analytics.par_professeur
     
     if not prof_stats.empty:
         col1, col2, col3 = st.columns(3)
@@ -211,15 +220,12 @@ try:
             st.metric("📊 Moyenne surveillances/prof", f"{avg_surveillance:.1f}")
         
         with col3:
-            # Équité de répartition (écart-type)
-            std_surveillance = prof_stats['nb_surveillances'].std()
-            equite_score = max(0, 100 - (std_surveillance * 10))
-            st.metric("⚖️ Équité de répartition", f"{equite_score:.0f}/100",
-                     help="Plus le score est élevé, plus la répartition est équitable")
+            # Équité de répartition (1 - coefficient de Gini)
+            st.metric("⚖️ Équité de répartition", f"{analytics.score_equite}/100",
+                     help=f"Gini = {analytics.gini:.2f}. Plus le score est élevé, plus la répartition est équitable")
         
         # Distribution des surveillances
-        surveillance_dist = prof_stats['nb_surveillances'].value_counts().sort_index().reset_index()
-        surveillance_dist.columns = ['Nombre de surveillances', 'Nombre de professeurs']
+        surveillance_dist = analytics.distribution()
         
         fig_dist = px.bar(
             surveillance_dist,
@@ -14,8 +14,17 @@ import os
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.db_connection import db
+from src.db_connection import db, SEUIL_REQUETE_LENTE_MS
 from src.optimizer import optimize_schedule
+from src.room_closure import reassign_closed_rooms
+from src.conflict_engine import get_conflict_engine
+from src.validation import create_exam_checked, update_exam_checked
+from src.occupancy import get_room_occupancy
+from src.analytics import get_proctor_analytics
+from src.improvement_daemon import (
+    start_improvement_worker, stop_improvement_worker, get_improvement_worker,
+    get_candidate_plans, apply_candidate_plan
+)
 
 st.set_page_config(
     page_title="Administration Examens - Num_Exam",
@@ -45,11 +54,12 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Tabs principales
-tab1, tab2, tab3, tab4 = st.tabs([
+tab1, tab2, tab3, tab4, tab5 = st.tabs([
     "🚀 Génération Automatique",
     "⚠️ Détection de Conflits",
     "📊 Statistiques",
-    "✏️ Gestion Manuelle"
+    "✏️ Gestion Manuelle",
+    "🔬 Requêtes"
 ])
 
 # =====================================================
@@ -104,21 +114,22 @@ with tab1:
         
         with col_c3:
             priorite_dept = st.checkbox("Priorité département", value=True, help="Les profs surveillent prioritairement leur département")
+        
+        mode_souple = st.checkbox(
+            "🛟 Mode souple (toujours produire un planning)",
+            value=False,
+            help="Les contraintes deviennent des pénalités: un planning est toujours produit, avec la liste des conflits restants"
+        )
     
     with col2:
         st.markdown("#### 📋 Informations")
         
-        # Récupérer le nombre de modules à planifier
-        nb_modules = db.execute_query("""
-            SELECT COUNT(DISTINCT m.id) as total
-            FROM modules m
-            JOIN inscriptions i ON i.module_id = m.id
-            WHERE i.session_id = 1
-        """)[0]['total']
-        
-        nb_etudiants = db.execute_query("SELECT COUNT(*) as total FROM etudiants")[0]['total']
-        nb_profs = db.execute_query("SELECT COUNT(*) as total FROM professeurs")[0]['total']
-        nb_lieux = db.execute_query("SELECT COUNT(*) as total FROM lieux_examen WHERE disponible = TRUE")[0]['total']
+        # Compteurs de la session en un seul aller-retour
+        overview = db.get_session_overview(session_id=1)
+        nb_modules = overview['nb_modules']
+        nb_etudiants = overview['nb_etudiants']
+        nb_profs = overview['nb_professeurs']
+        nb_lieux = overview['nb_lieux']
         
         st.info(f"""
         **Modules à planifier:** {nb_modules}
@@ -152,7 +163,8 @@ with tab1:
                 result = optimize_schedule(
                     session_id=1,
                     date_debut=date_debut.strftime('%Y-%m-%d'),
-                    nb_jours=nb_jours
+                    nb_jours=nb_jours,
+                    soft_mode=mode_souple
                 )
                 
                 progress_bar.progress(100)
@@ -161,13 +173,21 @@ with tab1:
                     st.success(f"""
                     ✅ **Planning généré avec succès!**
                     
-                    - ⏱️ Temps d'exécution: {result['temps']:.2f} secondes
+                    - ⏱️ Temps d'exécution: {result['temps']:.2f} secondes ({result['raison_arret']})
                     - 📝 Examens planifiés: {result['nb_examens']}
                     - 📅 Jours utilisés: {result['stats']['nb_jours_utilises']}/{nb_jours}
                     - 🏢 Lieux utilisés: {result['stats']['nb_lieux_utilises']}
                     - 👨‍🏫 Professeurs mobilisés: {result['stats']['nb_profs_utilises']}
                     """)
                     
+                    if result['conflits_restants']:
+                        st.warning(f"⚠️ {len(result['conflits_restants'])} conflit(s) restant(s), classés par gravité")
+                        st.dataframe(
+                            pd.DataFrame(result['conflits_restants']),
+                            use_container_width=True,
+                            hide_index=True
+                        )
+                    
                     # Bouton pour voir le planning
                     if st.button("📊 Voir le planning généré"):
                         st.rerun()
@@ -179,9 +199,55 @@ with tab1:
                     
                     Suggestions:
                     - Augmenter le nombre de jours
+                    - Activer le mode souple
                     - Vérifier les contraintes
                     - Vérifier la disponibilité des ressources
                     """)
+    
+    # Amélioration continue en arrière-plan
+    st.markdown("---")
+    st.markdown("### 🔁 Amélioration Continue")
+    st.markdown("*Recherche en arrière-plan de versions strictement meilleures du planning publié*")
+    
+    worker = get_improvement_worker(1)
+    
+    col1, col2 = st.columns([1, 2])
+    
+    with col1:
+        if worker is None:
+            if st.button("▶️ Démarrer l'amélioration", use_container_width=True):
+                start_improvement_worker(1)
+                st.rerun()
+        else:
+            st.info(f"""
+            **En cours** - {worker.iterations} itération(s), {worker.improvements} amélioration(s)
+            """)
+            if worker.last_error:
+                st.warning(f"⚠️ {worker.last_error}")
+            if st.button("⏹️ Arrêter l'amélioration", use_container_width=True):
+                stop_improvement_worker(1)
+                st.rerun()
+    
+    with col2:
+        candidats = get_candidate_plans(1)
+        
+        if candidats.empty:
+            st.info("🔭 Aucun plan candidat pour le moment")
+        else:
+            st.dataframe(candidats, use_container_width=True, hide_index=True)
+            
+            plan_selected = st.selectbox(
+                "Plan candidat",
+                options=candidats['id'].tolist(),
+                format_func=lambda x: f"#{x} - objectif {candidats[candidats['id']==x]['objectif'].values[0]:.0f}"
+            )
+            if st.button("✅ Publier ce plan", type="primary"):
+                result = apply_candidate_plan(plan_selected)
+                if result['success']:
+                    st.success(f"✅ Plan #{plan_selected} publié ({result['message']})")
+                    st.rerun()
+                else:
+                    st.error(f"❌ {result['message']}")
 
 # =====================================================
 # TAB 2: DÉTECTION DE CONFLITS
@@ -189,11 +255,12 @@ with tab1:
 with tab2:
     st.markdown("### ⚠️ Détection et Résolution des Conflits")
     
-    # Détecter tous les types de conflits
+    # Détecter tous les types de conflits (moteur en mémoire, rechargé si le planning change)
     col1, col2, col3 = st.columns(3)
+    engine = get_conflict_engine(session_id=1)
     
     # Conflits étudiants
-    conflits_etudiants = db.detect_student_conflicts(session_id=1)
+    conflits_etudiants = engine.student_conflicts()
     with col1:
         if conflits_etudiants.empty:
             st.success("✅ Aucun conflit étudiant")
@@ -201,7 +268,7 @@ with tab2:
             st.error(f"❌ {len(conflits_etudiants)} conflits étudiants détectés")
     
     # Conflits professeurs
-    conflits_profs = db.detect_professor_conflicts(session_id=1)
+    conflits_profs = engine.professor_conflicts()
     with col2:
         if conflits_profs.empty:
             st.success("✅ Aucun conflit professeur")
@@ -209,7 +276,7 @@ with tab2:
             st.error(f"❌ {len(conflits_profs)} conflits professeurs détectés")
     
     # Conflits de capacité
-    conflits_capacite = db.detect_capacity_conflicts(session_id=1)
+    conflits_capacite = engine.capacity_conflicts()
     with col3:
         if conflits_capacite.empty:
             st.success("✅ Aucun dépassement de capacité")
@@ -322,10 +389,28 @@ with tab3:
                 if not over_capacity.empty:
                     st.warning(f"⚠️ {len(over_capacity)} lieu(x) en sur-capacité détecté(s)")
             
+            # Occupation par créneau (grille en mémoire)
+            slot_occ = get_room_occupancy(session_id=1).slot_occupancy()
+            
+            if not slot_occ.empty:
+                st.markdown("#### 🕒 Occupation des salles par créneau")
+                
+                grille = slot_occ.pivot(index='date_examen', columns='heure', values='taux_occupation')
+                grille.index = pd.to_datetime(grille.index).strftime('%d/%m/%Y')
+                fig = px.imshow(
+                    grille,
+                    aspect='auto',
+                    color_continuous_scale='Blues',
+                    title="Part des salles disponibles occupées (%)",
+                    labels={'x': 'Heure', 'y': 'Date', 'color': 'Taux (%)'}
+                )
+                st.plotly_chart(fig, use_container_width=True)
+            
             # Statistiques professeurs
             st.markdown("#### 👨‍🏫 Répartition des surveillances")
             
-            prof_stats = db.get_professor_surveillance_stats(session_id=1)
+            analytics = get_proctor_analytics(session_id=1)
+            prof_stats = analytics.par_professeur
             
             if not prof_stats.empty:
                 # Top 10 professeurs avec le plus de surveillances
@@ -352,9 +437,69 @@ with tab3:
                     st.metric("Maximum", int(prof_stats['nb_surveillances'].max()))
                 with col4:
                     st.metric("Minimum", int(prof_stats['nb_surveillances'].min()))
+                
+                col1, col2, col3 = st.columns(3)
+                
+                with col1:
+                    st.metric("Coefficient de Gini", f"{analytics.gini:.2f}",
+                              help="0: répartition parfaitement égale")
+                with col2:
+                    st.metric("Dépassements du max/jour", analytics.nb_depassements)
+                with col3:
+                    st.metric("Créneaux consécutifs", analytics.nb_consecutifs,
+                              help="Surveillances sur deux créneaux successifs du même jour")
+                
+                # Équilibre entre départements
+                fig = px.bar(
+                    analytics.par_departement,
+                    x='departement',
+                    y=['part_professeurs', 'part_surveillances'],
+                    barmode='group',
+                    title="Part des professeurs et des surveillances par département",
+                    labels={'departement': 'Département', 'value': '%', 'variable': ''}
+                )
+                st.plotly_chart(fig, use_container_width=True)
         
         else:
             st.info("🔭 Aucun examen planifié pour le moment. Générez d'abord un planning.")
+        
+        # Historique des exécutions de l'optimiseur
+        st.markdown("#### 📈 Historique de l'optimiseur")
+        
+        runs = db.get_optimizer_runs()
+        
+        if not runs.empty:
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                fig = px.line(
+                    runs,
+                    x='created_at',
+                    y='temps_resolution',
+                    color='mode',
+                    markers=True,
+                    hover_data=['statut', 'raison_arret', 'nb_modules', 'nb_inscriptions'],
+                    title="Temps de résolution par exécution",
+                    labels={'created_at': 'Date', 'temps_resolution': 'Résolution (s)'}
+                )
+                st.plotly_chart(fig, use_container_width=True)
+            
+            with col2:
+                fig = px.scatter(
+                    runs,
+                    x='nb_variables',
+                    y='temps_total',
+                    color='statut',
+                    hover_data=['created_at', 'nb_contraintes', 'empreinte_donnees'],
+                    title="Temps total selon la taille du modèle",
+                    labels={'nb_variables': 'Variables', 'temps_total': 'Temps total (s)'}
+                )
+                st.plotly_chart(fig, use_container_width=True)
+            
+            with st.expander("📋 Détail des exécutions"):
+                st.dataframe(runs, use_container_width=True, hide_index=True)
+        else:
+            st.info("🔭 Aucune exécution enregistrée")
     
     except Exception as e:
         st.error(f"Erreur lors du chargement des statistiques: {e}")
@@ -365,7 +510,7 @@ with tab3:
 with tab4:
     st.markdown("### ✏️ Gestion Manuelle des Examens")
     
-    action = st.radio("Action", ["Ajouter un examen", "Modifier un examen", "Supprimer un examen"], horizontal=True)
+    action = st.radio("Action", ["Ajouter un examen", "Modifier un examen", "Supprimer un examen", "Fermer une salle"], horizontal=True)
     
     if action == "Ajouter un examen":
         st.markdown("#### ➕ Ajouter un nouvel examen")
@@ -415,7 +560,7 @@ with tab4:
                 SELECT COUNT(*) as nb FROM inscriptions WHERE module_id = %s AND session_id = 1
             """, (module_selected,))[0]['nb']
             
-            lieux_dispo = db.get_available_rooms(date_exam, heure_exam, duree, nb_inscrits)
+            lieux_dispo = get_room_occupancy(session_id=1).free_rooms(date_exam, heure_exam, duree, nb_inscrits)
             
             if not lieux_dispo.empty:
                 lieu_selected = st.selectbox(
@@ -429,7 +574,7 @@ with tab4:
         
         with col4:
             # Sélection du professeur
-            profs_dispo = db.get_available_professors(date_exam, dept_selected)
+            profs_dispo = db.get_available_professors(date_exam, dept_selected, heure_exam, duree)
             
             if not profs_dispo.empty:
                 prof_selected = st.selectbox(
@@ -441,25 +586,209 @@ with tab4:
                 st.error("❌ Aucun professeur disponible")
                 prof_selected = None
         
+        forcer_ajout = st.checkbox("Enregistrer malgré les conflits", value=False,
+                                   help="Salle ou surveillant déjà occupés restent refusés", key="forcer_ajout")
+        
         if st.button("➕ Ajouter l'examen", type="primary"):
             if lieu_selected and prof_selected:
                 try:
-                    exam_id = db.create_exam(
+                    result = create_exam_checked(
                         module_id=module_selected,
                         session_id=1,
                         date_examen=date_exam,
                         heure_debut=heure_exam,
                         duree_minutes=duree,
                         lieu_id=lieu_selected,
-                        prof_id=prof_selected
+                        prof_id=prof_selected,
+                        force=forcer_ajout
                     )
-                    st.success(f"✅ Examen créé avec succès (ID: {exam_id})")
-                    st.rerun()
+                    if result['success']:
+                        st.success(f"✅ {result['message']}")
+                        st.rerun()
+                    else:
+                        st.error(f"❌ {result['message']}")
+                        st.dataframe(pd.DataFrame(result['conflits']), use_container_width=True, hide_index=True)
                 except Exception as e:
                     st.error(f"❌ Erreur: {e}")
     
     elif action == "Modifier un examen":
+        st.markdown("#### ✏️ Déplacer ou réaffecter un examen")
+        st.markdown("*Les conflits provoqués sont vérifiés avant l'enregistrement*")
+        
+        examens = db.execute_to_dataframe("""
+            SELECT e.id, e.date_examen, e.heure_debut, e.duree_minutes, e.lieu_id,
+                   e.prof_surveillant_id, m.code, m.nom
+            FROM examens e
+            JOIN modules m ON e.module_id = m.id
+            WHERE e.session_id = 1
+            ORDER BY e.date_examen, e.heure_debut, m.code
+        """)
+        
+        if examens.empty:
+            st.info("🔭 Aucun examen planifié")
+        else:
+            libelles = {
+                e.id: f"{e.code} - {e.nom} ({e.date_examen:%d/%m/%Y} {e.heure_debut:%H:%M})"
+                for e in examens.itertuples()
+            }
+            exam_selected = st.selectbox("Examen", options=list(libelles), format_func=libelles.get)
+            examen = examens[examens['id']==exam_selected].iloc[0]
+            
+            lieux = db.execute_to_dataframe("""
+                SELECT id, nom, capacite_examen FROM lieux_examen WHERE disponible = TRUE ORDER BY nom
+            """)
+            profs = db.execute_to_dataframe("SELECT id, nom, prenom FROM professeurs ORDER BY nom, prenom")
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                new_date = st.date_input("Date", value=examen['date_examen'], key="modif_date")
+                new_heure = st.time_input("Heure de début", value=examen['heure_debut'], key="modif_heure")
+                new_duree = st.number_input("Durée (minutes)", value=int(examen['duree_minutes']),
+                                            min_value=30, max_value=240, step=30, key="modif_duree")
+            
+            with col2:
+                lieu_ids = lieux['id'].tolist()
+                new_lieu = st.selectbox(
+                    "Lieu",
+                    options=lieu_ids,
+                    index=lieu_ids.index(examen['lieu_id']) if examen['lieu_id'] in lieu_ids else 0,
+                    format_func=lambda x: f"{lieux[lieux['id']==x]['nom'].values[0]} ({lieux[lieux['id']==x]['capacite_examen'].values[0]} places)"
+                )
+                prof_ids = profs['id'].tolist()
+                new_prof = st.selectbox(
+                    "Surveillant",
+                    options=prof_ids,
+                    index=prof_ids.index(examen['prof_surveillant_id']) if examen['prof_surveillant_id'] in prof_ids else 0,
+                    format_func=lambda x: f"{profs[profs['id']==x]['nom'].values[0]} {profs[profs['id']==x]['prenom'].values[0]}"
+                )
+            
+            changes = {
+                'date_examen': new_date,
+                'heure_debut': new_heure,
+                'duree_minutes': new_duree,
+                'lieu_id': new_lieu,
+                'prof_surveillant_id': new_prof,
+            }
+            
+            forcer_modif = st.checkbox("Enregistrer malgré les conflits", value=False,
+                                       help="Salle ou surveillant déjà occupés restent refusés", key="forcer_modif")
+            
+            if st.button("💾 Enregistrer la modification", type="primary"):
+                try:
+                    result = update_exam_checked(int(exam_selected), session_id=1, force=forcer_modif, **changes)
+                    if result['success']:
+                        st.success(f"✅ {result['message']}")
+                        st.rerun()
+                    else:
+                        st.error(f"❌ {result['message']}")
+                        st.dataframe(pd.DataFrame(result['conflits']), use_container_width=True, hide_index=True)
+                except Exception as e:
+                    st.error(f"❌ Erreur: {e}")
+    
+    elif action == "Supprimer un examen":
         st.info("🚧 Fonctionnalité en développement")
     
-    else:  # Supprimer
-        st.info("🚧 Fonctionnalité en développement")
\ No newline at end of file
+    else:  # Fermer une salle
+        st.markdown("#### 🚪 Fermeture de salle")
+        st.markdown("*Seuls les examens des salles fermées sont réaffectés: même créneau si possible, sinon déplacement local*")
+        
+        lieux = db.execute_to_dataframe("""
+            SELECT id, nom, capacite_examen FROM lieux_examen WHERE disponible = TRUE ORDER BY nom
+        """)
+        
+        lieux_fermes = st.multiselect(
+            "Salle(s) à fermer",
+            options=lieux['id'].tolist(),
+            format_func=lambda x: f"{lieux[lieux['id']==x]['nom'].values[0]} ({lieux[lieux['id']==x]['capacite_examen'].values[0]} places)"
+        )
+        
+        limiter_periode = st.checkbox("Limiter à une période", value=False)
+        periode_debut, periode_fin = None, None
+        if limiter_periode:
+            col1, col2 = st.columns(2)
+            with col1:
+                periode_debut = st.date_input("Du", value=date.today())
+            with col2:
+                periode_fin = st.date_input("Au", value=date.today() + timedelta(days=7))
+        
+        confirmer_fermeture = st.checkbox("Fermer même si des examens restent sans solution", value=False,
+                                          key="confirmer_fermeture")
+        
+        if st.button("🚪 Fermer et réaffecter", type="primary", disabled=not lieux_fermes):
+            with st.spinner("🔄 Réaffectation des examens concernés..."):
+                result = reassign_closed_rooms(
+                    session_id=1,
+                    lieu_ids=lieux_fermes,
+                    date_debut=periode_debut,
+                    date_fin=periode_fin,
+                    confirmer=confirmer_fermeture
+                )
+            
+            if result['success']:
+                st.success(f"✅ {result['message']}")
+            elif result.get('a_confirmer'):
+                st.warning(f"⚠️ {result['message']}")
+            else:
+                st.error(f"❌ {result['message']}")
+            
+            for titre, cle in [("Réaffectés (même créneau)", 'reaffectes'),
+                               ("Déplacés", 'deplaces'),
+                               ("Sans solution", 'non_resolus')]:
+                if result.get(cle):
+                    st.markdown(f"**{titre}**")
+                    st.dataframe(pd.DataFrame(result[cle]), use_container_width=True, hide_index=True)
+
+# =====================================================
+# TAB 5: REQUÊTES (TRAÇAGE)
+# =====================================================
+with tab5:
+    st.markdown("### 🔬 Requêtes de la base de données")
+    st.caption("Statistiques du processus courant, depuis son démarrage ou la dernière réinitialisation")
+    
+    top = db.tracer.top_queries(limit=20)
+    cache_stats = db.cache.stats()
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Requêtes exécutées", int(top['appels'].sum()) if not top.empty else 0)
+    with col2:
+        st.metric("Temps total (ms)", f"{top['temps_total_ms'].sum():,.0f}" if not top.empty else "0")
+    with col3:
+        st.metric("Taux de hit du cache", f"{cache_stats['taux_hit']}%")
+    with col4:
+        st.metric("Requêtes lentes", len(db.tracer.slow_queries))
+    
+    if top.empty:
+        st.info("🔭 Aucune requête tracée")
+    else:
+        st.markdown("#### ⏱️ Top requêtes par temps total")
+        
+        fig = px.bar(
+            top.head(10).assign(requete_courte=top.head(10)['requete'].str.slice(0, 60)),
+            x='temps_total_ms',
+            y='requete_courte',
+            orientation='h',
+            hover_data=['appels', 'temps_moyen_ms', 'appelants'],
+            labels={'temps_total_ms': 'Temps total (ms)', 'requete_courte': 'Requête'}
+        )
+        fig.update_layout(yaxis={'categoryorder': 'total ascending'})
+        st.plotly_chart(fig, use_container_width=True)
+        
+        st.dataframe(top, use_container_width=True, hide_index=True)
+    
+    st.markdown(f"#### 🐢 Requêtes lentes (≥ {SEUIL_REQUETE_LENTE_MS:.0f} ms)")
+    
+    if not db.tracer.slow_queries:
+        st.success("✅ Aucune requête lente")
+    else:
+        for entry in reversed(db.tracer.slow_queries):
+            with st.expander(f"{entry['date']} · {entry['duree_ms']} ms · {entry['appelant']}"):
+                st.code(entry['requete'], language='sql')
+                st.caption(f"Paramètres: {entry['parametres']} · Lignes: {entry['lignes']}")
+                if entry['plan']:
+                    st.code(entry['plan'], language='text')
+    
+    if st.button("🔄 Réinitialiser les statistiques"):
+        db.tracer.reset()
+        st.rerun()
@@ -13,6 +13,8 @@ import os
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from src.db_connection import db
+from src.async_db import fetch_panels
+from src.analytics import get_proctor_analytics
 
 st.set_page_config(
     page_title="Chef de Département - Num_Exam",
@@ -47,6 +49,14 @@ if not dept_info:
 
 dept_info = dept_info[0]
 
+# Panneaux indépendants chargés en parallèle
+panels = fetch_panels({
+    'stats': (db.get_department_stats, dept_id, 1),
+    'formations': (db.get_formations_by_department, dept_id),
+    'schedule': (db.get_department_schedule, dept_id, 1),
+    'dept_conflicts': (db.get_all_conflicts, 1, False, dept_id),
+})
+
 # En-tête
 st.markdown(f"""
     <div style='text-align: center; padding: 1.5rem; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
@@ -67,7 +77,7 @@ tab1, tab2, tab3, tab4 = st.tabs([
 # TAB 1: Vue d'ensemble
 with tab1:
     # Statistiques du département
-    stats = db.get_department_stats(dept_id, session_id=1)
+    stats = panels['stats']
     
     if stats:
         col1, col2, col3, col4, col5 = st.columns(5)
@@ -90,7 +100,7 @@ with tab1:
         # Liste des formations
         st.markdown("### 🎓 Formations du Département")
         
-        formations = db.get_formations_by_department(dept_id)
+        formations = panels['formations']
         
         if not formations.empty:
             # Ajouter des stats par formation
@@ -128,7 +138,7 @@ with tab1:
 with tab2:
     st.markdown("### 📅 Planning Complet du Département")
     
-    schedule = db.get_department_schedule(dept_id, session_id=1)
+    schedule = panels['schedule']
     
     if not schedule.empty:
         # Filtres
@@ -212,61 +222,43 @@ with tab2:
 with tab3:
     st.markdown("### ⚠️ Conflits Détectés dans le Département")
     
-    # Récupérer tous les conflits
-    all_conflicts = db.get_all_conflicts(session_id=1, resolved=False)
+    # Conflits ouverts du département (enregistrés par la détection après chaque modification)
+    dept_conflicts = panels['dept_conflicts']
     
-    if not all_conflicts.empty:
-        # Filtrer par département
-        dept_modules = db.execute_to_dataframe("""
-            SELECT m.id as module_id
-            FROM modules m
-            JOIN formations f ON m.formation_id = f.id
-            WHERE f.dept_id = %s
-        """, (dept_id,))
-        
-        dept_module_ids = dept_modules['module_id'].tolist()
-        
-        # Filtrer les conflits du département (basé sur code_module)
-        dept_conflicts = all_conflicts[
-            all_conflicts['code_module'].str.contains('|'.join([str(mid) for mid in dept_module_ids]), na=False)
-        ]
-        
-        if not dept_conflicts.empty:
-            # Statistiques
-            col1, col2, col3 = st.columns(3)
-            
-            with col1:
-                st.metric("Total conflits", len(dept_conflicts))
-            with col2:
-                high_severity = len(dept_conflicts[dept_conflicts['severite'] >= 4])
-                st.metric("Haute sévérité", high_severity)
-            with col3:
-                conflict_types = dept_conflicts['type_conflit'].nunique()
-                st.metric("Types de conflits", conflict_types)
-            
-            st.markdown("---")
+    if not dept_conflicts.empty:
+        # Statistiques
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            st.metric("Total conflits", len(dept_conflicts))
+        with col2:
+            high_severity = len(dept_conflicts[dept_conflicts['severite'] >= 4])
+            st.metric("Haute sévérité", high_severity)
+        with col3:
+            conflict_types = dept_conflicts['type_conflit'].nunique()
+            st.metric("Types de conflits", conflict_types)
+        
+        st.markdown("---")
+        
+        # Liste des conflits par type
+        for conflict_type in dept_conflicts['type_conflit'].unique():
+            type_conflicts = dept_conflicts[dept_conflicts['type_conflit'] == conflict_type]
             
-            # Liste des conflits par type
-            for conflict_type in dept_conflicts['type_conflit'].unique():
-                type_conflicts = dept_conflicts[dept_conflicts['type_conflit'] == conflict_type]
-                
-                with st.expander(f"**{conflict_type}** ({len(type_conflicts)} conflit(s))"):
-                    st.dataframe(
-                        type_conflicts[['date_examen', 'code_module', 'nom_module', 
-                                      'description', 'severite', 'date_detection']],
-                        use_container_width=True,
-                        hide_index=True
-                    )
-        else:
-            st.success("✅ Aucun conflit détecté dans votre département")
+            with st.expander(f"**{conflict_type}** ({len(type_conflicts)} conflit(s))"):
+                st.dataframe(
+                    type_conflicts[['date_examen', 'code_module', 'nom_module', 
+                                  'description', 'severite', 'date_detection']],
+                    use_container_width=True,
+                    hide_index=True
+                )
     else:
-        st.success("✅ Aucun conflit détecté")
+        st.success("✅ Aucun conflit détecté dans votre département")
 
 # TAB 4: Statistiques
 with tab4:
     st.markdown("### 📈 Statistiques du Département")
     
-    schedule = db.get_department_schedule(dept_id, session_id=1)
+    schedule = panels['schedule']
     
     if not schedule.empty:
         # Distribution par formation
@@ -323,8 +315,7 @@ with tab4:
         # Répartition des surveillances
         st.markdown("#### 👨‍🏫 Surveillances")
         
-        surveillant_count = schedule[schedule['surveillant'].notna()].groupby('surveillant').size().reset_index(name='Surveillances')
-        surveillant_count = surveillant_count.sort_values('Surveillances', ascending=False)
+        surveillant_count = get_proctor_analytics(session_id=1).department_proctors(dept_id)
         
         col1, col2 = st.columns(2)
         
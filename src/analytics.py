@@ -0,0 +1,153 @@
+"""
+Indicateurs d'équité des surveillances
+Charge une fois par version du planning les affectations (professeur, jour, créneau)
+et calcule en une passe NumPy: charge par professeur, coefficient de Gini,
+dépassements du maximum journalier, équilibre par département et créneaux consécutifs
+"""
+
+import numpy as np
+import pandas as pd
+import threading
+import time
+from src.db_connection import db, CACHE_TTL_SECONDES
+from src.conflict_engine import minutes
+
+# Tables lues par les indicateurs (versions du cache de DatabaseManager)
+TABLES_SOURCES = ('examens', 'professeurs', 'departements', 'modules', 'formations')
+
+# Surveillances consécutives: la suivante commence au plus tard ECART_CONSECUTIF_MINUTES
+# après la fin de la précédente (une pause déjeuner ne compte pas)
+ECART_CONSECUTIF_MINUTES = 30
+
+
+def gini(valeurs):
+    """Coefficient de Gini (0: répartition égale, 1: tout sur une personne)"""
+    x = np.sort(np.asarray(valeurs, dtype=np.float64))
+    n, total = len(x), x.sum()
+    if n == 0 or total == 0:
+        return 0.0
+    return float(2 * np.dot(np.arange(1, n + 1), x) / (n * total) - (n + 1) / n)
+
+
+class ProctorAnalytics:
+    """Répartition des surveillances d'une session"""
+    
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.versions = None
+        self.loaded_at = None
+    
+    def load(self):
+        """Charger les professeurs et les affectations de la session"""
+        professeurs = db.execute_to_dataframe("""
+            SELECT p.id, CONCAT(p.nom, ' ', p.prenom) as professeur, p.dept_id,
+                   d.nom as departement, p.max_surveillance_jour
+            FROM professeurs p
+            JOIN departements d ON p.dept_id = d.id
+            ORDER BY p.id
+        """)
+        affectations = db.execute_to_dataframe("""
+            SELECT e.prof_surveillant_id, e.date_examen, e.heure_debut, e.duree_minutes,
+                   f.dept_id as dept_examen
+            FROM examens e
+            JOIN modules m ON e.module_id = m.id
+            JOIN formations f ON m.formation_id = f.id
+            WHERE e.session_id = %s
+              AND e.prof_surveillant_id IS NOT NULL
+        """, (self.session_id,))
+        
+        self.versions = db.cache.versions(TABLES_SOURCES)
+        return self.build(professeurs, affectations)
+    
+    def build(self, professeurs, affectations):
+        """Calculer tous les indicateurs à partir des DataFrames chargés"""
+        self.loaded_at = time.monotonic()
+        nb_profs = len(professeurs)
+        
+        # Tableau des affectations: (professeur, jour, créneau, département de l'examen)
+        prof_ids = professeurs['id'].to_numpy(dtype=np.int64)
+        profs = np.searchsorted(prof_ids, affectations['prof_surveillant_id'].to_numpy(dtype=np.int64))
+        dates, jours = np.unique(affectations['date_examen'].to_numpy(dtype=object).astype(str), return_inverse=True)
+        heures, creneaux = np.unique(affectations['heure_debut'].to_numpy(dtype=object).astype(str), return_inverse=True)
+        self.dept_ids, depts_examen = np.unique(affectations['dept_examen'].to_numpy(dtype=np.int64), return_inverse=True)
+        
+        # Occupation professeur x jour x créneau
+        occupation = np.zeros((nb_profs, len(dates), len(heures)), dtype=np.int32)
+        np.add.at(occupation, (profs, jours, creneaux), 1)
+        par_jour = occupation.sum(axis=2)
+        
+        charges = par_jour.sum(axis=1)
+        max_jour = professeurs['max_surveillance_jour'].fillna(0).to_numpy(dtype=np.int64)
+        depassements = np.maximum(par_jour - max_jour[:, None], 0).sum(axis=1)
+        
+        # Consécutifs: écart réel entre la fin d'une surveillance et le début de la suivante
+        debuts = np.array([minutes(h) for h in affectations['heure_debut']], dtype=np.int64)
+        fins = debuts + affectations['duree_minutes'].fillna(90).to_numpy(dtype=np.int64)
+        ordre = np.lexsort((debuts, jours, profs))
+        p, j, d, f = profs[ordre], jours[ordre], debuts[ordre], fins[ordre]
+        ecarts = d[1:] - f[:-1]
+        suivies = (p[1:] == p[:-1]) & (j[1:] == j[:-1]) & (ecarts >= 0) & (ecarts <= ECART_CONSECUTIF_MINUTES)
+        consecutifs = np.bincount(p[:-1][suivies], minlength=nb_profs)
+        
+        self.par_professeur = professeurs.assign(
+            nb_surveillances=charges,
+            nb_jours=(par_jour > 0).sum(axis=1),
+            max_par_jour=par_jour.max(axis=1) if len(dates) else 0,
+            depassements=depassements,
+            creneaux_consecutifs=consecutifs,
+        )
+        
+        # Surveillances par département d'examen x professeur (vue chef de département)
+        self._dept_prof = np.zeros((len(self.dept_ids), nb_profs), dtype=np.int32)
+        np.add.at(self._dept_prof, (depts_examen, profs), 1)
+        
+        # Équilibre par département du professeur
+        groupes = self.par_professeur.groupby(['dept_id', 'departement'])['nb_surveillances']
+        self.par_departement = groupes.agg(
+            nb_professeurs='size', nb_surveillances='sum', moyenne='mean', ecart_type='std'
+        ).reset_index()
+        self.par_departement['gini'] = groupes.apply(gini).to_numpy()
+        total = max(int(charges.sum()), 1)
+        self.par_departement['part_surveillances'] = self.par_departement['nb_surveillances'] * 100 / total
+        self.par_departement['part_professeurs'] = self.par_departement['nb_professeurs'] * 100 / max(nb_profs, 1)
+        
+        self.gini = gini(charges)
+        self.score_equite = round(100 * (1 - self.gini))
+        self.nb_depassements = int(depassements.sum())
+        self.nb_consecutifs = int(consecutifs.sum())
+        
+        return self
+    
+    def distribution(self):
+        """Nombre de professeurs par nombre de surveillances"""
+        dist = self.par_professeur['nb_surveillances'].value_counts().sort_index().reset_index()
+        dist.columns = ['Nombre de surveillances', 'Nombre de professeurs']
+        return dist
+    
+    def department_proctors(self, dept_id):
+        """Surveillants des examens d'un département et leur nombre de surveillances"""
+        if dept_id not in self.dept_ids:
+            return pd.DataFrame(columns=['surveillant', 'Surveillances'])
+        comptes = self._dept_prof[np.searchsorted(self.dept_ids, dept_id)]
+        presents = np.flatnonzero(comptes)
+        return pd.DataFrame({
+            'surveillant': self.par_professeur['professeur'].to_numpy()[presents],
+            'Surveillances': comptes[presents],
+        }).sort_values('Surveillances', ascending=False)
+
+
+# Indicateurs en cache par session, recalculés quand le planning change
+_analyses = {}
+_analyses_lock = threading.Lock()
+
+
+def get_proctor_analytics(session_id=1):
+    """Indicateurs de la session, recalculés si les données ont changé ou après le TTL"""
+    with _analyses_lock:
+        analyse = _analyses.get(session_id)
+        if (analyse is None
+                or analyse.versions != db.cache.versions(TABLES_SOURCES)
+                or time.monotonic() - analyse.loaded_at > CACHE_TTL_SECONDES):
+            analyse = ProctorAnalytics(session_id).load()
+            _analyses[session_id] = analyse
+        return analyse
@@ -0,0 +1,74 @@
+"""
+Accès asynchrone à la base de données
+Expose les méthodes de DatabaseManager sous forme de coroutines et permet de
+charger en parallèle les panneaux indépendants d'une page
+
+Adaptation volontaire: pas de pilote asynchrone natif (asyncpg, psycopg 3). Les
+coroutines délèguent à psycopg2 dans des threads (asyncio.to_thread) pour garder
+le pool, le cache des résultats, les requêtes préparées et le traçage communs avec
+l'accès synchrone. Le parallélisme est donc borné par le pool de threads d'asyncio
+et par POOL_MAX_CONNEXIONS, pas par la boucle d'événements.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from src.db_connection import db
+
+
+class AsyncDatabaseManager:
+    """Variante asynchrone de DatabaseManager
+    
+    Chaque appel s'exécute dans un thread du pool par défaut d'asyncio et
+    emprunte sa propre connexion au pool partagé: le cache des résultats et
+    les requêtes préparées restent communs avec l'accès synchrone.
+    """
+    
+    def __init__(self, manager=db):
+        self._manager = manager
+    
+    def __getattr__(self, name):
+        attr = getattr(self._manager, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+        
+        @functools.wraps(attr)
+        async def coroutine(*args, **kwargs):
+            return await asyncio.to_thread(attr, *args, **kwargs)
+        
+        return coroutine
+    
+    async def fetch_concurrently(self, requests):
+        """Exécuter des requêtes indépendantes en parallèle
+        
+        requests: {nom: méthode} ou {nom: (méthode, arg1, ...)}
+        Retourne {nom: résultat}
+        """
+        names = list(requests)
+        calls = []
+        for name in names:
+            request = requests[name]
+            func, *args = request if isinstance(request, tuple) else (request,)
+            calls.append(asyncio.to_thread(func, *args))
+        
+        results = await asyncio.gather(*calls)
+        return dict(zip(names, results))
+
+
+# Instance globale
+async_db = AsyncDatabaseManager()
+
+
+def fetch_panels(requests):
+    """Charger les panneaux d'une page en parallèle depuis un script Streamlit
+    
+    Sans boucle asyncio active dans le thread (cas du script Streamlit): asyncio.run.
+    Sinon asyncio.run échouerait: la boucle dédiée tourne dans un thread à part.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(async_db.fetch_concurrently(requests))
+    
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, async_db.fetch_concurrently(requests)).result()
@@ -0,0 +1,512 @@
+"""
+Moteur de détection de conflits en mémoire
+Charge une session une fois (incidences étudiant x examen, affectations
+jour/salle/surveillant) et calcule les conflits par opérations NumPy.
+Les résultats reproduisent detecter_conflits_etudiants,
+detecter_conflits_professeurs et detecter_depassement_capacite.
+"""
+
+import numpy as np
+import pandas as pd
+import threading
+import time
+import copy
+from datetime import time as dtime, timedelta
+from src.db_connection import db, CACHE_TTL_SECONDES
+
+# Seuil de detecter_conflits_professeurs (surveillances par jour)
+SEUIL_SURVEILLANCES_JOUR = 3
+
+# Tables lues par le moteur (versions du cache de DatabaseManager)
+TABLES_SOURCES = ('examens', 'inscriptions', 'modules', 'lieux_examen', 'professeurs')
+
+# Champs d'un examen reportables sans rechargement (move_exam)
+CHAMPS_DEPLACEMENT = ('date_examen', 'heure_debut', 'duree_minutes', 'lieu_id', 'prof_surveillant_id', 'statut')
+
+
+def minutes(heure):
+    """Heure de début en minutes depuis minuit (time, timedelta ou 'HH:MM')"""
+    if isinstance(heure, dtime):
+        return heure.hour * 60 + heure.minute
+    if isinstance(heure, timedelta):
+        return int(heure.total_seconds()) // 60
+    h, m = str(heure).split(':')[:2]
+    return int(h) * 60 + int(m)
+
+
+class ConflictEngine:
+    """Détection vectorisée des conflits d'une session"""
+    
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.versions = None
+        self.loaded_at = None
+    
+    def load(self):
+        """Charger la session depuis la base"""
+        examens = db.execute_to_dataframe("""
+            SELECT e.id, e.module_id, e.date_examen, e.heure_debut, e.duree_minutes,
+                   e.lieu_id, e.prof_surveillant_id, e.nb_inscrits, e.statut, m.code
+            FROM examens e
+            JOIN modules m ON e.module_id = m.id
+            WHERE e.session_id = %s
+        """, (self.session_id,))
+        
+        # Inscriptions de la session seulement (une partition lue)
+        inscriptions = db.execute_to_dataframe("""
+            SELECT etudiant_id, module_id
+            FROM inscriptions
+            WHERE session_id = %s AND module_id = ANY(%s)
+        """, (self.session_id, examens['module_id'].unique()))
+        
+        lieux = db.execute_to_dataframe("SELECT id, nom, capacite_examen FROM lieux_examen")
+        professeurs = db.execute_to_dataframe("SELECT id, nom, prenom FROM professeurs")
+        
+        self.versions = db.cache.versions(TABLES_SOURCES)
+        self.build(examens, inscriptions, lieux, professeurs)
+        return self
+    
+    def build(self, examens, inscriptions, lieux, professeurs):
+        """Construire les structures à partir des DataFrames chargés"""
+        self.loaded_at = time.monotonic()
+        
+        # Référentiels
+        self.lieu_ids = lieux['id'].to_numpy(dtype=np.int64)
+        self.lieu_index = {lid: i for i, lid in enumerate(self.lieu_ids)}
+        self.lieu_noms = lieux['nom'].to_numpy(dtype=object)
+        self.lieu_capacites = lieux['capacite_examen'].to_numpy(dtype=np.int64)
+        
+        self.prof_ids = professeurs['id'].to_numpy(dtype=np.int64)
+        self.prof_index = {pid: i for i, pid in enumerate(self.prof_ids)}
+        self.prof_noms = (professeurs['nom'] + ' ' + professeurs['prenom']).to_numpy(dtype=object)
+        
+        # Examens: un indice par examen, -1 pour une salle/un surveillant absent
+        self.exam_ids = examens['id'].to_numpy(dtype=np.int64)
+        self.exam_index = {eid: i for i, eid in enumerate(self.exam_ids)}
+        self.exam_modules = examens['module_id'].to_numpy(dtype=np.int64)
+        self.exam_codes = examens['code'].to_numpy(dtype=object)
+        self.exam_heures = examens['heure_debut'].to_numpy(dtype=object, copy=True)
+        self.exam_debuts = np.array([minutes(h) for h in self.exam_heures], dtype=np.int64)
+        self.exam_durees = examens['duree_minutes'].fillna(90).to_numpy(dtype=np.int64, copy=True)
+        self.exam_nb_inscrits = examens['nb_inscrits'].fillna(0).to_numpy(dtype=np.int64)
+        self.exam_lieux = np.array([self.lieu_index.get(l, -1) if pd.notna(l) else -1
+                                    for l in examens['lieu_id']], dtype=np.int64)
+        self.exam_profs = np.array([self.prof_index.get(p, -1) if pd.notna(p) else -1
+                                    for p in examens['prof_surveillant_id']], dtype=np.int64)
+        
+        self.dates = sorted(examens['date_examen'].unique())
+        self.date_index = {d: i for i, d in enumerate(self.dates)}
+        self.exam_jours = np.array([self.date_index[d] for d in examens['date_examen']], dtype=np.int64)
+        
+        # Incidence étudiant x examen (paires distinctes = COUNT(DISTINCT e.id))
+        self.etudiant_ids, etudiants = np.unique(inscriptions['etudiant_id'].to_numpy(dtype=np.int64),
+                                                 return_inverse=True)
+        paires = np.unique(np.column_stack([etudiants, inscriptions['module_id'].to_numpy(dtype=np.int64)]), axis=0)
+        
+        ordre = np.argsort(self.exam_modules, kind='stable')
+        modules_tries = self.exam_modules[ordre]
+        debut = np.searchsorted(modules_tries, paires[:, 1], side='left')
+        nb = np.searchsorted(modules_tries, paires[:, 1], side='right') - debut
+        decalage = np.arange(nb.sum()) - np.repeat(np.cumsum(nb) - nb, nb)
+        
+        self.pair_etudiants = np.repeat(paires[:, 0], nb)
+        self.pair_examens = ordre[np.repeat(debut, nb) + decalage]
+        
+        # Étudiants de chaque examen (CSR trié par examen)
+        tri = np.argsort(self.pair_examens, kind='stable')
+        self.exam_etudiants = self.pair_etudiants[tri]
+        self.exam_ptr = np.concatenate([[0], np.cumsum(np.bincount(self.pair_examens, minlength=len(self.exam_ids)))])
+        
+        # Examens de chaque étudiant (CSR trié par étudiant)
+        tri = np.argsort(self.pair_etudiants, kind='stable')
+        self.etudiant_examens = self.pair_examens[tri]
+        self.etudiant_ptr = np.concatenate([[0], np.cumsum(np.bincount(self.pair_etudiants, minlength=len(self.etudiant_ids)))])
+        
+        # Compteurs: examens par étudiant x jour, surveillances par professeur x jour
+        self.etudiant_jour = np.zeros((len(self.etudiant_ids), len(self.dates)), dtype=np.int32)
+        np.add.at(self.etudiant_jour, (self.pair_etudiants, self.exam_jours[self.pair_examens]), 1)
+        
+        self.prof_jour = np.zeros((len(self.prof_ids), len(self.dates)), dtype=np.int32)
+        avec_prof = self.exam_profs >= 0
+        np.add.at(self.prof_jour, (self.exam_profs[avec_prof], self.exam_jours[avec_prof]), 1)
+        
+        # Examens non annulés par (jour, salle) et (jour, surveillant): créneaux occupés
+        self.exam_actifs = (examens['statut'] != 'annule').to_numpy(dtype=bool, copy=True)
+        self.salle_examens = {}
+        self.prof_examens = {}
+        for i in np.flatnonzero(self.exam_actifs):
+            self._index_slot(i, True)
+        
+        return self
+    
+    def _index_slot(self, i, ajouter):
+        """Ajouter/retirer l'examen i des index (jour, salle) et (jour, surveillant)"""
+        jour = int(self.exam_jours[i])
+        for index, cle in ((self.salle_examens, self.exam_lieux[i]), (self.prof_examens, self.exam_profs[i])):
+            if cle < 0:
+                continue
+            if ajouter:
+                index.setdefault((jour, int(cle)), set()).add(int(i))
+            else:
+                index.get((jour, int(cle)), set()).discard(int(i))
+    
+    def copy(self):
+        """Copie indépendante (simulation de déplacements sans toucher au cache)"""
+        clone = copy.copy(self)
+        for attr in ('exam_jours', 'exam_heures', 'exam_debuts', 'exam_durees', 'exam_lieux', 'exam_profs',
+                     'exam_actifs', 'etudiant_jour', 'prof_jour'):
+            setattr(clone, attr, getattr(self, attr).copy())
+        clone.salle_examens = {k: set(v) for k, v in self.salle_examens.items()}
+        clone.prof_examens = {k: set(v) for k, v in self.prof_examens.items()}
+        clone.dates = list(self.dates)
+        clone.date_index = dict(self.date_index)
+        return clone
+    
+    # =====================================================
+    # DÉTECTION
+    # =====================================================
+    
+    def student_conflicts(self):
+        """Étudiants ayant plus d'un examen le même jour"""
+        jours = self.exam_jours[self.pair_examens]
+        en_conflit = self.etudiant_jour[self.pair_etudiants, jours] > 1
+        
+        etudiants = self.pair_etudiants[en_conflit]
+        jours = jours[en_conflit]
+        examens = self.pair_examens[en_conflit]
+        if len(examens) == 0:
+            return pd.DataFrame(columns=['etudiant_id', 'date_examen', 'nb_examens', 'liste_modules'])
+        
+        # Regroupement (étudiant, jour) par tri + bornes de groupes, sans groupby
+        ordre = np.lexsort((examens, jours, etudiants))
+        etudiants, jours, examens = etudiants[ordre], jours[ordre], examens[ordre]
+        debuts = np.flatnonzero(np.r_[True, (etudiants[1:] != etudiants[:-1]) | (jours[1:] != jours[:-1])])
+        
+        codes = self.exam_codes[examens] + ', '
+        listes = np.add.reduceat(codes, debuts)
+        
+        return pd.DataFrame({
+            'etudiant_id': self.etudiant_ids[etudiants[debuts]],
+            'date_examen': np.array(self.dates, dtype=object)[jours[debuts]],
+            'nb_examens': np.diff(np.r_[debuts, len(examens)]),
+            'liste_modules': [liste[:-2] for liste in listes],
+        })
+    
+    def professor_conflicts(self):
+        """Professeurs ayant plus de SEUIL_SURVEILLANCES_JOUR surveillances le même jour"""
+        profs, jours = np.nonzero(self.prof_jour > SEUIL_SURVEILLANCES_JOUR)
+        return pd.DataFrame({
+            'professeur_id': self.prof_ids[profs],
+            'nom_professeur': self.prof_noms[profs],
+            'date_examen': [self.dates[j] for j in jours],
+            'nb_surveillances': self.prof_jour[profs, jours],
+        })
+    
+    def capacity_conflicts(self):
+        """Examens dont les inscrits dépassent la capacité de la salle"""
+        avec_lieu = np.flatnonzero(self.exam_lieux >= 0)
+        capacites = self.lieu_capacites[self.exam_lieux[avec_lieu]]
+        depasse = self.exam_nb_inscrits[avec_lieu] > capacites
+        examens = avec_lieu[depasse]
+        
+        return pd.DataFrame({
+            'examen_id': self.exam_ids[examens],
+            'lieu_nom': self.lieu_noms[self.exam_lieux[examens]],
+            'capacite_max': capacites[depasse],
+            'nb_inscrits': self.exam_nb_inscrits[examens],
+            'depassement': self.exam_nb_inscrits[examens] - capacites[depasse],
+        })
+    
+    def conflict_key(self, type_conflit, i):
+        """Clé d'un conflit de l'examen i: 'type:session:module:jour:début:salle'
+        
+        Stable d'une génération à l'autre tant que le module garde son créneau, et
+        distincte pour deux examens d'un même module (doublon forcé, plusieurs salles)
+        """
+        lieu = self.lieu_ids[self.exam_lieux[i]] if self.exam_lieux[i] >= 0 else ''
+        return (f"{type_conflit}:{self.session_id}:{self.exam_modules[i]}:"
+                f"{self.dates[self.exam_jours[i]]:%Y%m%d}:{self.exam_debuts[i]}:{lieu}")
+    
+    def conflict_records(self, examens=None):
+        """Conflits par examen au format de conflits_detectes
+        
+        examens: indices des examens à examiner (None = toute la session)
+        Retourne [(examen_id, module_id, cle, type_conflit, description, severite), ...],
+        cle (conflict_key) identifie un conflit d'une détection à l'autre,
+        y compris après la régénération du planning (nouveaux id d'examens)
+        """
+        records = []
+        if examens is None:
+            examens = np.arange(len(self.exam_ids))
+            pair_etudiants, pair_examens = self.pair_etudiants, self.pair_examens
+        else:
+            examens = np.asarray(examens, dtype=np.int64)
+            pair_etudiants, pair_examens = self.exam_pairs(examens)
+        
+        # Étudiants: un enregistrement par examen partagé avec un autre examen du jour
+        jours = self.exam_jours[pair_examens]
+        en_conflit = self.etudiant_jour[pair_etudiants, jours] > 1
+        nb_etudiants = np.bincount(pair_examens[en_conflit], minlength=len(self.exam_ids))
+        for i in np.flatnonzero(nb_etudiants):
+            n = int(nb_etudiants[i])
+            records.append((
+                int(self.exam_ids[i]), int(self.exam_modules[i]),
+                self.conflict_key('etudiants', i), 'etudiants',
+                f"{self.exam_codes[i]}: {n} étudiant(s) avec un autre examen le "
+                f"{self.dates[self.exam_jours[i]]:%d/%m/%Y}",
+                5 if n >= 50 else 4 if n >= 10 else 3
+            ))
+        
+        # Surveillants: chaque examen d'un professeur surchargé ce jour-là
+        avec_prof = examens[self.exam_profs[examens] >= 0]
+        charges = self.prof_jour[self.exam_profs[avec_prof], self.exam_jours[avec_prof]]
+        for i, n in zip(avec_prof[charges > SEUIL_SURVEILLANCES_JOUR], charges[charges > SEUIL_SURVEILLANCES_JOUR]):
+            records.append((
+                int(self.exam_ids[i]), int(self.exam_modules[i]),
+                self.conflict_key('surveillance', i), 'surveillance',
+                f"{self.prof_noms[self.exam_profs[i]]}: {n} surveillances le "
+                f"{self.dates[self.exam_jours[i]]:%d/%m/%Y} (max {SEUIL_SURVEILLANCES_JOUR})",
+                min(5, 2 + int(n) - SEUIL_SURVEILLANCES_JOUR)
+            ))
+        
+        # Capacité: sévérité selon la part de places manquantes
+        capacite = self.capacity_conflicts()
+        capacite = capacite[capacite['examen_id'].isin(self.exam_ids[examens])]
+        for row in capacite.itertuples(index=False):
+            ratio = row.depassement / row.capacite_max
+            i = self.exam_index[row.examen_id]
+            records.append((
+                int(row.examen_id), int(self.exam_modules[i]), self.conflict_key('capacite', i), 'capacite',
+                f"{row.nb_inscrits} inscrits pour {row.capacite_max} places ({row.lieu_nom})",
+                5 if ratio > 0.5 else 4 if ratio > 0.2 else 3
+            ))
+        
+        return records
+    
+    # =====================================================
+    # MISE À JOUR INCRÉMENTALE
+    # =====================================================
+    
+    def _day(self, date_examen):
+        """Indice d'un jour (ajoute une colonne pour une nouvelle date)"""
+        if date_examen not in self.date_index:
+            self.date_index[date_examen] = len(self.dates)
+            self.dates.append(date_examen)
+            self.etudiant_jour = np.pad(self.etudiant_jour, ((0, 0), (0, 1)))
+            self.prof_jour = np.pad(self.prof_jour, ((0, 0), (0, 1)))
+        return self.date_index[date_examen]
+    
+    def exam_students(self, exam_idx):
+        """Indices des étudiants inscrits à un examen"""
+        return self.exam_etudiants[self.exam_ptr[exam_idx]:self.exam_ptr[exam_idx + 1]]
+    
+    def exam_pairs(self, examens):
+        """(étudiant, examen) pour les inscrits d'un ensemble d'examens"""
+        debuts, fins = self.exam_ptr[examens], self.exam_ptr[examens + 1]
+        nb = fins - debuts
+        decalage = np.arange(nb.sum()) - np.repeat(np.cumsum(nb) - nb, nb)
+        return self.exam_etudiants[np.repeat(debuts, nb) + decalage], np.repeat(examens, nb)
+    
+    def related_exams(self, i):
+        """Examens dont les conflits dépendent de l'examen i
+        
+        Même jour que i avec des étudiants communs ou le même surveillant, et i lui-même
+        """
+        jour = self.exam_jours[i]
+        _, examens = self.student_exams(self.exam_students(i))
+        lies = [examens[self.exam_jours[examens] == jour], [i]]
+        if self.exam_profs[i] >= 0:
+            lies.append(np.flatnonzero((self.exam_profs == self.exam_profs[i]) & (self.exam_jours == jour)))
+        return np.unique(np.concatenate(lies)).astype(np.int64)
+    
+    def student_exams(self, etudiants):
+        """(étudiant, examen) pour les examens d'un ensemble d'étudiants"""
+        debuts, fins = self.etudiant_ptr[etudiants], self.etudiant_ptr[etudiants + 1]
+        nb = fins - debuts
+        decalage = np.arange(nb.sum()) - np.repeat(np.cumsum(nb) - nb, nb)
+        return np.repeat(etudiants, nb), self.etudiant_examens[np.repeat(debuts, nb) + decalage]
+    
+    def move_exam(self, exam_id, **changes):
+        """Appliquer la modification d'un examen aux compteurs
+        
+        changes: champs de CHAMPS_DEPLACEMENT (comme update_exam)
+        """
+        i = self.exam_index[exam_id]
+        ancien_jour, ancien_prof = self.exam_jours[i], self.exam_profs[i]
+        if self.exam_actifs[i]:
+            self._index_slot(i, False)
+        
+        nouveau_jour = self._day(changes['date_examen']) if 'date_examen' in changes else ancien_jour
+        if 'prof_surveillant_id' in changes:
+            prof_id = changes['prof_surveillant_id']
+            nouveau_prof = self.prof_index.get(prof_id, -1) if prof_id is not None else -1
+        else:
+            nouveau_prof = ancien_prof
+        
+        if 'lieu_id' in changes:
+            lieu_id = changes['lieu_id']
+            self.exam_lieux[i] = self.lieu_index.get(lieu_id, -1) if lieu_id is not None else -1
+        if 'heure_debut' in changes:
+            self.exam_heures[i] = changes['heure_debut']
+            self.exam_debuts[i] = minutes(changes['heure_debut'])
+        if 'duree_minutes' in changes:
+            self.exam_durees[i] = changes['duree_minutes']
+        
+        if nouveau_jour != ancien_jour:
+            etudiants = self.exam_students(i)
+            self.etudiant_jour[etudiants, ancien_jour] -= 1
+            self.etudiant_jour[etudiants, nouveau_jour] += 1
+        
+        if ancien_prof >= 0:
+            self.prof_jour[ancien_prof, ancien_jour] -= 1
+        if nouveau_prof >= 0:
+            self.prof_jour[nouveau_prof, nouveau_jour] += 1
+        
+        self.exam_jours[i] = nouveau_jour
+        self.exam_profs[i] = nouveau_prof
+        
+        if 'statut' in changes:
+            self.exam_actifs[i] = changes['statut'] != 'annule'
+        if self.exam_actifs[i]:
+            self._index_slot(i, True)
+    
+    def sync_versions(self):
+        """Marquer le moteur à jour après avoir reporté une écriture (move_exam)"""
+        self.versions = db.cache.versions(TABLES_SOURCES)
+
+
+# Moteurs en cache par session, rechargés quand une table source change
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_conflict_engine(session_id=1):
+    """Moteur de la session, rechargé si les données ont changé ou après le TTL"""
+    with _engines_lock:
+        engine = _engines.get(session_id)
+        if (engine is None
+                or engine.versions != db.cache.versions(TABLES_SOURCES)
+                or time.monotonic() - engine.loaded_at > CACHE_TTL_SECONDES):
+            engine = ConflictEngine(session_id).load()
+            _engines[session_id] = engine
+        return engine
+
+
+def apply_exam_change(session_id, exam_id, changes):
+    """Reporter une modification d'examen enregistrée sur le moteur en cache
+    
+    Appliqué seulement si cette écriture est la seule depuis le chargement:
+    sinon le moteur sera rechargé à la prochaine lecture.
+    Retourne les id des examens dont les conflits ont pu changer (avant et
+    après le déplacement), None si la modification n'a pas été reportée.
+    """
+    changes = {k: v for k, v in changes.items() if k in CHAMPS_DEPLACEMENT}
+    with _engines_lock:
+        engine = _engines.get(session_id)
+        if engine is None or exam_id not in engine.exam_index:
+            return None
+        
+        attendu = tuple(v + 1 if t == 'examens' else v for t, v in zip(TABLES_SOURCES, engine.versions))
+        if db.cache.versions(TABLES_SOURCES) != attendu:
+            return None
+        
+        i = engine.exam_index[exam_id]
+        avant = engine.related_exams(i)
+        engine.move_exam(exam_id, **changes)
+        engine.sync_versions()
+        return engine.exam_ids[np.union1d(avant, engine.related_exams(i))].tolist()
+
+
+def detect_and_store_conflicts(session_id=1):
+    """Détecter tous les conflits d'une session et les enregistrer dans conflits_detectes
+    
+    Appelé après l'enregistrement d'un planning et après chaque modification manuelle
+    """
+    started = time.perf_counter()
+    records = get_conflict_engine(session_id).conflict_records()
+    result = db.store_conflicts(session_id, records)
+    result['temps'] = time.perf_counter() - started
+    return result
+
+
+def detect_and_store_exam_conflicts(session_id, exam_ids):
+    """Ne réexaminer que les conflits des examens touchés par une modification
+    
+    exam_ids: id retournés par apply_exam_change
+    """
+    started = time.perf_counter()
+    engine = get_conflict_engine(session_id)
+    examens = np.array([engine.exam_index[e] for e in exam_ids if e in engine.exam_index], dtype=np.int64)
+    records = engine.conflict_records(examens)
+    result = db.store_conflicts(session_id, records, modules=engine.exam_modules[examens].tolist())
+    result['temps'] = time.perf_counter() - started
+    return result
+
+
+# =====================================================
+# VÉRIFICATION DE PARITÉ AVEC LES FONCTIONS SQL
+# =====================================================
+
+COLONNES_PARITE = {
+    'etudiants': (ConflictEngine.student_conflicts, db.detect_student_conflicts,
+                  ['etudiant_id', 'date_examen', 'nb_examens']),
+    'professeurs': (ConflictEngine.professor_conflicts, db.detect_professor_conflicts,
+                    ['professeur_id', 'date_examen', 'nb_surveillances']),
+    'capacite': (ConflictEngine.capacity_conflicts, db.detect_capacity_conflicts,
+                 ['examen_id', 'capacite_max', 'nb_inscrits', 'depassement']),
+}
+
+
+def _lignes(df, colonnes):
+    """Ensemble de tuples comparables (types numpy et Python confondus)"""
+    if df is None or df.empty:
+        return set()
+    return {tuple(str(v) for v in ligne) for ligne in df[colonnes].itertuples(index=False)}
+
+
+def check_sql_parity(session_id=1):
+    """Comparer le moteur aux fonctions detecter_conflits_* sur la même session
+    
+    Moteur rechargé hors cache et requêtes SQL lues dans le même instantané (batch).
+    Retourne {'success', 'message', 'details'} avec les écarts par type de conflit.
+    """
+    with db.batch():
+        engine = ConflictEngine(session_id).load()
+        resultats = {nom: (moteur(engine), sql(session_id), colonnes)
+                     for nom, (moteur, sql, colonnes) in COLONNES_PARITE.items()}
+    
+    details = {}
+    for nom, (moteur, sql, colonnes) in resultats.items():
+        a, b = _lignes(moteur, colonnes), _lignes(sql, colonnes)
+        details[nom] = {
+            'moteur': len(a),
+            'sql': len(b),
+            'manquants': sorted(b - a)[:20],
+            'en_trop': sorted(a - b)[:20],
+        }
+    
+    ecarts = [nom for nom, d in details.items() if d['manquants'] or d['en_trop']]
+    return {
+        'success': not ecarts,
+        'message': f"Écarts: {', '.join(ecarts)}" if ecarts else "Moteur et fonctions SQL identiques",
+        'details': details,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    
+    parser = argparse.ArgumentParser(description="Vérifier le moteur de conflits contre detecter_conflits_*")
+    parser.add_argument('--session', type=int, default=1)
+    args = parser.parse_args()
+    
+    rapport = check_sql_parity(args.session)
+    for nom, d in rapport['details'].items():
+        print(f"{nom}: moteur={d['moteur']} sql={d['sql']}")
+        for ligne in d['manquants']:
+            print(f"  manquant: {ligne}")
+        for ligne in d['en_trop']:
+            print(f"  en trop: {ligne}")
+    print(rapport['message'])
+    sys.exit(0 if rapport['success'] else 1)
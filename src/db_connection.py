@@ -4,37 +4,296 @@ Gère la conversion des types numpy en types Python
 """
 
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extensions import register_adapter, adapt, AsIs, Float, Boolean
+from psycopg2 import errors as pg_errors
+from psycopg2.extras import RealDictCursor, Json, DateTimeRange, execute_values
+from psycopg2.pool import ThreadedConnectionPool, PoolError
 import pandas as pd
+import numpy as np
 from contextlib import contextmanager
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+import threading
+import json
+import sys
+import time
+import uuid
+import re
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def convert_numpy_to_python(params):
-    """Convertir les types numpy en types Python standards"""
-    if params is None:
-        return None
-    
-    if isinstance(params, (list, tuple)):
-        converted = []
-        for p in params:
-            if hasattr(p, 'item'):  # Type numpy (int64, float64, etc.)
-                try:
-                    converted.append(int(p))
-                except (ValueError, TypeError):
-                    converted.append(float(p))
-            else:
-                converted.append(p)
-        return tuple(converted)
-    elif hasattr(params, 'item'):  # Type numpy unique
-        try:
-            return (int(params),)
-        except (ValueError, TypeError):
-            return (float(params),)
+# Pool de connexions (surchargeable par variables d'environnement)
+POOL_MIN_CONNEXIONS = int(os.getenv('DB_POOL_MIN', '1'))
+POOL_MAX_CONNEXIONS = int(os.getenv('DB_POOL_MAX', '10'))
+POOL_RECYCLAGE_SECONDES = float(os.getenv('DB_POOL_RECYCLE', '300'))
+POOL_VERIFICATION_SECONDES = float(os.getenv('DB_POOL_HEALTH_CHECK', '30'))
+POOL_ATTENTE_SECONDES = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+
+# Cache des résultats de lecture
+CACHE_TAILLE_MAX = int(os.getenv('DB_CACHE_SIZE', '256'))
+CACHE_TTL_SECONDES = float(os.getenv('DB_CACHE_TTL', '300'))
+
+# Traçage des requêtes et journal des requêtes lentes
+SEUIL_REQUETE_LENTE_MS = float(os.getenv('DB_SLOW_QUERY_MS', '200'))
+EXPLAIN_REQUETES_LENTES = os.getenv('DB_SLOW_QUERY_EXPLAIN', '0') == '1'
+FICHIER_REQUETES_LENTES = os.getenv('DB_SLOW_QUERY_LOG')
+NB_REQUETES_LENTES_GARDEES = 200
+
+# Recherche: entités indexées (pg_trgm sur le texte, text_pattern_ops sur l'identifiant)
+SEARCH_ENTITIES = {
+    'etudiant': {
+        'colonnes': "e.id, e.matricule, e.nom, e.prenom, f.nom as formation, d.nom as departement",
+        'source': """etudiants e
+            JOIN formations f ON e.formation_id = f.id
+            JOIN departements d ON f.dept_id = d.id""",
+        'identifiant': "e.matricule",
+        'texte': "(e.nom || ' ' || e.prenom)",
+    },
+    'professeur': {
+        'colonnes': "p.id, p.matricule, p.nom, p.prenom, d.nom as departement",
+        'source': """professeurs p
+            JOIN departements d ON p.dept_id = d.id""",
+        'identifiant': "p.matricule",
+        'texte': "(p.nom || ' ' || p.prenom)",
+    },
+    'module': {
+        'colonnes': "m.id, m.code, m.nom, f.nom as formation",
+        'source': """modules m
+            JOIN formations f ON m.formation_id = f.id""",
+        'identifiant': "m.code",
+        'texte': "m.nom",
+    },
+}
+
+# Un terme avec un chiffre et sans espace est un matricule ou un code (E2024000123, MOD-001-02)
+_RE_IDENTIFIANT = re.compile(r'^[A-Za-z-]*\d[\w-]*$')
+
+# Lecture par blocs (curseurs serveur nommés)
+TAILLE_BLOC_LECTURE = int(os.getenv('DB_CHUNK_ROWS', '2000'))
+
+# Tables lues par les vues (une écriture sur une table invalide la vue)
+VIEW_DEPENDENCIES = {
+    'vue_planning_complet': ('examens', 'modules', 'formations', 'departements',
+                             'lieux_examen', 'professeurs', 'sessions_examen'),
+    'vue_occupation_salles': ('examens', 'lieux_examen'),
+    'prof_daily_load': ('examens', 'prof_daily_load'),  # maintenue par trigger sur examens
+}
+
+_RE_TABLES_LUES = re.compile(r'\b(?:FROM|JOIN)\s+([a-z_][a-z0-9_]*)', re.IGNORECASE)
+_RE_PARAMETRE = re.compile(r'%s|%%')
+
+# Erreurs après lesquelles une requête préparée doit l'être à nouveau
+# (connexion réinitialisée, schéma modifié)
+ERREURS_REPREPARATION = (
+    pg_errors.InvalidSqlStatementName,
+    pg_errors.DuplicatePreparedStatement,
+    pg_errors.FeatureNotSupported,
+)
+
+_RE_TABLE_ECRITE = re.compile(
+    r'^\s*(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM|TRUNCATE(?:\s+TABLE)?)\s+([a-z_][a-z0-9_]*)',
+    re.IGNORECASE
+)
+
+# =====================================================
+# ADAPTATEURS NUMPY
+# =====================================================
+# Enregistrés une fois: les scalaires et tableaux numpy passent directement en
+# paramètres (tableaux -> ARRAY PostgreSQL, utilisables avec = ANY(%s))
+
+def _adapt_datetime64(value):
+    if np.isnat(value):
+        return AsIs('NULL')
+    unit = 'D' if value.dtype == np.dtype('datetime64[D]') else 'us'
+    return adapt(value.astype(f'datetime64[{unit}]').item())
+
+register_adapter(np.integer, lambda value: adapt(int(value)))
+register_adapter(np.floating, lambda value: Float(float(value)))
+register_adapter(np.bool_, lambda value: Boolean(bool(value)))
+register_adapter(np.datetime64, _adapt_datetime64)
+register_adapter(np.ndarray, lambda value: adapt(value.tolist()))
+
+def is_read_query(query):
+    """Requête en lecture seule (SELECT simple, sans transaction nécessaire)"""
+    return query.lstrip().upper().startswith('SELECT')
+
+def tables_written(query):
+    """Table modifiée par une requête d'écriture (None pour une lecture)"""
+    match = _RE_TABLE_ECRITE.match(query)
+    return match.group(1).lower() if match else None
+
+def exam_interval(date_examen, heure_debut, duree_minutes=90):
+    """Plage [début, fin) d'un examen, comme la colonne générée examens.creneau"""
+    if isinstance(heure_debut, str):
+        heure_debut = datetime.strptime(heure_debut[:5], '%H:%M').time()
+    debut = datetime.combine(date_examen, heure_debut)
+    return DateTimeRange(debut, debut + timedelta(minutes=int(duree_minutes)), '[)')
+
+def to_server_placeholders(query):
+    """Convertir les paramètres psycopg2 (%s) en paramètres serveur ($1, $2...)"""
+    compteur = iter(range(1, 1000))
+    return _RE_PARAMETRE.sub(lambda m: f"${next(compteur)}" if m.group() == '%s' else '%', query)
+
+class QueryCache:
+    """Cache LRU des résultats (clé: requête + paramètres), partagé par le processus
+    
+    Chaque entrée mémorise la version des tables lues au moment de la requête:
+    une écriture incrémente la version de sa table et rend l'entrée obsolète.
+    Les écritures d'autres processus ne sont vues qu'à l'expiration du TTL.
+    """
+    
+    def __init__(self, max_entries=CACHE_TAILLE_MAX):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def tables_read(query):
+        """Tables lues par une requête (vues développées en tables sources)"""
+        tables = set()
+        for name in _RE_TABLES_LUES.findall(query):
+            name = name.lower()
+            tables.update(VIEW_DEPENDENCIES.get(name, (name,)))
+        return tuple(sorted(tables))
+    
+    def versions(self, tables):
+        with self._lock:
+            return tuple(self._versions.get(t, 0) for t in tables)
     
-    return params
+    def get(self, key, tables):
+        """Résultat en cache, ou None s'il est absent, expiré ou invalidé"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, versions, value = entry
+                current = tuple(self._versions.get(t, 0) for t in tables)
+                if expires_at > time.monotonic() and versions == current:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+    
+    def put(self, key, versions, value, ttl):
+        """Stocker un résultat avec les versions lues AVANT la requête"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, versions, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def bump(self, *tables):
+        """Invalider les résultats qui lisent ces tables"""
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entrees': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'taux_hit': round(self.hits / total * 100, 1) if total else 0.0
+            }
+
+def find_caller():
+    """Page ou fonction à l'origine d'une requête (hors couche d'accès aux données)"""
+    internes = (__file__, 'contextlib.py', 'async_db.py', 'threading.py', 'thread.py')
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not filename.endswith(internes):
+            return f"{os.path.basename(filename)}:{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "inconnu"
+
+class QueryTracer:
+    """Statistiques agrégées par requête et journal des requêtes lentes"""
+    
+    def __init__(self):
+        self._stats = {}
+        self.slow_queries = deque(maxlen=NB_REQUETES_LENTES_GARDEES)
+        self._lock = threading.Lock()
+    
+    def record(self, query, duree_ms, nb_lignes, appelant, cache=None):
+        """Enregistrer une exécution; retourne True si la requête est lente"""
+        cle = ' '.join(query.split())
+        with self._lock:
+            stats = self._stats.get(cle)
+            if stats is None:
+                stats = self._stats[cle] = {
+                    'requete': cle, 'appels': 0, 'temps_total_ms': 0.0, 'temps_max_ms': 0.0,
+                    'lignes': 0, 'cache_hits': 0, 'cache_misses': 0, 'appelants': set()
+                }
+            stats['appels'] += 1
+            stats['temps_total_ms'] += duree_ms
+            stats['temps_max_ms'] = max(stats['temps_max_ms'], duree_ms)
+            stats['lignes'] += nb_lignes or 0
+            stats['appelants'].add(appelant)
+            if cache == 'hit':
+                stats['cache_hits'] += 1
+            elif cache == 'miss':
+                stats['cache_misses'] += 1
+        
+        return cache != 'hit' and duree_ms >= SEUIL_REQUETE_LENTE_MS
+    
+    def record_slow(self, query, params, duree_ms, nb_lignes, appelant, plan=None):
+        """Ajouter une entrée au journal des requêtes lentes"""
+        entry = {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'duree_ms': round(duree_ms, 1),
+            'lignes': nb_lignes,
+            'appelant': appelant,
+            'requete': ' '.join(query.split()),
+            'parametres': repr(params),
+            'plan': plan,
+        }
+        self.slow_queries.append(entry)
+        print(f"🐢 Requête lente ({duree_ms:.0f} ms) depuis {appelant}")
+        
+        if FICHIER_REQUETES_LENTES:
+            try:
+                with self._lock, open(FICHIER_REQUETES_LENTES, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            except OSError as e:
+                print(f"⚠️  Journal des requêtes lentes non écrit: {e}")
+    
+    def top_queries(self, limit=20):
+        """Requêtes les plus coûteuses (temps total décroissant)"""
+        with self._lock:
+            rows = [dict(stats, appelants=', '.join(sorted(stats['appelants'])))
+                    for stats in self._stats.values()]
+        
+        df = pd.DataFrame(rows, columns=['requete', 'appels', 'temps_total_ms', 'temps_max_ms', 'lignes',
+                                         'cache_hits', 'cache_misses', 'appelants'])
+        df['temps_moyen_ms'] = df['temps_total_ms'] / df['appels'].where(df['appels'] > 0)
+        return df.sort_values('temps_total_ms', ascending=False).head(limit).reset_index(drop=True)
+    
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.slow_queries.clear()
+
+class PooledConnection(psycopg2.extensions.connection):
+    """Connexion du pool, annotée de ses dates de création et de dernière utilisation"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.prepared = set()
 
 class DatabaseManager:
     """Classe pour gérer les connexions et requêtes à la base de données"""
@@ -47,108 +306,371 @@ class DatabaseManager:
             'password': os.getenv('DB_PASSWORD', 'password'),
             'port': os.getenv('DB_PORT', '5432')
         }
+        
+        # Pool créé à la première requête (aucune connexion à l'import)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._pool_slots = threading.BoundedSemaphore(POOL_MAX_CONNEXIONS)
+        
+        # Cache des résultats de lecture
+        self.cache = QueryCache()
+        
+        # Traçage des requêtes
+        self.tracer = QueryTracer()
+        
+        # Lot de lectures en cours (par thread)
+        self._local = threading.local()
+        
+        # Requêtes préparées: nom -> (requête, requête serveur, types)
+        self._statements = {}
+        self._statements_lock = threading.Lock()
+    
+    # =====================================================
+    # POOL DE CONNEXIONS
+    # =====================================================
+    
+    def _get_pool(self):
+        """Créer le pool à la demande (thread-safe)"""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadedConnectionPool(
+                        POOL_MIN_CONNEXIONS, POOL_MAX_CONNEXIONS,
+                        connection_factory=PooledConnection,
+                        **self.config
+                    )
+        return self._pool
+    
+    def _is_healthy(self, conn):
+        """Vérifier une connexion restée inactive (recyclage + ping)"""
+        if conn.closed:
+            return False
+        
+        maintenant = time.monotonic()
+        if maintenant - conn.last_used > POOL_RECYCLAGE_SECONDES:
+            return False
+        
+        if maintenant - conn.last_used > POOL_VERIFICATION_SECONDES:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                conn.rollback()
+            except psycopg2.Error:
+                return False
+        
+        return True
+    
+    def _acquire(self):
+        """Emprunter une connexion saine (attend si le pool est plein)"""
+        if not self._pool_slots.acquire(timeout=POOL_ATTENTE_SECONDES):
+            raise PoolError(
+                f"Aucune connexion disponible après {POOL_ATTENTE_SECONDES}s"
+            )
+        
+        try:
+            pool = self._get_pool()
+            for _ in range(POOL_MAX_CONNEXIONS + 1):
+                conn = pool.getconn()
+                if self._is_healthy(conn):
+                    return conn
+                pool.putconn(conn, close=True)
+            raise psycopg2.OperationalError("Impossible d'obtenir une connexion valide")
+        except Exception:
+            self._pool_slots.release()
+            raise
+    
+    def _release(self, conn):
+        """Rendre une connexion au pool (fermée si elle est cassée)"""
+        try:
+            if not conn.closed:
+                if conn.autocommit:
+                    conn.autocommit = False
+                conn.last_used = time.monotonic()
+            self._get_pool().putconn(conn, close=bool(conn.closed))
+        finally:
+            self._pool_slots.release()
+    
+    def close(self):
+        """Fermer toutes les connexions du pool"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
     
     @contextmanager
-    def get_connection(self):
-        """Context manager pour gérer les connexions"""
-        conn = psycopg2.connect(**self.config)
+    def get_connection(self, readonly=False):
+        """Context manager pour gérer les connexions (empruntées au pool)
+        
+        readonly=True: mode autocommit, sans BEGIN/COMMIT autour des lectures
+        Dans un lot (batch), toutes les requêtes partagent la connexion du lot.
+        """
+        batch_conn = getattr(self._local, 'batch_conn', None)
+        if batch_conn is not None:
+            yield batch_conn
+            return
+        
+        conn = self._acquire()
         try:
+            if readonly:
+                conn.autocommit = True
             yield conn
-            conn.commit()
+            if not conn.autocommit:
+                conn.commit()
         except Exception as e:
-            conn.rollback()
+            if not conn.closed:
+                conn.rollback()
             raise e
         finally:
-            conn.close()
+            self._release(conn)
     
-    def execute_query(self, query, params=None, fetch=True):
-        """Exécuter une requête SQL"""
-        params = convert_numpy_to_python(params)
+    @contextmanager
+    def batch(self):
+        """Regrouper des lectures sur une seule connexion et un même instantané
+        
+        Transaction REPEATABLE READ READ ONLY: les panneaux d'une page voient des
+        données cohérentes entre elles. psycopg2 n'a pas de mode pipeline: les
+        requêtes restent séquentielles mais sans connexion ni COMMIT par requête.
+        """
+        if getattr(self._local, 'batch_conn', None) is not None:
+            yield
+            return
         
         with self.get_connection() as conn:
+            conn.cursor().execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+            self._local.batch_conn = conn
+            try:
+                yield
+            finally:
+                self._local.batch_conn = None
+    
+    def fetch_batch(self, requests):
+        """Exécuter plusieurs requêtes nommées dans un lot
+        
+        requests: {nom: méthode} ou {nom: (méthode, arg1, ...)}
+        Retourne {nom: résultat}
+        """
+        results = {}
+        with self.batch():
+            for name, request in requests.items():
+                func, *args = request if isinstance(request, tuple) else (request,)
+                results[name] = func(*args)
+        return results
+    
+    def _trace(self, query, params, started, nb_lignes, cache=None):
+        """Mesurer une exécution; journaliser (et expliquer) les requêtes lentes"""
+        duree_ms = (time.perf_counter() - started) * 1000
+        appelant = find_caller()
+        
+        if self.tracer.record(query, duree_ms, nb_lignes, appelant, cache):
+            plan = self._explain(query, params) if EXPLAIN_REQUETES_LENTES and is_read_query(query) else None
+            self.tracer.record_slow(query, params, duree_ms, nb_lignes, appelant, plan)
+    
+    def _explain(self, query, params):
+        """Plan d'exécution réel (EXPLAIN ANALYZE, BUFFERS) d'une requête de lecture"""
+        try:
+            with self.get_connection(readonly=True) as conn:
+                cursor = conn.cursor()
+                cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {query}", params)
+                return "\n".join(row[0] for row in cursor.fetchall())
+        except psycopg2.Error as e:
+            return f"EXPLAIN impossible: {e}"
+    
+    def invalidate(self, *tables):
+        """Invalider le cache pour ces tables (tout le cache si aucune table)"""
+        if tables:
+            self.cache.bump(*tables)
+        else:
+            self.cache.clear()
+    
+    def execute_query(self, query, params=None, fetch=True):
+        """Exécuter une requête SQL"""
+        started = time.perf_counter()
+        with self.get_connection(readonly=is_read_query(query)) as conn:
             cursor = conn.cursor(cursor_factory=RealDictCursor)
             cursor.execute(query, params)
-            
-            if fetch:
-                return cursor.fetchall()
-            return None
+            result = cursor.fetchall() if fetch else None
+            nb_lignes = len(result) if fetch else cursor.rowcount
+        self._trace(query, params, started, nb_lignes)
+        
+        table = tables_written(query)
+        if table:
+            self.cache.bump(table)
+        
+        return result
+    
+    def execute_to_dataframe(self, query, params=None, ttl=None):
+        """Exécuter une requête et retourner un DataFrame pandas
+        
+        ttl: durée de mise en cache du résultat en secondes (None = pas de cache)
+        """
+        started = time.perf_counter()
+        
+        if ttl is None or not is_read_query(query):
+            with self.get_connection(readonly=is_read_query(query)) as conn:
+                df = pd.read_sql(query, conn, params=params)
+            self._trace(query, params, started, len(df))
+            return df
+        
+        key = (query, repr(params))
+        tables = self.cache.tables_read(query)
+        cached = self.cache.get(key, tables)
+        if cached is not None:
+            self._trace(query, params, started, len(cached), cache='hit')
+            return cached.copy()
+        
+        versions = self.cache.versions(tables)
+        with self.get_connection(readonly=True) as conn:
+            df = pd.read_sql(query, conn, params=params)
+        self._trace(query, params, started, len(df), cache='miss')
+        self.cache.put(key, versions, df, ttl)
+        return df.copy()
     
-    def execute_to_dataframe(self, query, params=None):
-        """Exécuter une requête et retourner un DataFrame pandas"""
-        params = convert_numpy_to_python(params)
+    def iter_dataframes(self, query, params=None, chunk_rows=TAILLE_BLOC_LECTURE):
+        """Lire un résultat par blocs de DataFrames (curseur serveur nommé)
+        
+        La mémoire reste bornée par chunk_rows; la connexion est gardée
+        jusqu'à la fin de l'itération.
+        """
+        started = time.perf_counter()
+        nb_lignes = 0
         
         with self.get_connection() as conn:
-            return pd.read_sql(query, conn, params=params)
+            cursor = conn.cursor(name=f"flux_{uuid.uuid4().hex}")
+            cursor.itersize = chunk_rows
+            try:
+                cursor.execute(query, params)
+                while True:
+                    rows = cursor.fetchmany(chunk_rows)
+                    if not rows:
+                        break
+                    nb_lignes += len(rows)
+                    columns = [col.name for col in cursor.description]
+                    yield pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+            finally:
+                cursor.close()
+        
+        # Temps total de l'itération (inclut le traitement de chaque bloc par l'appelant)
+        self._trace(query, params, started, nb_lignes)
+    
+    # =====================================================
+    # REQUÊTES PRÉPARÉES
+    # =====================================================
+    
+    def register_statement(self, name, query, types=None):
+        """Enregistrer une requête fixe sous un nom (PREPARE à la première exécution)"""
+        with self._statements_lock:
+            existing = self._statements.get(name)
+            if existing is not None:
+                if existing[0] != query:
+                    raise ValueError(f"Requête préparée '{name}' déjà enregistrée avec un autre SQL")
+                return
+            
+            types_sql = f" ({', '.join(types)})" if types else ""
+            self._statements[name] = (query, to_server_placeholders(query), types_sql)
+    
+    def _run_prepared(self, conn, name, params):
+        """PREPARE si nécessaire sur cette connexion, puis EXECUTE"""
+        query, server_query, types_sql = self._statements[name]
+        execute_sql = f"EXECUTE {name} ({', '.join(['%s'] * len(params))})" if params else f"EXECUTE {name}"
+        cursor = conn.cursor()
+        
+        # Dans une transaction (lot): point de sauvegarde, l'échec n'annule que cet
+        # EXECUTE et l'instantané du lot est conservé
+        controle = None if conn.autocommit else conn.cursor()
+        
+        for tentative in range(2):
+            try:
+                if controle:
+                    controle.execute("SAVEPOINT execution_preparee")
+                if name not in conn.prepared:
+                    cursor.execute(f"PREPARE {name}{types_sql} AS {server_query}")
+                    conn.prepared.add(name)
+                cursor.execute(execute_sql, params)
+                if controle:
+                    controle.execute("RELEASE SAVEPOINT execution_preparee")
+                return cursor
+            except ERREURS_REPREPARATION:
+                if tentative:
+                    raise
+                # Instructions perdues côté serveur ou plan invalidé: tout re-préparer
+                if controle:
+                    controle.execute("ROLLBACK TO SAVEPOINT execution_preparee")
+                cursor.execute("DEALLOCATE ALL")
+                conn.prepared.clear()
+    
+    def execute_prepared(self, name, query, params=None, types=None, ttl=None):
+        """Exécuter une requête fixe via PREPARE/EXECUTE et retourner un DataFrame
+        
+        types: types SQL des paramètres si PostgreSQL ne peut pas les déduire
+        """
+        self.register_statement(name, query, types)
+        params = tuple(params or ())
+        started = time.perf_counter()
+        
+        if ttl is not None:
+            key = (f"EXECUTE {name}", repr(params))
+            tables = self.cache.tables_read(query)
+            cached = self.cache.get(key, tables)
+            if cached is not None:
+                self._trace(query, params, started, len(cached), cache='hit')
+                return cached.copy()
+            versions = self.cache.versions(tables)
+        
+        with self.get_connection(readonly=True) as conn:
+            cursor = self._run_prepared(conn, name, params)
+            columns = [col.name for col in cursor.description]
+            df = pd.DataFrame.from_records(cursor.fetchall(), columns=columns, coerce_float=True)
+        self._trace(query, params, started, len(df), cache='miss' if ttl is not None else None)
+        
+        if ttl is not None:
+            self.cache.put(key, versions, df, ttl)
+            return df.copy()
+        return df
     
     def execute_many(self, query, data):
         """Exécuter une requête pour plusieurs enregistrements"""
-        # Convertir chaque ligne de données
-        converted_data = []
-        for row in data:
-            if isinstance(row, (list, tuple)):
-                converted_row = tuple(
-                    int(p) if hasattr(p, 'item') else p 
-                    for p in row
-                )
-                converted_data.append(converted_row)
-            else:
-                converted_data.append(row)
-        
+        started = time.perf_counter()
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.executemany(query, converted_data)
+            cursor.executemany(query, data)
+            nb_lignes = cursor.rowcount
+        self._trace(query, None, started, nb_lignes)
+        
+        table = tables_written(query)
+        if table:
+            self.cache.bump(table)
     
     # =====================================================
     # REQUÊTES SPÉCIFIQUES - ÉTUDIANTS
     # =====================================================
     
     def get_student_schedule(self, etudiant_id, session_id=1):
-        """Récupérer le planning d'un étudiant"""
-        etudiant_id = int(etudiant_id) if hasattr(etudiant_id, 'item') else etudiant_id
-        session_id = int(session_id) if hasattr(session_id, 'item') else session_id
-        
+        """Récupérer le planning d'un étudiant (emploi du temps publié)"""
         query = """
-            SELECT 
-                e.date_examen,
-                e.heure_debut,
-                e.duree_minutes,
-                m.code as code_module,
-                m.nom as nom_module,
-                l.nom as lieu,
-                l.type as type_lieu,
-                CONCAT(p.nom, ' ', p.prenom) as surveillant
-            FROM inscriptions i
-            JOIN examens e ON i.module_id = e.module_id
-            JOIN modules m ON e.module_id = m.id
-            LEFT JOIN lieux_examen l ON e.lieu_id = l.id
-            LEFT JOIN professeurs p ON e.prof_surveillant_id = p.id
-            WHERE i.etudiant_id = %s 
-              AND e.session_id = %s
-            ORDER BY e.date_examen, e.heure_debut
+            SELECT date_examen, heure_debut, duree_minutes, code_module, nom_module,
+                   lieu, type_lieu, surveillant
+            FROM emplois_du_temps_etudiants
+            WHERE etudiant_id = %s 
+              AND session_id = %s
+            ORDER BY date_examen, heure_debut
         """
-        return self.execute_to_dataframe(query, (etudiant_id, session_id))
+        return self.execute_prepared('planning_etudiant', query, (etudiant_id, session_id))
     
-    def search_students(self, search_term, limit=50):
-        """Rechercher des étudiants par nom/prénom/matricule"""
+    def get_schedule_by_matricule(self, matricule, session_id=1):
+        """Emploi du temps publié d'un étudiant, par matricule (une lecture indexée)"""
         query = """
-            SELECT 
-                e.id,
-                e.matricule,
-                e.nom,
-                e.prenom,
-                f.nom as formation,
-                d.nom as departement
-            FROM etudiants e
-            JOIN formations f ON e.formation_id = f.id
-            JOIN departements d ON f.dept_id = d.id
-            WHERE 
-                e.nom ILIKE %s OR 
-                e.prenom ILIKE %s OR 
-                e.matricule ILIKE %s
-            LIMIT %s
+            SELECT date_examen, heure_debut, duree_minutes, code_module, nom_module,
+                   lieu, type_lieu, surveillant
+            FROM emplois_du_temps_etudiants
+            WHERE matricule = %s 
+              AND session_id = %s
+            ORDER BY date_examen, heure_debut
         """
-        pattern = f"%{search_term}%"
-        return self.execute_to_dataframe(query, (pattern, pattern, pattern, limit))
+        return self.execute_prepared('planning_matricule', query, (matricule.strip().upper(), session_id))
+    
+    def search_students(self, search_term, limit=50):
+        """Rechercher des étudiants par nom/prénom/matricule"""
+        return self.search('etudiant', search_term, limit)
     
     # =====================================================
     # REQUÊTES SPÉCIFIQUES - PROFESSEURS
@@ -156,8 +678,6 @@ class DatabaseManager:
     
     def get_professor_schedule(self, prof_id, session_id=1):
         """Récupérer le planning de surveillance d'un professeur"""
-        prof_id = int(prof_id) if hasattr(prof_id, 'item') else prof_id
-        session_id = int(session_id) if hasattr(session_id, 'item') else session_id
         
         query = """
             SELECT 
@@ -177,36 +697,26 @@ class DatabaseManager:
               AND e.session_id = %s
             ORDER BY e.date_examen, e.heure_debut
         """
-        return self.execute_to_dataframe(query, (prof_id, session_id))
+        return self.execute_prepared('planning_professeur', query, (prof_id, session_id))
     
     def get_professor_surveillance_stats(self, session_id=1):
         """Statistiques de surveillance par professeur"""
-        session_id = int(session_id) if hasattr(session_id, 'item') else session_id
         
         query = """
             SELECT 
                 p.id,
                 CONCAT(p.nom, ' ', p.prenom) as professeur,
                 d.nom as departement,
-                COUNT(e.id) as nb_surveillances,
+                COALESCE(SUM(c.nb), 0) as nb_surveillances,
                 p.max_surveillance_jour,
-                MAX(daily.nb_jour) as max_par_jour
+                MAX(c.nb) as max_par_jour
             FROM professeurs p
             JOIN departements d ON p.dept_id = d.id
-            LEFT JOIN examens e ON e.prof_surveillant_id = p.id AND e.session_id = %s
-            LEFT JOIN LATERAL (
-                SELECT COUNT(*) as nb_jour
-                FROM examens e2
-                WHERE e2.prof_surveillant_id = p.id 
-                  AND e2.session_id = %s
-                GROUP BY e2.date_examen
-                ORDER BY COUNT(*) DESC
-                LIMIT 1
-            ) daily ON TRUE
+            LEFT JOIN prof_daily_load c ON c.prof_id = p.id AND c.session_id = %s
             GROUP BY p.id, p.nom, p.prenom, d.nom, p.max_surveillance_jour
             ORDER BY nb_surveillances DESC
         """
-        return self.execute_to_dataframe(query, (session_id, session_id))
+        return self.execute_prepared('stats_surveillance', query, (session_id,), ttl=CACHE_TTL_SECONDES)
     
     # =====================================================
     # REQUÊTES SPÉCIFIQUES - DÉPARTEMENTS
@@ -214,8 +724,6 @@ class DatabaseManager:
     
     def get_department_stats(self, dept_id, session_id=1):
         """Statistiques d'un département"""
-        dept_id = int(dept_id) if hasattr(dept_id, 'item') else dept_id
-        session_id = int(session_id) if hasattr(session_id, 'item') else session_id
         
         query = """
             SELECT 
@@ -229,7 +737,7 @@ class DatabaseManager:
             LEFT JOIN modules m ON m.formation_id = f.id
             LEFT JOIN etudiants et ON et.formation_id = f.id
             LEFT JOIN examens e ON e.module_id = m.id AND e.session_id = %s
-            LEFT JOIN conflits_detectes c ON c.examen_id = e.id
+            LEFT JOIN conflits_detectes c ON c.examen_id = e.id AND c.session_id = e.session_id
             WHERE d.id = %s
             GROUP BY d.id
         """
@@ -238,8 +746,6 @@ class DatabaseManager:
     
     def get_department_schedule(self, dept_id, session_id=1):
         """Planning complet d'un département"""
-        dept_id = int(dept_id) if hasattr(dept_id, 'item') else dept_id
-        session_id = int(session_id) if hasattr(session_id, 'item') else session_id
         
         query = """
             SELECT 
@@ -262,20 +768,87 @@ class DatabaseManager:
               AND e.session_id = %s
             ORDER BY e.date_examen, e.heure_debut
         """
-        return self.execute_to_dataframe(query, (dept_id, session_id))
+        return self.execute_prepared('planning_departement', query, (dept_id, session_id))
     
     # =====================================================
     # REQUÊTES SPÉCIFIQUES - VICE-DOYEN (VUES GLOBALES)
     # =====================================================
     
-    def get_global_kpis(self):
-        """KPIs globaux de la faculté"""
-        query = "SELECT * FROM vue_kpis_globaux ORDER BY departement"
-        return self.execute_to_dataframe(query)
+    def get_global_kpis(self, session_id):
+        """KPIs globaux de la faculté (pré-agrégés par session et département)"""
+        query = """
+            SELECT 
+                d.nom as departement,
+                k.nb_examens_planifies,
+                k.nb_modules_total,
+                k.nb_etudiants,
+                k.total_inscriptions,
+                k.nb_lieux_utilises,
+                k.capacite_moyenne_lieux,
+                k.nb_conflits_non_resolus
+            FROM kpis_session_departement k
+            JOIN departements d ON k.dept_id = d.id
+            WHERE k.session_id = %s
+            ORDER BY d.nom
+        """
+        # Lignes créées avec la session, puis recalculées à chaque enregistrement du planning
+        return self.execute_to_dataframe(query, (session_id,), ttl=CACHE_TTL_SECONDES)
+    
+    def refresh_kpis(self, session_id, dept_id=None):
+        """Recalculer les KPIs d'une session (un seul département si précisé)"""
+        self.execute_query("SELECT rafraichir_kpis(%s, %s)", (session_id, dept_id), fetch=False)
+        self.cache.bump('kpis_session_departement')
+    
+    def publish_timetables(self, session_id, module_id=None):
+        """Reconstruire les emplois du temps étudiants (un seul module si précisé)"""
+        result = self.execute_query(
+            "SELECT publier_emplois_du_temps(%s, %s) as nb_lignes", (session_id, module_id)
+        )
+        self.cache.bump('emplois_du_temps_etudiants')
+        return result[0]['nb_lignes']
+    
+    def refresh_plan_projections(self, session_id, dept_id=None, module_id=None, exam_ids=None):
+        """Mettre à jour les données dérivées du planning (emplois du temps, conflits, KPIs)
+        
+        exam_ids: examens dont les conflits ont pu changer (None = toute la session)
+        """
+        from src.conflict_engine import detect_and_store_conflicts, detect_and_store_exam_conflicts
+        
+        self.publish_timetables(session_id, module_id)
+        if exam_ids is None:
+            conflits = detect_and_store_conflicts(session_id)
+        else:
+            conflits = detect_and_store_exam_conflicts(session_id, exam_ids)
+        
+        # Un conflit modifié peut concerner un autre département (surveillant, étudiant)
+        self.refresh_kpis(session_id, None if conflits['modifies'] or conflits['resolus'] else dept_id)
+    
+    def _after_exam_change(self, scope, exam_id=None, changes=None, deleted=False):
+        """Rafraîchir les projections touchées par la modification d'un examen"""
+        if scope:
+            from src import conflict_engine, occupancy
+            # Écriture reportée sur les structures en mémoire (pas de rechargement):
+            # seuls les conflits des examens liés à celui-ci sont réexaminés
+            touches = None
+            if changes:
+                touches = conflict_engine.apply_exam_change(scope['session_id'], exam_id, changes)
+            occupancy.apply_exam_change(scope['session_id'], exam_id, changes, deleted)
+            self.refresh_plan_projections(scope['session_id'], scope['dept_id'], scope['module_id'], touches)
+    
+    def get_session_overview(self, session_id=1):
+        """Compteurs de préparation d'une session (une seule requête)"""
+        
+        query = """
+            SELECT 
+                (SELECT COUNT(DISTINCT module_id) FROM inscriptions WHERE session_id = %s) as nb_modules,
+                (SELECT COUNT(*) FROM etudiants) as nb_etudiants,
+                (SELECT COUNT(*) FROM professeurs) as nb_professeurs,
+                (SELECT COUNT(*) FROM lieux_examen WHERE disponible = TRUE) as nb_lieux
+        """
+        return self.execute_query(query, (session_id,))[0]
     
     def get_room_occupation(self, session_id=1):
         """Taux d'occupation des salles"""
-        session_id = int(session_id) if hasattr(session_id, 'item') else session_id
         
         query = """
             SELECT 
@@ -294,11 +867,10 @@ class DatabaseManager:
             )
             ORDER BY date_examen, taux_occupation DESC
         """
-        return self.execute_to_dataframe(query, (session_id,))
+        return self.execute_prepared('occupation_salles', query, (session_id,), ttl=CACHE_TTL_SECONDES)
     
     def get_daily_exam_distribution(self, session_id=1):
         """Distribution des examens par jour"""
-        session_id = int(session_id) if hasattr(session_id, 'item') else session_id
         
         query = """
             SELECT 
@@ -311,7 +883,7 @@ class DatabaseManager:
             GROUP BY date_examen
             ORDER BY date_examen
         """
-        return self.execute_to_dataframe(query, (session_id,))
+        return self.execute_prepared('distribution_journaliere', query, (session_id,), ttl=CACHE_TTL_SECONDES)
     
     # =====================================================
     # DÉTECTION DE CONFLITS
@@ -319,25 +891,26 @@ class DatabaseManager:
     
     def detect_student_conflicts(self, session_id=1):
         """Détecter les conflits étudiants (>1 examen/jour)"""
-        session_id = int(session_id) if hasattr(session_id, 'item') else session_id
         query = "SELECT * FROM detecter_conflits_etudiants(%s)"
         return self.execute_to_dataframe(query, (session_id,))
     
+    def iter_student_conflicts(self, session_id=1, chunk_rows=TAILLE_BLOC_LECTURE):
+        """Conflits étudiants par blocs (exports, sans tout charger en mémoire)"""
+        query = "SELECT * FROM detecter_conflits_etudiants(%s)"
+        return self.iter_dataframes(query, (session_id,), chunk_rows)
+    
     def detect_professor_conflicts(self, session_id=1):
         """Détecter les conflits professeurs (>3 examens/jour)"""
-        session_id = int(session_id) if hasattr(session_id, 'item') else session_id
         query = "SELECT * FROM detecter_conflits_professeurs(%s)"
         return self.execute_to_dataframe(query, (session_id,))
     
     def detect_capacity_conflicts(self, session_id=1):
         """Détecter les dépassements de capacité"""
-        session_id = int(session_id) if hasattr(session_id, 'item') else session_id
         query = "SELECT * FROM detecter_depassement_capacite(%s)"
         return self.execute_to_dataframe(query, (session_id,))
     
-    def get_all_conflicts(self, session_id=1, resolved=False):
-        """Récupérer tous les conflits détectés"""
-        session_id = int(session_id) if hasattr(session_id, 'item') else session_id
+    def get_all_conflicts(self, session_id=1, resolved=False, dept_id=None):
+        """Récupérer les conflits détectés (d'un département si dept_id)"""
         
         query = """
             SELECT 
@@ -351,13 +924,74 @@ class DatabaseManager:
                 m.code as code_module,
                 m.nom as nom_module
             FROM conflits_detectes c
-            JOIN examens e ON c.examen_id = e.id
-            JOIN modules m ON e.module_id = m.id
-            WHERE e.session_id = %s
+            JOIN modules m ON c.module_id = m.id
+            JOIN formations f ON m.formation_id = f.id
+            LEFT JOIN examens e ON c.examen_id = e.id AND e.session_id = c.session_id
+            WHERE c.session_id = %s
               AND c.resolu = %s
+              AND (%s::INT IS NULL OR f.dept_id = %s)
             ORDER BY c.severite DESC, c.date_detection DESC
         """
-        return self.execute_to_dataframe(query, (session_id, resolved))
+        return self.execute_to_dataframe(query, (session_id, resolved, dept_id, dept_id))
+    
+    def store_conflicts(self, session_id, records, modules=None):
+        """Enregistrer en masse les conflits détectés d'une session
+        
+        records: [(examen_id, module_id, cle, type_conflit, description, severite), ...]
+        Les conflits ouverts absents de records sont marqués résolus (parmi ceux de
+        modules seulement si fourni: détection limitée à quelques examens).
+        Les conflits des examens supprimés restent en historique (examen_id NULL).
+        Deux enregistrements de même clé sont fusionnés (sévérité maximale): un seul
+        INSERT ... ON CONFLICT ne peut pas modifier deux fois la même ligne.
+        Retourne {'nouveaux', 'modifies', 'resolus', 'total'}
+        """
+        upsert = """
+            INSERT INTO conflits_detectes (examen_id, session_id, module_id, cle, type_conflit, description, severite)
+            VALUES %s
+            ON CONFLICT (cle) DO UPDATE SET
+                examen_id = EXCLUDED.examen_id,
+                description = EXCLUDED.description,
+                severite = EXCLUDED.severite,
+                resolu = FALSE,
+                date_resolution = NULL,
+                date_detection = CASE WHEN conflits_detectes.resolu
+                                      THEN CURRENT_TIMESTAMP
+                                      ELSE conflits_detectes.date_detection END
+            WHERE conflits_detectes.resolu
+               OR (conflits_detectes.examen_id, conflits_detectes.description, conflits_detectes.severite)
+                  IS DISTINCT FROM (EXCLUDED.examen_id, EXCLUDED.description, EXCLUDED.severite)
+            RETURNING (xmax = 0) as insere
+        """
+        resolve = """
+            UPDATE conflits_detectes c
+            SET resolu = TRUE, date_resolution = CURRENT_TIMESTAMP
+            WHERE c.session_id = %s
+              AND c.resolu = FALSE
+              AND NOT (c.cle = ANY(%s))
+              AND (%s::INT[] IS NULL OR c.module_id = ANY(%s))
+        """
+        
+        started = time.perf_counter()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            # Les lignes inchangées ne sont ni réécrites ni retournées
+            par_cle = {}
+            for examen_id, module_id, cle, type_conflit, description, severite in records:
+                if cle not in par_cle or severite > par_cle[cle][-1]:
+                    par_cle[cle] = (examen_id, session_id, module_id, cle, type_conflit, description, severite)
+            lignes = list(par_cle.values())
+            modifies = execute_values(cursor, upsert, lignes, page_size=1000, fetch=True) if lignes else []
+            cursor.execute(resolve, (session_id, list(par_cle), modules, modules))
+            nb_resolus = cursor.rowcount
+        self._trace(upsert, None, started, len(modifies) + nb_resolus)
+        self.cache.bump('conflits_detectes')
+        
+        return {
+            'nouveaux': sum(1 for (insere,) in modifies if insere),
+            'modifies': len(modifies),
+            'resolus': nb_resolus,
+            'total': len(lignes),
+        }
     
     # =====================================================
     # GESTION DES EXAMENS
@@ -366,31 +1000,65 @@ class DatabaseManager:
     def create_exam(self, module_id, session_id, date_examen, heure_debut, 
                    duree_minutes=90, lieu_id=None, prof_id=None):
         """Créer un nouvel examen"""
-        # Conversion des types
-        module_id = int(module_id) if hasattr(module_id, 'item') else module_id
-        session_id = int(session_id) if hasattr(session_id, 'item') else session_id
-        duree_minutes = int(duree_minutes) if hasattr(duree_minutes, 'item') else duree_minutes
-        if lieu_id:
-            lieu_id = int(lieu_id) if hasattr(lieu_id, 'item') else lieu_id
-        if prof_id:
-            prof_id = int(prof_id) if hasattr(prof_id, 'item') else prof_id
-        
         query = """
             INSERT INTO examens 
             (module_id, session_id, date_examen, heure_debut, duree_minutes, lieu_id, prof_surveillant_id)
             VALUES (%s, %s, %s, %s, %s, %s, %s)
-            RETURNING id
+            RETURNING id, session_id, module_id,
+                (SELECT f.dept_id FROM modules m JOIN formations f ON m.formation_id = f.id
+                 WHERE m.id = examens.module_id) as dept_id
         """
         result = self.execute_query(
             query, 
             (module_id, session_id, date_examen, heure_debut, duree_minutes, lieu_id, prof_id),
             fetch=True
         )
+        self._after_exam_change(result[0] if result else None, result[0]['id'] if result else None, {
+            'date_examen': date_examen, 'heure_debut': heure_debut,
+            'duree_minutes': duree_minutes, 'lieu_id': lieu_id,
+        })
         return result[0]['id'] if result else None
     
-    def update_exam(self, exam_id, **kwargs):
-        """Mettre à jour un examen"""
-        exam_id = int(exam_id) if hasattr(exam_id, 'item') else exam_id
+    def replace_session_exams(self, session_id, examens):
+        """Remplacer tout le planning d'une session (une transaction, annulée en cas d'échec)
+        
+        examens: dicts avec les colonnes de INSERT INTO examens ci-dessous
+        """
+        colonnes = ('module_id', 'session_id', 'date_examen', 'heure_debut', 'duree_minutes',
+                    'lieu_id', 'prof_surveillant_id', 'nb_inscrits', 'statut')
+        insert = f"INSERT INTO examens ({', '.join(colonnes)}) VALUES %s"
+        
+        started = time.perf_counter()
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM examens WHERE session_id = %s", (session_id,))
+            execute_values(cursor, insert, [tuple(e[c] for c in colonnes) for e in examens], page_size=1000)
+        self._trace(insert, None, started, len(examens))
+        self.cache.bump('examens')
+    
+    def _exam_session(self, exam_id):
+        """Session d'un examen (appelants qui ne la fournissent pas: toutes les partitions lues)"""
+        result = self.execute_query("SELECT session_id FROM examens WHERE id = %s", (exam_id,))
+        return result[0]['session_id'] if result else None
+    
+    def _write_exam(self, query, params):
+        """Écrire un examen (RETURNING): cache invalidé seulement si une ligne a changé"""
+        started = time.perf_counter()
+        with self.get_connection() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor.execute(query, params)
+            result = cursor.fetchall()
+        self._trace(query, params, started, len(result))
+        if result:
+            self.cache.bump('examens')
+        return result[0] if result else None
+    
+    def update_exam(self, exam_id, *, session_id=None, **kwargs):
+        """Mettre à jour un examen
+        
+        session_id: une seule partition parcourue (retrouvée par l'id si absente)
+        Retourne False si aucun examen ne correspond
+        """
         
         allowed_fields = ['date_examen', 'heure_debut', 'duree_minutes', 'lieu_id', 'prof_surveillant_id', 'statut']
         updates = []
@@ -398,26 +1066,147 @@ class DatabaseManager:
         
         for field, value in kwargs.items():
             if field in allowed_fields:
-                # Convertir les types numpy
-                if hasattr(value, 'item'):
-                    value = int(value)
                 updates.append(f"{field} = %s")
                 values.append(value)
         
         if not updates:
             return False
         
-        values.append(exam_id)
-        query = f"UPDATE examens SET {', '.join(updates)} WHERE id = %s"
-        self.execute_query(query, values, fetch=False)
-        return True
+        if session_id is None:
+            session_id = self._exam_session(exam_id)
+            if session_id is None:
+                return False
+        
+        values.extend([exam_id, session_id])
+        query = f"""
+            UPDATE examens SET {', '.join(updates)} WHERE id = %s AND session_id = %s
+            RETURNING session_id, module_id,
+                (SELECT f.dept_id FROM modules m JOIN formations f ON m.formation_id = f.id
+                 WHERE m.id = examens.module_id) as dept_id
+        """
+        scope = self._write_exam(query, values)
+        if scope:
+            self._after_exam_change(scope, exam_id, {k: v for k, v in kwargs.items() if k in allowed_fields})
+        return bool(scope)
     
-    def delete_exam(self, exam_id):
-        """Supprimer un examen"""
-        exam_id = int(exam_id) if hasattr(exam_id, 'item') else exam_id
-        query = "DELETE FROM examens WHERE id = %s"
-        self.execute_query(query, (exam_id,), fetch=False)
-        return True
+    def delete_exam(self, exam_id, *, session_id=None):
+        """Supprimer un examen
+        
+        session_id: une seule partition parcourue (retrouvée par l'id si absente)
+        Retourne False si aucun examen ne correspond
+        """
+        if session_id is None:
+            session_id = self._exam_session(exam_id)
+            if session_id is None:
+                return False
+        
+        query = """
+            DELETE FROM examens WHERE id = %s AND session_id = %s
+            RETURNING session_id, module_id,
+                (SELECT f.dept_id FROM modules m JOIN formations f ON m.formation_id = f.id
+                 WHERE m.id = examens.module_id) as dept_id
+        """
+        scope = self._write_exam(query, (exam_id, session_id))
+        if scope:
+            self._after_exam_change(scope, exam_id, deleted=True)
+        return bool(scope)
+    
+    def archive_academic_year(self, annee_universitaire):
+        """Détacher les partitions examens/inscriptions d'une année vers le schéma archives"""
+        self.execute_query("CALL archiver_annee(%s)", (annee_universitaire,), fetch=False)
+        self.invalidate()
+    
+    # =====================================================
+    # TÉLÉMÉTRIE DE L'OPTIMISEUR
+    # =====================================================
+    
+    def record_optimizer_run(self, run):
+        """Enregistrer une exécution de l'optimiseur"""
+        run = dict(run)
+        for field in ('temps_etapes', 'parametres'):
+            run[field] = Json(run[field])
+        
+        query = """
+            INSERT INTO optimizer_runs
+            (session_id, mode, statut, raison_arret, erreur,
+             nb_modules, nb_inscriptions, nb_lieux, nb_professeurs,
+             nb_variables, nb_contraintes, temps_etapes, temps_resolution, temps_total,
+             nb_branches, nb_conflits, objectif, borne, parametres, empreinte_donnees)
+            VALUES (%(session_id)s, %(mode)s, %(statut)s, %(raison_arret)s, %(erreur)s,
+                    %(nb_modules)s, %(nb_inscriptions)s, %(nb_lieux)s, %(nb_professeurs)s,
+                    %(nb_variables)s, %(nb_contraintes)s, %(temps_etapes)s, %(temps_resolution)s,
+                    %(temps_total)s, %(nb_branches)s, %(nb_conflits)s, %(objectif)s, %(borne)s,
+                    %(parametres)s, %(empreinte_donnees)s)
+        """
+        self.execute_query(query, run, fetch=False)
+    
+    def get_optimizer_runs(self, session_id=None, limit=200):
+        """Historique des exécutions de l'optimiseur (plus récentes d'abord)"""
+        query = """
+            SELECT id, session_id, mode, statut, raison_arret, created_at,
+                   nb_modules, nb_inscriptions, nb_variables, nb_contraintes,
+                   temps_resolution, temps_total, temps_etapes,
+                   nb_branches, nb_conflits, objectif, borne, empreinte_donnees
+            FROM optimizer_runs
+        """
+        params = []
+        
+        if session_id:
+            query += " WHERE session_id = %s"
+            params.append(session_id)
+        
+        query += " ORDER BY created_at DESC LIMIT %s"
+        params.append(limit)
+        
+        return self.execute_to_dataframe(query, params)
+    
+    # =====================================================
+    # RECHERCHE
+    # =====================================================
+    
+    def search(self, entity, term, limit=20):
+        """Recherche classée d'étudiants, professeurs ou modules
+        
+        Matricule/code: préfixe sur l'index text_pattern_ops.
+        Sinon: sous-chaîne ou similarité trigramme (fautes de frappe), par score.
+        """
+        if entity not in SEARCH_ENTITIES:
+            raise ValueError(f"Entité de recherche inconnue: {entity}")
+        
+        term = ' '.join(term.split())
+        if not term:
+            return pd.DataFrame()
+        
+        spec = SEARCH_ENTITIES[entity]
+        echappe = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        
+        if _RE_IDENTIFIANT.match(term):
+            query = f"""
+                SELECT {spec['colonnes']}, 1.0 as score
+                FROM {spec['source']}
+                WHERE {spec['identifiant']} LIKE %s
+                ORDER BY {spec['identifiant']}
+                LIMIT %s
+            """
+            results = self.execute_prepared(
+                f'recherche_{entity}_identifiant', query,
+                (echappe.upper() + '%', limit), types=('text', 'integer')
+            )
+            if not results.empty:
+                return results
+        
+        query = f"""
+            SELECT {spec['colonnes']}, similarity({spec['texte']}, %s) as score
+            FROM {spec['source']}
+            WHERE {spec['texte']} ILIKE %s
+               OR {spec['texte']} %% %s
+            ORDER BY score DESC, {spec['texte']}
+            LIMIT %s
+        """
+        return self.execute_prepared(
+            f'recherche_{entity}_texte', query,
+            (term, f"%{echappe}%", term, limit), types=('text', 'text', 'text', 'integer')
+        )
     
     # =====================================================
     # UTILITAIRES
@@ -426,11 +1215,10 @@ class DatabaseManager:
     def get_departments(self):
         """Liste de tous les départements"""
         query = "SELECT * FROM departements ORDER BY nom"
-        return self.execute_to_dataframe(query)
+        return self.execute_to_dataframe(query, ttl=CACHE_TTL_SECONDES)
     
     def get_formations_by_department(self, dept_id):
         """Formations d'un département"""
-        dept_id = int(dept_id) if hasattr(dept_id, 'item') else dept_id
         
         query = """
             SELECT id, nom, code, niveau, nb_modules
@@ -438,61 +1226,88 @@ class DatabaseManager:
             WHERE dept_id = %s
             ORDER BY niveau, nom
         """
-        return self.execute_to_dataframe(query, (dept_id,))
+        return self.execute_to_dataframe(query, (dept_id,), ttl=CACHE_TTL_SECONDES)
     
     def get_available_rooms(self, date_examen, heure_debut, duree_minutes, min_capacity=0):
         """Salles disponibles à une date/heure donnée"""
-        duree_minutes = int(duree_minutes) if hasattr(duree_minutes, 'item') else duree_minutes
-        min_capacity = int(min_capacity) if hasattr(min_capacity, 'item') else min_capacity
         
+        # Chevauchement sur la plage indexée (GiST lieu_id, creneau de excl_examens_lieu)
         query = """
             SELECT l.*
             FROM lieux_examen l
             WHERE l.disponible = TRUE
               AND l.capacite_examen >= %s
-              AND l.id NOT IN (
-                  SELECT lieu_id
-                  FROM examens
-                  WHERE date_examen = %s
-                    AND lieu_id IS NOT NULL
-                    AND (
-                        (heure_debut <= %s AND heure_debut + (duree_minutes || ' minutes')::INTERVAL > %s)
-                        OR
-                        (heure_debut < %s + (%s || ' minutes')::INTERVAL AND heure_debut + (duree_minutes || ' minutes')::INTERVAL >= %s + (%s || ' minutes')::INTERVAL)
-                    )
+              AND NOT EXISTS (
+                  SELECT 1
+                  FROM examens e
+                  WHERE e.lieu_id = l.id
+                    AND e.creneau && %s
+                    AND e.statut IS DISTINCT FROM 'annule'
+              )
+              AND NOT EXISTS (
+                  SELECT 1
+                  FROM fermetures_lieux fl
+                  WHERE fl.lieu_id = l.id
+                    AND fl.periode @> %s
               )
             ORDER BY l.capacite_examen DESC
         """
-        return self.execute_to_dataframe(query, (
-            min_capacity, date_examen, heure_debut, heure_debut,
-            heure_debut, duree_minutes, heure_debut, duree_minutes
-        ))
+        return self.execute_prepared('salles_disponibles', query, (
+            min_capacity, exam_interval(date_examen, heure_debut, duree_minutes), date_examen
+        ), types=('integer', 'tsrange', 'date'))
+    
+    def get_room_closures(self, dates=None):
+        """Fermetures temporaires de salles (celles qui couvrent une des dates si précisé)"""
+        query = """
+            SELECT lieu_id, lower(periode) as date_debut, upper(periode) - 1 as date_fin
+            FROM fermetures_lieux
+            WHERE %s::DATE[] IS NULL
+               OR periode && ANY(SELECT daterange(d, d, '[]') FROM unnest(%s::DATE[]) d)
+        """
+        return self.execute_to_dataframe(query, (dates, dates), ttl=CACHE_TTL_SECONDES)
     
-    def get_available_professors(self, date_examen, dept_id=None):
-        """Professeurs disponibles pour surveillance"""
+    def get_available_professors(self, date_examen, dept_id=None, heure_debut=None, duree_minutes=90):
+        """Professeurs disponibles pour surveillance (libres sur la plage si heure_debut)"""
         query = """
             SELECT 
                 p.*,
-                COALESCE(daily.nb_surveillances, 0) as surveillances_ce_jour
+                COALESCE(daily.nb, 0) as surveillances_ce_jour
             FROM professeurs p
-            LEFT JOIN LATERAL (
-                SELECT COUNT(*) as nb_surveillances
-                FROM examens e
-                WHERE e.prof_surveillant_id = p.id
-                  AND e.date_examen = %s
-            ) daily ON TRUE
-            WHERE daily.nb_surveillances < p.max_surveillance_jour
+            LEFT JOIN (
+                SELECT prof_id, SUM(nb) as nb
+                FROM prof_daily_load
+                WHERE date_examen = %s
+                GROUP BY prof_id
+            ) daily ON daily.prof_id = p.id
+            WHERE COALESCE(daily.nb, 0) < p.max_surveillance_jour
         """
         params = [date_examen]
+        types = ['date']
+        name = 'professeurs_disponibles'
+        
+        if heure_debut is not None:
+            query += """
+              AND NOT EXISTS (
+                  SELECT 1
+                  FROM examens e
+                  WHERE e.prof_surveillant_id = p.id
+                    AND e.creneau && %s
+                    AND e.statut IS DISTINCT FROM 'annule'
+              )
+            """
+            params.append(exam_interval(date_examen, heure_debut, duree_minutes))
+            types.append('tsrange')
+            name += '_creneau'
         
         if dept_id:
-            dept_id = int(dept_id) if hasattr(dept_id, 'item') else dept_id
             query += " AND p.dept_id = %s"
             params.append(dept_id)
+            types.append('integer')
+            name += '_dept'
         
-        query += " ORDER BY daily.nb_surveillances, p.nom"
+        query += " ORDER BY surveillances_ce_jour, p.nom"
         
-        return self.execute_to_dataframe(query, params)
+        return self.execute_prepared(name, query, params, types=types)
 
 # Instance globale
 db = DatabaseManager()
\ No newline at end of file
@@ -0,0 +1,422 @@
+"""
+Amélioration continue des plannings publiés
+Recherche à grand voisinage (LNS) en arrière-plan sur une copie du planning:
+chaque itération libère un département, un jour ou une salle, fige le reste
+et enregistre les versions strictement meilleures comme plans candidats
+"""
+
+from ortools.sat.python import cp_model
+import os
+import random
+import threading
+import time as time_module
+from datetime import timedelta
+from src.db_connection import db
+from src.optimizer import ExamScheduleOptimizer
+
+# Paramètres de la recherche
+VOISINAGES = ('departement', 'jour', 'salle')
+TEMPS_PAR_ITERATION = 10.0
+PAUSE_ENTRE_ITERATIONS = 2.0
+PAUSE_MAX_APRES_ERREUR = 300.0  # Attente doublée à chaque erreur consécutive, plafonnée
+TAILLE_MIN_VOISINAGE = 2
+
+# Empreinte du planning publié: change à chaque régénération ou édition d'examen
+EMPREINTE_PLAN_QUERY = """
+    SELECT md5(COALESCE(string_agg(
+        concat_ws('|', id, module_id, date_examen, heure_debut, duree_minutes,
+                  lieu_id, prof_surveillant_id, statut),
+        ';' ORDER BY id), '')) as empreinte
+    FROM examens
+    WHERE session_id = %s
+"""
+
+
+class _StopOnRequest(cp_model.CpSolverSolutionCallback):
+    """Interrompre la résolution en cours dès que l'arrêt du thread est demandé"""
+    
+    def __init__(self, stop_event):
+        super().__init__()
+        self._stop_event = stop_event
+    
+    def OnSolutionCallback(self):
+        if self._stop_event.is_set():
+            self.StopSearch()
+
+
+class PlanImprovementWorker(threading.Thread):
+    """Thread d'amélioration d'un planning publié (ne bloque jamais l'interface)"""
+    
+    def __init__(self, session_id, time_per_iteration=TEMPS_PAR_ITERATION,
+                 pause=PAUSE_ENTRE_ITERATIONS, max_iterations=None, num_workers=None, seed=None):
+        super().__init__(daemon=True, name=f'amelioration-session-{session_id}')
+        self.session_id = session_id
+        self.time_per_iteration = time_per_iteration
+        self.pause = pause
+        self.max_iterations = max_iterations
+        # Cœurs inoccupés: on en laisse un pour l'application
+        self.num_workers = num_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.random = random.Random(seed)
+        
+        self._stop_event = threading.Event()
+        
+        self.optimizer = None
+        self.base_proto = None
+        self.plan_signature = None     # Planning publié du modèle construit
+        self.rejected_signature = None  # Planning publié infaisable pour le modèle strict
+        self.staged = {}       # module_id -> {'jour', 'creneau', 'lieu', 'prof'} (indices du modèle)
+        self.free_modules = set()  # modules non représentables dans le modèle: toujours libres
+        self.objective = None
+        
+        # Suivi
+        self.iterations = 0
+        self.improvements = 0
+        self.last_error = None
+        self.consecutive_errors = 0
+    
+    def stop(self):
+        """Demander l'arrêt du thread (interrompt la résolution en cours)"""
+        self._stop_event.set()
+        optimizer = self.optimizer
+        if optimizer is not None:
+            optimizer.solver.StopSearch()
+    
+    @property
+    def stopped(self):
+        return self._stop_event.is_set()
+    
+    def run(self):
+        while not self.stopped:
+            if self.max_iterations is not None and self.iterations >= self.max_iterations:
+                break
+            
+            pause = self.pause
+            try:
+                signature = self._current_signature()
+                # Planning refusé: rien à reconstruire tant qu'il n'est pas modifié
+                if signature != self.rejected_signature:
+                    if self.optimizer is None or signature != self.plan_signature:
+                        self._prepare(signature)
+                    if not self.stopped:
+                        self._iterate()
+                    self.last_error = None
+                self.consecutive_errors = 0
+            except Exception as e:
+                if self.stopped:
+                    break
+                # Le modèle construit est conservé: reconstruit seulement si le planning change
+                self.consecutive_errors += 1
+                self.last_error = str(e)
+                pause = min(self.pause * 2 ** self.consecutive_errors, PAUSE_MAX_APRES_ERREUR)
+                print(f"❌ Amélioration session {self.session_id}: {e} (nouvel essai dans {pause:.0f} s)")
+            
+            self._stop_event.wait(pause)
+    
+    # =====================================================
+    # PRÉPARATION DE LA COPIE DE TRAVAIL
+    # =====================================================
+    
+    def _current_signature(self):
+        """Empreinte du planning publié (détecte une régénération ou une édition)"""
+        return db.execute_query(EMPREINTE_PLAN_QUERY, (self.session_id,))[0]['empreinte']
+    
+    def _prepare(self, signature):
+        """Charger le planning publié et construire le modèle une seule fois
+        
+        signature: empreinte du planning lu, retenue seulement si la préparation aboutit
+        """
+        plan = db.execute_to_dataframe("""
+            SELECT module_id, date_examen, heure_debut, lieu_id, prof_surveillant_id
+            FROM examens
+            WHERE session_id = %s
+        """, (self.session_id,))
+        
+        if plan.empty:
+            raise ValueError("Aucun planning publié pour cette session")
+        
+        date_debut = min(plan['date_examen'])
+        nb_jours = (max(plan['date_examen']) - date_debut).days + 1
+        
+        optimizer = ExamScheduleOptimizer(
+            self.session_id, date_debut.strftime('%Y-%m-%d'), nb_jours,
+            time_limit=self.time_per_iteration
+        )
+        optimizer.solver.parameters.num_search_workers = self.num_workers
+        optimizer.solver.parameters.max_time_in_seconds = self.time_per_iteration
+        optimizer.load_data()
+        optimizer.create_variables()
+        optimizer.add_constraints()
+        optimizer.set_objective()
+        
+        # Publié avant la résolution de référence: stop() peut l'interrompre
+        self.optimizer = optimizer
+        self.base_proto = optimizer.model.Proto()
+        
+        # Traduire le planning publié en indices du modèle
+        creneaux = {c: i for i, c in enumerate(optimizer.creneaux)}
+        lieux = {lieu_id: i for i, lieu_id in enumerate(optimizer.lieux['id'])}
+        profs = {prof_id: i for i, prof_id in enumerate(optimizer.professeurs['id'])}
+        
+        self.staged = {}
+        self.free_modules = set(optimizer.exam_vars.keys())
+        for _, exam in plan.iterrows():
+            module_id = exam['module_id']
+            if module_id not in optimizer.exam_vars:
+                continue
+            values = {
+                'jour': (exam['date_examen'] - date_debut).days,
+                'creneau': creneaux.get(exam['heure_debut']),
+                'lieu': lieux.get(exam['lieu_id']),
+                'prof': profs.get(exam['prof_surveillant_id']),
+            }
+            if None not in values.values():
+                self.staged[module_id] = values
+                self.free_modules.discard(module_id)
+        
+        # Objectif de référence du planning publié
+        status, objective, values = self._solve_neighbourhood(set())
+        if self.stopped:
+            return
+        if status == cp_model.UNKNOWN:
+            raise ValueError("Objectif de référence non obtenu dans le temps imparti")
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            # Planning souple, forcé ou salle fermée: attendre la prochaine modification
+            self.optimizer = None
+            self.rejected_signature = signature
+            raise ValueError("Le planning publié ne respecte pas les contraintes du modèle "
+                             "(amélioration suspendue jusqu'à sa prochaine modification)")
+        
+        self.staged.update(values)
+        self.objective = objective
+        self.plan_signature = signature
+        self.rejected_signature = None
+        print(f"✓ Amélioration session {self.session_id}: objectif de référence {objective:.0f}")
+    
+    # =====================================================
+    # RECHERCHE À GRAND VOISINAGE
+    # =====================================================
+    
+    def _pick_neighbourhood(self):
+        """Choisir un voisinage: tous les examens d'un département, d'un jour ou d'une salle"""
+        kind = self.random.choice(VOISINAGES)
+        modules = self.optimizer.modules.set_index('id')
+        
+        if kind == 'departement':
+            cible = self.random.choice(sorted(set(modules['dept_id'])))
+            libres = {m for m in self.staged if modules.loc[m, 'dept_id'] == cible}
+        elif kind == 'jour':
+            cible = self.random.choice(sorted({v['jour'] for v in self.staged.values()}))
+            libres = {m for m, v in self.staged.items() if v['jour'] == cible}
+        else:
+            cible = self.random.choice(sorted({v['lieu'] for v in self.staged.values()}))
+            libres = {m for m, v in self.staged.items() if v['lieu'] == cible}
+            cible = self.optimizer.lieux.iloc[cible]['nom']
+        
+        return f"{kind}:{cible}", libres
+    
+    def _solve_neighbourhood(self, libres):
+        """Résoudre le modèle en figeant tout sauf le voisinage (et les modules libres)"""
+        model = cp_model.CpModel()
+        model.Proto().CopyFrom(self.base_proto)
+        
+        libres = libres | self.free_modules
+        for module_id, vars_dict in self.optimizer.exam_vars.items():
+            if module_id not in self.staged:
+                continue
+            for key, value in self.staged[module_id].items():
+                var = model.GetIntVarFromProtoIndex(vars_dict[key].Index())
+                if module_id in libres:
+                    model.AddHint(var, value)
+                else:
+                    model.Add(var == value)
+        
+        solver = self.optimizer.solver
+        if self.stopped:
+            return cp_model.UNKNOWN, None, {}
+        status = solver.Solve(model, _StopOnRequest(self._stop_event))
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return status, None, {}
+        
+        values = {
+            module_id: {key: solver.Value(self.optimizer.exam_vars[module_id][key])
+                        for key in ('jour', 'creneau', 'lieu', 'prof')}
+            for module_id in libres
+        }
+        return status, solver.ObjectiveValue(), values
+    
+    def _iterate(self):
+        """Une itération LNS: accepter uniquement une amélioration stricte"""
+        self.iterations += 1
+        voisinage, libres = self._pick_neighbourhood()
+        if len(libres) < TAILLE_MIN_VOISINAGE:
+            return
+        
+        start_time = time_module.time()
+        status, objective, values = self._solve_neighbourhood(libres)
+        if self.stopped or objective is None or objective <= self.objective:
+            return
+        
+        # Télémétrie: seules les itérations retenues sont enregistrées
+        self.optimizer.status = status
+        self.optimizer.timings = {'resolution': time_module.time() - start_time}
+        self.optimizer.save_run('amelioration')
+        
+        delta = objective - self.objective
+        self.staged.update(values)
+        self.objective = objective
+        self.improvements += 1
+        
+        plan_id = self._save_candidate(voisinage, delta)
+        print(f"✓ Plan candidat #{plan_id} ({voisinage}): objectif {objective:.0f} (+{delta:.0f})")
+    
+    def _save_candidate(self, voisinage, delta):
+        """Enregistrer la copie de travail comme plan candidat"""
+        optimizer = self.optimizer
+        rows = []
+        for module_id, values in self.staged.items():
+            rows.append((
+                int(module_id),
+                optimizer.date_debut + timedelta(days=values['jour']),
+                optimizer.creneaux[values['creneau']],
+                int(optimizer.lieux.iloc[values['lieu']]['id']),
+                int(optimizer.professeurs.iloc[values['prof']]['id'])
+            ))
+        
+        with db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO plans_candidats (session_id, objectif, delta_objectif, voisinage, empreinte_plan)
+                VALUES (%s, %s, %s, %s, %s)
+                RETURNING id
+            """, (self.session_id, self.objective, delta, voisinage, self.plan_signature))
+            plan_id = cursor.fetchone()[0]
+            
+            cursor.executemany("""
+                INSERT INTO plans_candidats_examens
+                (plan_id, module_id, date_examen, heure_debut, lieu_id, prof_surveillant_id)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, [(plan_id,) + row for row in rows])
+        
+        return plan_id
+
+
+# =====================================================
+# GESTION DES THREADS ET DES PLANS CANDIDATS
+# =====================================================
+
+_workers = {}
+_workers_lock = threading.Lock()
+
+
+def start_improvement_worker(session_id, **kwargs):
+    """Démarrer (une seule fois par session) l'amélioration en arrière-plan"""
+    with _workers_lock:
+        worker = _workers.get(session_id)
+        if worker is None or not worker.is_alive():
+            worker = PlanImprovementWorker(session_id, **kwargs)
+            _workers[session_id] = worker
+            worker.start()
+        return worker
+
+
+def stop_improvement_worker(session_id):
+    """Arrêter l'amélioration en arrière-plan d'une session"""
+    with _workers_lock:
+        worker = _workers.pop(session_id, None)
+    if worker is not None:
+        worker.stop()
+    return worker
+
+
+def get_improvement_worker(session_id):
+    """Thread d'amélioration actif pour une session (ou None)"""
+    worker = _workers.get(session_id)
+    return worker if worker is not None and worker.is_alive() else None
+
+
+def get_candidate_plans(session_id, statut='candidat'):
+    """Plans candidats d'une session, les meilleurs d'abord"""
+    return db.execute_to_dataframe("""
+        SELECT id, objectif, delta_objectif, voisinage, statut, created_at
+        FROM plans_candidats
+        WHERE session_id = %s AND statut = %s
+        ORDER BY objectif DESC, created_at DESC
+    """, (session_id, statut))
+
+
+def apply_candidate_plan(plan_id):
+    """Publier un plan candidat: mettre à jour les examens de la session
+    
+    Refusé (candidat marqué obsolète) si le planning publié a changé depuis le
+    calcul du candidat: une édition manuelle ne doit pas être écrasée
+    """
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT session_id, empreinte_plan, statut
+            FROM plans_candidats
+            WHERE id = %s
+            FOR UPDATE
+        """, (plan_id,))
+        session_id, empreinte, statut = cursor.fetchone()
+        
+        # Examens verrouillés: pas d'édition entre la vérification et la publication
+        cursor.execute("SELECT id FROM examens WHERE session_id = %s FOR UPDATE", (session_id,))
+        cursor.execute(EMPREINTE_PLAN_QUERY, (session_id,))
+        a_jour = statut == 'candidat' and cursor.fetchone()[0] == empreinte
+        
+        if a_jour:
+            cursor.execute("""
+                UPDATE examens e
+                SET date_examen = c.date_examen,
+                    heure_debut = c.heure_debut,
+                    lieu_id = c.lieu_id,
+                    prof_surveillant_id = c.prof_surveillant_id
+                FROM plans_candidats_examens c
+                WHERE c.plan_id = %s
+                  AND e.module_id = c.module_id
+                  AND e.session_id = %s
+            """, (plan_id, session_id))
+            nb_examens = cursor.rowcount
+            
+            # Les autres candidats portaient sur l'ancien planning
+            cursor.execute("""
+                UPDATE plans_candidats
+                SET statut = CASE WHEN id = %s THEN 'applique' ELSE 'obsolete' END
+                WHERE session_id = %s
+                  AND statut = 'candidat'
+            """, (plan_id, session_id))
+        else:
+            cursor.execute("""
+                UPDATE plans_candidats SET statut = 'obsolete'
+                WHERE id = %s AND statut = 'candidat'
+            """, (plan_id,))
+    
+    if not a_jour:
+        db.invalidate('plans_candidats')
+        return {
+            'success': False,
+            'message': "Le planning publié a changé depuis le calcul de ce plan: candidat obsolète",
+            'nb_examens': 0
+        }
+    
+    db.invalidate('examens', 'plans_candidats')
+    db.refresh_plan_projections(session_id)
+    return {'success': True, 'message': f"{nb_examens} examens mis à jour", 'nb_examens': nb_examens}
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Amélioration continue d'un planning publié")
+    parser.add_argument('--session', type=int, default=1)
+    parser.add_argument('--iterations', type=int, default=None)
+    parser.add_argument('--temps', type=float, default=TEMPS_PAR_ITERATION, help="Secondes par itération")
+    args = parser.parse_args()
+    
+    worker = PlanImprovementWorker(args.session, time_per_iteration=args.temps, max_iterations=args.iterations)
+    worker.start()
+    try:
+        worker.join()
+    except KeyboardInterrupt:
+        worker.stop()
+        worker.join()
@@ -0,0 +1,234 @@
+"""
+Occupation des salles en mémoire
+Grille salles x jours x pas de 15 minutes (compteurs NumPy) d'une session,
+tenue à jour à chaque écriture d'examen: salles libres pour une plage
+horaire et taux d'occupation par créneau sans requête
+"""
+
+import numpy as np
+import pandas as pd
+import threading
+import time
+from src.db_connection import db, CACHE_TTL_SECONDES
+from src.conflict_engine import minutes
+
+# Grille: une journée complète découpée en pas de PAS_MINUTES
+PAS_MINUTES = 15
+NB_CELLULES = 24 * 60 // PAS_MINUTES
+
+# Plage horaire retenue pour les taux d'occupation
+HEURE_OUVERTURE = 8
+HEURE_FERMETURE = 20
+
+# Tables lues par la grille (versions du cache de DatabaseManager)
+TABLES_SOURCES = ('examens', 'lieux_examen', 'fermetures_lieux')
+
+
+def _cells(debut, duree):
+    """Cellules [c0, c1) couvertes par une plage (arrondie au pas englobant)"""
+    c0 = max(0, debut // PAS_MINUTES)
+    c1 = min(NB_CELLULES, -(-(debut + duree) // PAS_MINUTES))
+    return c0, c1
+
+
+class RoomOccupancy:
+    """Occupation des salles d'une session"""
+    
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.versions = None
+        self.loaded_at = None
+    
+    def load(self):
+        """Charger les salles et les examens de la session"""
+        lieux = db.execute_to_dataframe("SELECT * FROM lieux_examen ORDER BY capacite_examen DESC, id")
+        examens = db.execute_to_dataframe("""
+            SELECT id, lieu_id, date_examen, heure_debut, duree_minutes, statut
+            FROM examens
+            WHERE session_id = %s
+        """, (self.session_id,))
+        fermetures = db.get_room_closures()
+        
+        self.versions = db.cache.versions(TABLES_SOURCES)
+        return self.build(lieux, examens, fermetures)
+    
+    def build(self, lieux, examens, fermetures=None):
+        """Construire la grille à partir des DataFrames chargés"""
+        self.loaded_at = time.monotonic()
+        
+        self.lieux = lieux.reset_index(drop=True)
+        self.lieu_index = {lid: i for i, lid in enumerate(self.lieux['id'])}
+        self.capacites = self.lieux['capacite_examen'].to_numpy(dtype=np.int64)
+        self.disponibles = self.lieux['disponible'].fillna(False).to_numpy(dtype=bool)
+        
+        # Fermetures temporaires: (indice de salle, premier jour, dernier jour), None = sans limite
+        self.fermetures = [] if fermetures is None else [
+            (self.lieu_index[f.lieu_id],
+             None if pd.isna(f.date_debut) else f.date_debut,
+             None if pd.isna(f.date_fin) else f.date_fin)
+            for f in fermetures.itertuples(index=False) if f.lieu_id in self.lieu_index
+        ]
+        
+        # Placement de chaque examen non annulé: (indice de salle ou -1, date, début en minutes, durée)
+        # Les examens annulés restent connus: les modifier ne les replace pas dans la grille
+        self.annules = set()
+        if 'statut' in examens:
+            annules = examens['statut'] == 'annule'
+            self.annules = set(examens.loc[annules, 'id'].astype(int))
+            examens = examens[~annules]
+        self.placements = {
+            int(e.id): (self.lieu_index.get(e.lieu_id, -1) if pd.notna(e.lieu_id) else -1,
+                        e.date_examen, minutes(e.heure_debut),
+                        90 if pd.isna(e.duree_minutes) else int(e.duree_minutes))
+            for e in examens.itertuples(index=False)
+        }
+        
+        self.dates = sorted({date for _, date, _, _ in self.placements.values()})
+        self.date_index = {d: j for j, d in enumerate(self.dates)}
+        
+        # Remplissage vectorisé: +1 au début, -1 à la fin, puis somme cumulée
+        places = [(l, self.date_index[d], *_cells(debut, duree))
+                  for l, d, debut, duree in self.placements.values() if l >= 0]
+        bornes = np.zeros((len(self.lieux), len(self.dates), NB_CELLULES + 1), dtype=np.int16)
+        if places:
+            l, j, c0, c1 = np.array(places, dtype=np.int64).T
+            np.add.at(bornes, (l, j, c0), 1)
+            np.add.at(bornes, (l, j, c1), -1)
+        self.grille = np.cumsum(bornes, axis=2, dtype=np.int16)[:, :, :NB_CELLULES]
+        
+        return self
+    
+    # =====================================================
+    # REQUÊTES
+    # =====================================================
+    
+    def free_room_mask(self, date_examen, heure_debut, duree_minutes, min_capacity=0):
+        """Masque des salles disponibles, de capacité suffisante et libres sur la plage"""
+        libres = self.disponibles & (self.capacites >= min_capacity)
+        for l, debut, fin in self.fermetures:
+            if (debut is None or debut <= date_examen) and (fin is None or date_examen <= fin):
+                libres[l] = False
+        j = self.date_index.get(date_examen)
+        if j is not None:
+            c0, c1 = _cells(minutes(heure_debut), int(duree_minutes))
+            libres &= ~self.grille[:, j, c0:c1].any(axis=1)
+        return libres
+    
+    def free_rooms(self, date_examen, heure_debut, duree_minutes, min_capacity=0):
+        """Salles libres (mêmes colonnes et ordre que get_available_rooms)"""
+        return self.lieux[self.free_room_mask(date_examen, heure_debut, duree_minutes, min_capacity)]
+    
+    def slot_occupancy(self):
+        """Taux d'occupation des salles disponibles par jour et par pas horaire"""
+        c0, c1 = HEURE_OUVERTURE * 60 // PAS_MINUTES, HEURE_FERMETURE * 60 // PAS_MINUTES
+        occupees = ((self.grille[:, :, c0:c1] > 0) & self.disponibles[:, None, None]).sum(axis=0)
+        nb_salles = max(int(self.disponibles.sum()), 1)
+        
+        heures = [f"{c * PAS_MINUTES // 60:02d}:{c * PAS_MINUTES % 60:02d}" for c in range(c0, c1)]
+        return pd.DataFrame({
+            'date_examen': np.repeat(np.array(self.dates, dtype=object), c1 - c0),
+            'heure': np.tile(heures, len(self.dates)),
+            'nb_salles_occupees': occupees.ravel(),
+            'taux_occupation': np.round(occupees.ravel() * 100 / nb_salles, 2),
+        })
+    
+    # =====================================================
+    # MISE À JOUR INCRÉMENTALE
+    # =====================================================
+    
+    def _day(self, date_examen):
+        """Indice d'un jour (ajoute une colonne pour une nouvelle date)"""
+        if date_examen not in self.date_index:
+            self.date_index[date_examen] = len(self.dates)
+            self.dates.append(date_examen)
+            self.grille = np.pad(self.grille, ((0, 0), (0, 1), (0, 0)))
+        return self.date_index[date_examen]
+    
+    def _mark(self, placement, delta):
+        l, date_examen, debut, duree = placement
+        if l >= 0:
+            j = self._day(date_examen)
+            c0, c1 = _cells(debut, duree)
+            self.grille[l, j, c0:c1] += delta
+    
+    def move_exam(self, exam_id, **changes):
+        """Ajouter ou déplacer un examen (champs de create_exam/update_exam)
+        
+        Un examen annulé libère ses cellules, et reste hors grille tant qu'il n'est pas réactivé
+        """
+        if changes.get('statut') == 'annule':
+            self.remove_exam(exam_id)
+            self.annules.add(exam_id)
+            return
+        if exam_id in self.annules:
+            if 'statut' not in changes:
+                return
+            self.annules.discard(exam_id)
+        
+        ancien = self.placements.get(exam_id)
+        l, date_examen, debut, duree = ancien or (-1, None, 0, 90)
+        
+        if 'lieu_id' in changes:
+            lieu_id = changes['lieu_id']
+            l = self.lieu_index.get(lieu_id, -1) if lieu_id is not None else -1
+        date_examen = changes.get('date_examen', date_examen)
+        if 'heure_debut' in changes:
+            debut = minutes(changes['heure_debut'])
+        duree = int(changes.get('duree_minutes', duree))
+        
+        if ancien:
+            self._mark(ancien, -1)
+        self.placements[exam_id] = (l, date_examen, debut, duree)
+        self._mark(self.placements[exam_id], 1)
+    
+    def remove_exam(self, exam_id):
+        """Libérer les cellules d'un examen supprimé"""
+        self.annules.discard(exam_id)
+        ancien = self.placements.pop(exam_id, None)
+        if ancien:
+            self._mark(ancien, -1)
+
+
+# Grilles en cache par session, rechargées quand une table source change
+_grilles = {}
+_grilles_lock = threading.Lock()
+
+
+def get_room_occupancy(session_id=1):
+    """Occupation de la session, rechargée si les données ont changé ou après le TTL"""
+    with _grilles_lock:
+        occupation = _grilles.get(session_id)
+        if (occupation is None
+                or occupation.versions != db.cache.versions(TABLES_SOURCES)
+                or time.monotonic() - occupation.loaded_at > CACHE_TTL_SECONDES):
+            occupation = RoomOccupancy(session_id).load()
+            _grilles[session_id] = occupation
+        return occupation
+
+
+def apply_exam_change(session_id, exam_id, changes=None, deleted=False):
+    """Reporter une écriture d'examen enregistrée sur la grille en cache
+    
+    Appliqué seulement si cette écriture est la seule depuis le chargement:
+    sinon la grille sera rechargée à la prochaine lecture.
+    """
+    with _grilles_lock:
+        occupation = _grilles.get(session_id)
+        if occupation is None or not (changes or deleted):
+            return False
+        
+        attendu = tuple(v + 1 if t == 'examens' else v for t, v in zip(TABLES_SOURCES, occupation.versions))
+        if db.cache.versions(TABLES_SOURCES) != attendu:
+            return False
+        
+        reactive = exam_id in occupation.annules and changes.get('statut', 'annule') != 'annule'
+        if deleted:
+            occupation.remove_exam(exam_id)
+        elif not reactive and (exam_id in occupation.placements or exam_id in occupation.annules
+                               or 'date_examen' in changes or changes.get('statut') == 'annule'):
+            occupation.move_exam(exam_id, **changes)
+        else:
+            # Examen réactivé: placement inconnu de la grille, rechargement
+            return False
+        occupation.versions = db.cache.versions(TABLES_SOURCES)
+        return True
@@ -8,29 +8,137 @@ from ortools.sat.python import cp_model
 import pandas as pd
 from datetime import datetime, timedelta, time
 import time as time_module
+import threading
+import hashlib
+from contextlib import contextmanager
+from google.protobuf.json_format import MessageToDict
 from src.db_connection import db
 
+# Créneaux horaires possibles (4 créneaux par jour)
+CRENEAUX = [
+    time(8, 0),   # 8h-10h
+    time(10, 0),  # 10h-12h
+    time(14, 0),  # 14h-16h
+    time(16, 0),  # 16h-18h
+]
+
+# Budget de temps adaptatif (secondes)
+BUDGET_MIN_SECONDES = 2.0
+BUDGET_MAX_SECONDES = 45.0
+BUDGET_SECONDES_PAR_ELEMENT = 0.0005  # par variable ou contrainte du modèle
+
+# Arrêt anticipé
+STAGNATION_SECONDES = 5.0   # fenêtre sans amélioration de l'objectif
+SEUIL_ECART_OPTIMALITE = 0.01  # écart relatif objectif / borne
+
+# Mode souple: poids d'une unité de violation (étudiant ou place) dans l'objectif
+POIDS_VIOLATION = 1000
+POIDS_NON_PLANIFIE = 10000  # examen laissé hors planning (aucun lieu/surveillant libre)
+MAX_PAIRES_ETUDIANTS = 3000  # paires de modules pénalisées (les plus d'étudiants communs)
+
+
+def compute_time_budget(model):
+    """Calculer le temps maximum de résolution à partir de la taille du modèle"""
+    proto = model.Proto()
+    nb_elements = len(proto.variables) + len(proto.constraints)
+    budget = BUDGET_MIN_SECONDES + nb_elements * BUDGET_SECONDES_PAR_ELEMENT
+    return min(BUDGET_MAX_SECONDES, max(BUDGET_MIN_SECONDES, budget))
+
+
+class SolveBudgetController(cp_model.CpSolverSolutionCallback):
+    """Arrêt anticipé du solver: stagnation de l'objectif ou écart d'optimalité atteint"""
+    
+    def __init__(self, solver, stagnation_seconds=STAGNATION_SECONDES,
+                 gap_threshold=SEUIL_ECART_OPTIMALITE, poll_interval=0.25):
+        super().__init__()
+        self._solver = solver
+        self.stagnation_seconds = stagnation_seconds
+        self.gap_threshold = gap_threshold
+        self.poll_interval = poll_interval
+        
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._watchdog = None
+        
+        self.stop_reason = None
+        self.nb_solutions = 0
+        self.best_objective = None
+        self.gap = None
+        self.last_improvement = None
+    
+    def OnSolutionCallback(self):
+        """Appelé par CP-SAT à chaque nouvelle solution (améliorante)"""
+        objective = self.ObjectiveValue()
+        bound = self.BestObjectiveBound()
+        
+        with self._lock:
+            self.nb_solutions += 1
+            if self.best_objective is None or objective != self.best_objective:
+                self.best_objective = objective
+                self.last_improvement = time_module.time()
+            self.gap = abs(bound - objective) / max(1.0, abs(objective))
+            
+            if self.stop_reason is None and self.gap <= self.gap_threshold:
+                self.stop_reason = 'ecart_optimalite'
+                self.StopSearch()
+    
+    def start(self):
+        """Démarrer la surveillance de la stagnation"""
+        self._done.clear()
+        self._watchdog = threading.Thread(target=self._watch, daemon=True)
+        self._watchdog.start()
+    
+    def stop(self):
+        """Arrêter la surveillance (après la résolution)"""
+        self._done.set()
+        if self._watchdog is not None:
+            self._watchdog.join()
+    
+    def _watch(self):
+        # Le callback n'est appelé que sur une nouvelle solution: la stagnation
+        # doit donc être détectée par un thread séparé
+        while not self._done.wait(self.poll_interval):
+            with self._lock:
+                if self.stop_reason is not None or self.last_improvement is None:
+                    continue
+                if time_module.time() - self.last_improvement >= self.stagnation_seconds:
+                    self.stop_reason = 'stagnation'
+                    self._solver.StopSearch()
+                    return
+
+
 class ExamScheduleOptimizer:
     """Optimiseur de planning d'examens - VERSION RAPIDE"""
     
-    def __init__(self, session_id, date_debut, nb_jours=10):
+    def __init__(self, session_id, date_debut, nb_jours=10, time_limit=None,
+                 stagnation_seconds=STAGNATION_SECONDES, gap_threshold=SEUIL_ECART_OPTIMALITE,
+                 soft_mode=False):
         self.session_id = session_id
         self.date_debut = datetime.strptime(date_debut, '%Y-%m-%d').date()
         self.nb_jours = nb_jours
         
+        # Budget de temps (None = calculé à partir de la taille du modèle)
+        self.time_limit = time_limit
+        self.stagnation_seconds = stagnation_seconds
+        self.gap_threshold = gap_threshold
+        self.stop_reason = None
+        
+        # Mode souple: les contraintes deviennent des pénalités
+        self.soft_mode = soft_mode
+        self.penalties = []
+        
+        # Télémétrie de l'exécution
+        self.timings = {}
+        self.status = None
+        
         # Créneaux horaires possibles (4 créneaux par jour)
-        self.creneaux = [
-            time(8, 0),   # 8h-10h
-            time(10, 0),  # 10h-12h
-            time(14, 0),  # 14h-16h
-            time(16, 0),  # 16h-18h
-        ]
+        self.creneaux = list(CRENEAUX)
         
         self.model = cp_model.CpModel()
         self.solver = cp_model.CpSolver()
         
         # Paramètres du solver - OPTIMISÉS POUR LA VITESSE
-        self.solver.parameters.max_time_in_seconds = 25  # Réduit à 25 secondes max
+        self.solver.parameters.max_time_in_seconds = BUDGET_MAX_SECONDES  # Ajusté dans solve()
         self.solver.parameters.num_search_workers = 4
         self.solver.parameters.log_search_progress = False
         self.solver.parameters.linearization_level = 0
@@ -42,6 +150,7 @@ class ExamScheduleOptimizer:
         self.lieux = None
         self.professeurs = None
         self.etudiants_par_module = {}
+        self.fermetures = set()  # (jour, indice de lieu) fermés temporairement
         
         # Variables de décision
         self.exam_vars = {}
@@ -63,16 +172,14 @@ class ExamScheduleOptimizer:
             LIMIT 500
         """, (self.session_id,))
         
-        # Récupérer les inscriptions pour ces modules seulement
-        module_ids = tuple(self.modules['id'].tolist())
-        if len(module_ids) == 1:
-            module_ids = f"({module_ids[0]})"
-        
-        self.inscriptions = db.execute_to_dataframe(f"""
+        # Récupérer les inscriptions pour ces modules seulement, dans l'ordre de
+        # l'instantané (CSR): le modèle reconstruit au rejeu est identique
+        self.inscriptions = db.execute_to_dataframe("""
             SELECT etudiant_id, module_id
             FROM inscriptions
-            WHERE session_id = %s AND module_id IN {module_ids}
-        """, (self.session_id,))
+            WHERE session_id = %s AND module_id = ANY(%s)
+            ORDER BY etudiant_id, module_id
+        """, (self.session_id, self.modules['id'].to_numpy()))
         
         # Récupérer les lieux disponibles
         self.lieux = db.execute_to_dataframe("""
@@ -89,6 +196,16 @@ class ExamScheduleOptimizer:
             ORDER BY p.dept_id
         """)
         
+        # Salles fermées temporairement pendant la période planifiée
+        jours = [self.date_debut + timedelta(days=j) for j in range(self.nb_jours)]
+        lieu_index = {lieu_id: idx for idx, lieu_id in enumerate(self.lieux['id'])}
+        for f in db.get_room_closures(jours).itertuples(index=False):
+            if f.lieu_id not in lieu_index:
+                continue
+            for j, jour in enumerate(jours):
+                if (pd.isna(f.date_debut) or f.date_debut <= jour) and (pd.isna(f.date_fin) or jour <= f.date_fin):
+                    self.fermetures.add((j, lieu_index[f.lieu_id]))
+        
         # Calculer le nombre d'étudiants par module
         module_counts = self.inscriptions.groupby('module_id').size()
         for module_id, count in module_counts.items():
@@ -132,17 +249,112 @@ class ExamScheduleOptimizer:
         """Ajouter les contraintes - VERSION SIMPLIFIÉE ET RAPIDE"""
         print("\n⚙️  Ajout des contraintes...")
         
+        if self.soft_mode:
+            self._add_soft_constraints()
+            return
+        
         # 1. CONTRAINTE: Capacité des salles (la plus importante)
         self._add_capacity_constraints()
         
         # 2. CONTRAINTE: Un étudiant maximum 1 examen par jour (simplifiée)
         self._add_student_constraints_fast()
         
-        # 3. CONTRAINTE: Un lieu ne peut accueillir qu'un examen à la fois (simplifiée)
-        self._add_room_availability_constraints_fast()
+        # 3. CONTRAINTE: Un lieu et un surveillant par examen et par créneau
+        self._add_slot_exclusivity_constraints()
+        
+        # 4. CONTRAINTE: Pas d'examen dans une salle fermée ce jour-là
+        self._add_room_closure_constraints()
         
         print("✓ Contraintes essentielles ajoutées")
     
+    def _add_soft_constraints(self):
+        """Mode souple: chaque famille de contraintes reçoit des variables de pénalité
+        
+        La base refuse toute double réservation: un examen sans lieu ou surveillant
+        libre est laissé hors planning (pénalité), le modèle reste toujours réalisable
+        """
+        print("   → Mode souple: contraintes relâchées en pénalités")
+        
+        self._add_capacity_penalties()
+        self._add_student_penalties()
+        self._add_optional_scheduling()
+        self._add_slot_exclusivity_constraints()
+        self._add_room_closure_constraints()
+        
+        print(f"✓ {len(self.penalties)} pénalités ajoutées")
+    
+    def _add_penalty(self, var, poids, type_conflit, modules, description):
+        """Enregistrer une variable de pénalité (violation pondérée)"""
+        self.penalties.append({
+            'var': var,
+            'poids': int(poids),
+            'type': type_conflit,
+            'modules': modules,
+            'description': description
+        })
+    
+    def _add_capacity_penalties(self):
+        """Capacité des salles: pénalité = nombre de places manquantes"""
+        print("   → Pénalité: Capacité des salles")
+        
+        capacites = [int(c) for c in self.lieux['capacite_examen']]
+        
+        for module_id, vars_dict in self.exam_vars.items():
+            nb_etudiants = int(self.etudiants_par_module.get(module_id, 0))
+            if nb_etudiants <= min(capacites):
+                continue
+            
+            capacite = self.model.NewIntVar(min(capacites), max(capacites), f'cap_m{module_id}')
+            self.model.AddElement(vars_dict['lieu'], capacites, capacite)
+            
+            depassement = self.model.NewIntVar(0, nb_etudiants, f'dep_m{module_id}')
+            self.model.Add(depassement >= nb_etudiants - capacite)
+            
+            self._add_penalty(
+                depassement, 1, 'capacite', [module_id],
+                f"{nb_etudiants} inscrits: places manquantes dans le lieu choisi"
+            )
+    
+    def _add_student_penalties(self):
+        """1 examen par étudiant/jour: pénalité = nombre d'étudiants communs"""
+        print("   → Pénalité: 1 examen max par étudiant/jour")
+        
+        # Paires de modules partageant des étudiants, limitées aux plus chargées
+        paires = self.inscriptions.merge(self.inscriptions, on='etudiant_id')
+        paires = paires[paires['module_id_x'] < paires['module_id_y']]
+        communs = paires.groupby(['module_id_x', 'module_id_y']).size().nlargest(MAX_PAIRES_ETUDIANTS)
+        
+        for (module_i, module_j), nb_communs in communs.items():
+            if module_i not in self.exam_vars or module_j not in self.exam_vars:
+                continue
+            
+            meme_jour = self.model.NewBoolVar(f'mj_m{module_i}_m{module_j}')
+            self.model.Add(
+                self.exam_vars[module_i]['jour'] != self.exam_vars[module_j]['jour']
+            ).OnlyEnforceIf(meme_jour.Not())
+            
+            self._add_penalty(
+                meme_jour, nb_communs, 'etudiants', [module_i, module_j],
+                f"{nb_communs} étudiant(s) avec deux examens le même jour"
+            )
+        
+        print(f"   ✓ {len(communs)} paires de modules avec étudiants communs")
+    
+    def _add_optional_scheduling(self):
+        """Examens optionnels: pénalité pour chaque examen laissé hors planning"""
+        print("   → Pénalité: Examens non planifiés")
+        
+        for module_id, vars_dict in self.exam_vars.items():
+            non_planifie = self.model.NewBoolVar(f'np_m{module_id}')
+            vars_dict['non_planifie'] = non_planifie
+            # Point de départ toujours réalisable: aucun examen planifié
+            self.model.AddHint(non_planifie, 1)
+            
+            self._add_penalty(
+                non_planifie, POIDS_NON_PLANIFIE, 'non_planifie', [module_id],
+                "Aucun lieu ou surveillant libre: examen à planifier manuellement"
+            )
+    
     def _add_capacity_constraints(self):
         """Respecter la capacité des salles - CONTRAINTE ESSENTIELLE"""
         print("   → Contrainte: Capacité des salles")
@@ -197,43 +409,57 @@ class ExamScheduleOptimizer:
         
         print(f"   ✓ {constraint_count} contraintes étudiants ajoutées")
     
-    def _add_room_availability_constraints_fast(self):
-        """Un lieu ne peut accueillir qu'un examen à la fois - VERSION RAPIDE"""
-        print("   → Contrainte: Disponibilité des lieux (version optimisée)")
+    def _add_slot_exclusivity_constraints(self):
+        """Un lieu et un surveillant ne servent qu'un examen par créneau
         
-        module_ids = list(self.exam_vars.keys())
-        constraint_count = 0
+        Mêmes règles que les contraintes d'exclusion de la table examens: une clé
+        (jour, créneau, lieu) et une clé (jour, créneau, prof) par examen, toutes distinctes.
+        Mode souple: clés portées par des intervalles optionnels (présents si l'examen
+        est planifié) et NoOverlap, seuls les examens planifiés sont exclusifs
+        """
+        print("   → Contrainte: Un examen par lieu et par surveillant à chaque créneau")
+        
+        nb_creneaux = len(self.creneaux)
+        nb_lieux, nb_profs = len(self.lieux), len(self.professeurs)
+        cles_lieu, cles_prof = [], []
+        
+        for module_id, vars_dict in self.exam_vars.items():
+            creneau_global = vars_dict['jour'] * nb_creneaux + vars_dict['creneau']
+            
+            cle_lieu = self.model.NewIntVar(0, self.nb_jours * nb_creneaux * nb_lieux - 1, f'cle_lieu_m{module_id}')
+            self.model.Add(cle_lieu == creneau_global * nb_lieux + vars_dict['lieu'])
+            
+            cle_prof = self.model.NewIntVar(0, self.nb_jours * nb_creneaux * nb_profs - 1, f'cle_prof_m{module_id}')
+            self.model.Add(cle_prof == creneau_global * nb_profs + vars_dict['prof'])
+            
+            if 'non_planifie' in vars_dict:
+                planifie = vars_dict['non_planifie'].Not()
+                cle_lieu = self.model.NewOptionalIntervalVar(cle_lieu, 1, cle_lieu + 1, planifie, f'iv_lieu_m{module_id}')
+                cle_prof = self.model.NewOptionalIntervalVar(cle_prof, 1, cle_prof + 1, planifie, f'iv_prof_m{module_id}')
+            
+            cles_lieu.append(cle_lieu)
+            cles_prof.append(cle_prof)
+        
+        if self.soft_mode:
+            self.model.AddNoOverlap(cles_lieu)
+            self.model.AddNoOverlap(cles_prof)
+        else:
+            self.model.AddAllDifferent(cles_lieu)
+            self.model.AddAllDifferent(cles_prof)
         
-        # On limite les vérifications pour gagner du temps
-        max_comparisons = min(300, len(module_ids))
-        
-        for i in range(max_comparisons):
-            # Comparer seulement avec les 30 suivants
-            for j in range(i + 1, min(i + 30, len(module_ids))):
-                module_i = module_ids[i]
-                module_j = module_ids[j]
-                
-                vars_i = self.exam_vars[module_i]
-                vars_j = self.exam_vars[module_j]
-                
-                # Si même lieu ET même jour ET même créneau → impossible
-                b_meme_lieu = self.model.NewBoolVar(f'ml_{i}_{j}')
-                self.model.Add(vars_i['lieu'] == vars_j['lieu']).OnlyEnforceIf(b_meme_lieu)
-                self.model.Add(vars_i['lieu'] != vars_j['lieu']).OnlyEnforceIf(b_meme_lieu.Not())
-                
-                b_meme_jour = self.model.NewBoolVar(f'mj_{i}_{j}')
-                self.model.Add(vars_i['jour'] == vars_j['jour']).OnlyEnforceIf(b_meme_jour)
-                self.model.Add(vars_i['jour'] != vars_j['jour']).OnlyEnforceIf(b_meme_jour.Not())
-                
-                b_meme_creneau = self.model.NewBoolVar(f'mc_{i}_{j}')
-                self.model.Add(vars_i['creneau'] == vars_j['creneau']).OnlyEnforceIf(b_meme_creneau)
-                self.model.Add(vars_i['creneau'] != vars_j['creneau']).OnlyEnforceIf(b_meme_creneau.Not())
-                
-                # Au moins une des conditions doit être fausse
-                self.model.AddBoolOr([b_meme_lieu.Not(), b_meme_jour.Not(), b_meme_creneau.Not()])
-                constraint_count += 1
-        
-        print(f"   ✓ {constraint_count} contraintes de disponibilité ajoutées")
+        print(f"   ✓ {len(cles_lieu)} examens: lieux et surveillants exclusifs par créneau")
+    
+    def _add_room_closure_constraints(self):
+        """Interdire les couples (jour, lieu) des fermetures temporaires"""
+        if not self.fermetures:
+            return
+        print("   → Contrainte: Salles fermées temporairement")
+        
+        interdits = sorted(self.fermetures)
+        for vars_dict in self.exam_vars.values():
+            self.model.AddForbiddenAssignments([vars_dict['jour'], vars_dict['lieu']], interdits)
+        
+        print(f"   ✓ {len(interdits)} couples (jour, lieu) interdits")
     
     def set_objective(self):
         """Définir la fonction objectif - VERSION SIMPLIFIÉE"""
@@ -256,19 +482,45 @@ class ExamScheduleOptimizer:
                         self.model.Add(vars_dict['lieu'] == idx).OnlyEnforceIf(b)
                         objective_terms.append(b * 2)
         
+        # 3. Mode souple: minimiser la violation totale (prioritaire)
+        if self.penalties:
+            violation = sum(p['poids'] * p['var'] for p in self.penalties)
+            objective_terms.append(-POIDS_VIOLATION * violation)
+        
         self.model.Maximize(sum(objective_terms))
         print("✓ Objectif défini")
     
+    def time_budget(self):
+        """Temps maximum de résolution: time_limit, sinon calculé à partir du modèle"""
+        return self.time_limit if self.time_limit is not None else compute_time_budget(self.model)
+    
     def solve(self):
         """Résoudre le problème d'optimisation - VERSION RAPIDE"""
         print("\n🚀 Lancement de l'optimisation...")
-        print(f"   Temps maximum: 25 secondes")
+        
+        budget = self.time_budget()
+        self.solver.parameters.max_time_in_seconds = budget
+        print(f"   Temps maximum: {budget:.1f} secondes")
+        
+        controller = SolveBudgetController(
+            self.solver,
+            stagnation_seconds=self.stagnation_seconds,
+            gap_threshold=self.gap_threshold
+        )
         
         start_time = time_module.time()
-        status = self.solver.Solve(self.model)
+        controller.start()
+        try:
+            status = self.solver.Solve(self.model, controller)
+        finally:
+            controller.stop()
         elapsed_time = time_module.time() - start_time
+        self.status = status
+        
+        self.stop_reason = self._stop_reason(status, controller, budget)
         
         print(f"\n⏱️  Temps d'exécution: {elapsed_time:.2f} secondes")
+        print(f"   Raison de l'arrêt: {self.stop_reason}")
         
         if status == cp_model.OPTIMAL:
             print("✅ Solution optimale trouvée!")
@@ -281,6 +533,85 @@ class ExamScheduleOptimizer:
             print(f"   Statut du solver: {self.solver.StatusName(status)}")
             return False, elapsed_time
     
+    @contextmanager
+    def timed_stage(self, etape):
+        """Mesurer la durée d'une étape (chargement, contraintes, résolution...)"""
+        start_time = time_module.time()
+        try:
+            yield
+        finally:
+            self.timings[etape] = time_module.time() - start_time
+    
+    def input_fingerprint(self):
+        """Empreinte des données d'entrée (détecte un changement d'instance)"""
+        h = hashlib.sha256()
+        for df in (self.modules, self.inscriptions, self.lieux, self.professeurs):
+            if df is None:
+                continue
+            df = df.sort_values(list(df.columns)).reset_index(drop=True)
+            h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+        return h.hexdigest()
+    
+    def save_run(self, mode, erreur=None):
+        """Enregistrer la télémétrie de l'exécution dans optimizer_runs"""
+        proto = self.model.Proto()
+        resolu = self.status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+        
+        if erreur is not None:
+            statut = 'ERREUR'
+        elif self.status is None:
+            statut = 'NON_LANCE'
+        else:
+            statut = self.solver.StatusName(self.status)
+        
+        run = {
+            'session_id': self.session_id,
+            'mode': mode,
+            'statut': statut,
+            'raison_arret': self.stop_reason,
+            'erreur': erreur,
+            'nb_modules': len(self.modules) if self.modules is not None else None,
+            'nb_inscriptions': len(self.inscriptions) if self.inscriptions is not None else None,
+            'nb_lieux': len(self.lieux) if self.lieux is not None else None,
+            'nb_professeurs': len(self.professeurs) if self.professeurs is not None else None,
+            'nb_variables': len(proto.variables),
+            'nb_contraintes': len(proto.constraints),
+            'temps_etapes': {etape: round(t, 4) for etape, t in self.timings.items()},
+            'temps_resolution': self.timings.get('resolution'),
+            'temps_total': sum(self.timings.values()),
+            'nb_branches': self.solver.NumBranches() if self.status is not None else None,
+            'nb_conflits': self.solver.NumConflicts() if self.status is not None else None,
+            'objectif': self.solver.ObjectiveValue() if resolu else None,
+            'borne': self.solver.BestObjectiveBound() if resolu else None,
+            'parametres': {
+                'nb_jours': self.nb_jours,
+                'time_limit': self.time_limit,
+                'stagnation_seconds': self.stagnation_seconds,
+                'gap_threshold': self.gap_threshold,
+                'soft_mode': self.soft_mode,
+                'solver': MessageToDict(self.solver.parameters),
+            },
+            'empreinte_donnees': self.input_fingerprint() if self.modules is not None else None,
+        }
+        
+        try:
+            db.record_optimizer_run(run)
+        except Exception as e:
+            # La télémétrie ne doit jamais faire échouer une génération
+            print(f"⚠️  Télémétrie non enregistrée: {e}")
+    
+    def _stop_reason(self, status, controller, budget):
+        """Déterminer pourquoi la résolution s'est arrêtée"""
+        if status == cp_model.OPTIMAL:
+            return 'optimal'
+        if status == cp_model.INFEASIBLE:
+            return 'infaisable'
+        if controller.stop_reason is not None:
+            return controller.stop_reason
+        if self.solver.WallTime() >= budget * 0.99:
+            return 'limite_temps'
+        return 'inconnu'
+    
     def extract_solution(self):
         """Extraire la solution et la sauvegarder dans la DB"""
         print("\n💾 Extraction et sauvegarde de la solution...")
@@ -288,6 +619,9 @@ class ExamScheduleOptimizer:
         examens_planifies = []
         
         for module_id, vars_dict in self.exam_vars.items():
+            if self._unscheduled(vars_dict):
+                continue
+            
             jour_idx = self.solver.Value(vars_dict['jour'])
             creneau_idx = self.solver.Value(vars_dict['creneau'])
             lieu_idx = self.solver.Value(vars_dict['lieu'])
@@ -314,24 +648,49 @@ class ExamScheduleOptimizer:
                 'statut': 'planifie'
             })
         
-        # Supprimer les examens existants pour cette session
-        db.execute_query("DELETE FROM examens WHERE session_id = %s", (self.session_id,), fetch=False)
+        # Remplacer le planning de la session en une transaction: une ligne refusée
+        # (contrainte d'exclusion) annule tout et laisse l'ancien planning intact
+        db.replace_session_exams(self.session_id, examens_planifies)
         
-        # Insérer les nouveaux examens
-        for examen in examens_planifies:
-            db.execute_query("""
-                INSERT INTO examens 
-                (module_id, session_id, date_examen, heure_debut, duree_minutes, 
-                 lieu_id, prof_surveillant_id, nb_inscrits, statut)
-                VALUES (%(module_id)s, %(session_id)s, %(date_examen)s, %(heure_debut)s, 
-                        %(duree_minutes)s, %(lieu_id)s, %(prof_surveillant_id)s, 
-                        %(nb_inscrits)s, %(statut)s)
-            """, examen, fetch=False)
+        db.refresh_plan_projections(self.session_id)
         
         print(f"✅ {len(examens_planifies)} examens sauvegardés dans la base")
         
         return examens_planifies
     
+    def _unscheduled(self, vars_dict):
+        """Examen laissé hors planning par le mode souple"""
+        return 'non_planifie' in vars_dict and self.solver.Value(vars_dict['non_planifie']) == 1
+    
+    def extract_violations(self):
+        """Lister les conflits restants (mode souple), du plus grave au moins grave"""
+        codes = dict(zip(self.modules['id'], self.modules['code']))
+        
+        conflits = []
+        for penalty in self.penalties:
+            valeur = self.solver.Value(penalty['var'])
+            if valeur <= 0:
+                continue
+            
+            premier = self.exam_vars[penalty['modules'][0]]
+            date_examen, lieu = None, None
+            if penalty['type'] != 'non_planifie':
+                date_examen = self.date_debut + timedelta(days=self.solver.Value(premier['jour']))
+            if penalty['type'] == 'capacite':
+                lieu = self.lieux.iloc[self.solver.Value(premier['lieu'])]['nom']
+            
+            conflits.append({
+                'type': penalty['type'],
+                'modules': ', '.join(codes.get(m, str(m)) for m in penalty['modules']),
+                'date_examen': date_examen,
+                'lieu': lieu,
+                'gravite': penalty['poids'] * valeur,
+                'description': penalty['description']
+            })
+        
+        conflits.sort(key=lambda c: c['gravite'], reverse=True)
+        return conflits
+    
     def generate_statistics(self):
         """Générer des statistiques sur la solution"""
         print("\n📊 Génération des statistiques...")
@@ -340,27 +699,43 @@ class ExamScheduleOptimizer:
         lieux_utilises = set()
         profs_utilises = set()
         
-        for vars_dict in self.exam_vars.values():
+        planifies = [v for v in self.exam_vars.values() if not self._unscheduled(v)]
+        for vars_dict in planifies:
             jours_utilises.add(self.solver.Value(vars_dict['jour']))
             lieux_utilises.add(self.solver.Value(vars_dict['lieu']))
             profs_utilises.add(self.solver.Value(vars_dict['prof']))
         
         stats = {
-            'nb_examens': len(self.exam_vars),
+            'nb_examens': len(planifies),
+            'nb_non_planifies': len(self.exam_vars) - len(planifies),
+            'mode_souple': self.soft_mode,
             'nb_jours_utilises': len(jours_utilises),
             'nb_lieux_utilises': len(lieux_utilises),
             'nb_profs_utilises': len(profs_utilises),
+            'raison_arret': self.stop_reason,
         }
         
         return stats
 
-def optimize_schedule(session_id, date_debut, nb_jours=10):
+def optimize_schedule(session_id, date_debut, nb_jours=10, time_limit=None,
+                      stagnation_seconds=STAGNATION_SECONDES, gap_threshold=SEUIL_ECART_OPTIMALITE,
+                      soft_mode=False, snapshot_dir=None):
     """Fonction principale pour optimiser un planning - VERSION RAPIDE"""
-    optimizer = ExamScheduleOptimizer(session_id, date_debut, nb_jours)
+    optimizer = ExamScheduleOptimizer(
+        session_id, date_debut, nb_jours,
+        time_limit=time_limit,
+        stagnation_seconds=stagnation_seconds,
+        gap_threshold=gap_threshold,
+        soft_mode=soft_mode
+    )
+    
+    mode = 'souple' if soft_mode else 'generation'
+    erreur = None
     
     try:
         # 1. Charger les données
-        optimizer.load_data()
+        with optimizer.timed_stage('chargement'):
+            optimizer.load_data()
         
         if len(optimizer.modules) == 0:
             return {
@@ -370,39 +745,54 @@ def optimize_schedule(session_id, date_debut, nb_jours=10):
             }
         
         # 2. Créer les variables
-        optimizer.create_variables()
+        with optimizer.timed_stage('variables'):
+            optimizer.create_variables()
         
         # 3. Ajouter les contraintes
-        optimizer.add_constraints()
+        with optimizer.timed_stage('contraintes'):
+            optimizer.add_constraints()
         
         # 4. Définir l'objectif
-        optimizer.set_objective()
+        with optimizer.timed_stage('objectif'):
+            optimizer.set_objective()
+        
+        # Instantané reproductible (données + modèle) avant résolution
+        if snapshot_dir:
+            from src.snapshot import export_snapshot
+            export_snapshot(optimizer, snapshot_dir)
         
         # 5. Résoudre
-        success, temps = optimizer.solve()
+        with optimizer.timed_stage('resolution'):
+            success, temps = optimizer.solve()
         
         if not success:
             return {
                 'success': False,
-                'message': 'Aucune solution trouvée - Essayez d\'augmenter le nombre de jours',
-                'temps': temps
+                'message': 'Aucune solution trouvée - Essayez d\'augmenter le nombre de jours ou le mode souple',
+                'temps': temps,
+                'raison_arret': optimizer.stop_reason
             }
         
         # 6. Extraire et sauvegarder la solution
-        examens = optimizer.extract_solution()
+        with optimizer.timed_stage('sauvegarde'):
+            examens = optimizer.extract_solution()
         
         # 7. Générer les statistiques
         stats = optimizer.generate_statistics()
+        conflits_restants = optimizer.extract_violations() if soft_mode else []
         
         return {
             'success': True,
             'temps': temps,
             'nb_examens': len(examens),
             'stats': stats,
+            'raison_arret': optimizer.stop_reason,
+            'conflits_restants': conflits_restants,
             'message': f'Planning généré avec succès en {temps:.2f}s'
         }
         
     except Exception as e:
+        erreur = str(e)
         print(f"❌ Erreur: {e}")
         import traceback
         traceback.print_exc()
@@ -410,4 +800,7 @@ def optimize_schedule(session_id, date_debut, nb_jours=10):
             'success': False,
             'message': f'Erreur: {str(e)}',
             'temps': 0
-        }
\ No newline at end of file
+        }
+    
+    finally:
+        optimizer.save_run(mode, erreur)
\ No newline at end of file
@@ -0,0 +1,405 @@
+"""
+Fermeture de salles - Réaffectation rapide des examens concernés
+Couplage biparti vers les salles libres du même créneau, puis résolution
+locale (OR-Tools) pour les examens qui doivent changer de créneau
+"""
+
+from ortools.sat.python import cp_model
+import pandas as pd
+import time as time_module
+from src.db_connection import db
+from src.optimizer import CRENEAUX
+
+# Résolution locale des examens non réaffectés
+TEMPS_MAX_RESOLUTION_LOCALE = 5.0
+COUT_JOUR_DEPLACE = 10
+COUT_CRENEAU_DEPLACE = 1
+
+
+def _minutes(heure):
+    """Convertir une heure en minutes depuis minuit"""
+    return heure.hour * 60 + heure.minute
+
+
+def _interval_free(intervals, debut, fin):
+    """Vérifier qu'un intervalle [debut, fin) ne chevauche aucun intervalle occupé"""
+    return all(fin <= d or f <= debut for d, f in intervals)
+
+
+class RoomClosureReassigner:
+    """Réaffectation des examens d'une ou plusieurs salles fermées"""
+    
+    def __init__(self, session_id, lieu_ids, date_debut=None, date_fin=None):
+        self.session_id = session_id
+        self.lieu_ids = [int(l) for l in lieu_ids]
+        self.date_debut = date_debut
+        self.date_fin = date_fin
+        
+        # Données chargées
+        self.examens = None
+        self.lieux = None
+        self.dates_plan = []
+        self.dates_bloquees = {}
+        self.modules_lies = set()
+        self.fermetures = {}  # lieu_id -> [(premier jour, dernier jour)], None = sans limite
+        
+        # Occupation: (lieu_id, date) et (prof_id, date) -> [(debut, fin)]
+        self.occupation_lieux = {}
+        self.occupation_profs = {}
+        
+        # Résultats
+        self.reaffectes = []
+        self.deplaces = []
+        self.non_resolus = []
+    
+    def load_data(self):
+        """Charger les examens concernés et l'occupation des autres salles"""
+        query = """
+            SELECT e.id, e.module_id, m.code as code_module, e.date_examen, e.heure_debut,
+                   e.duree_minutes, e.lieu_id, e.prof_surveillant_id, e.nb_inscrits
+            FROM examens e
+            JOIN modules m ON e.module_id = m.id
+            WHERE e.session_id = %s
+              AND e.lieu_id = ANY(%s)
+              AND e.statut IS DISTINCT FROM 'annule'
+        """
+        params = [self.session_id, self.lieu_ids]
+        
+        if self.date_debut:
+            query += " AND e.date_examen >= %s"
+            params.append(self.date_debut)
+        if self.date_fin:
+            query += " AND e.date_examen <= %s"
+            params.append(self.date_fin)
+        
+        query += " ORDER BY e.date_examen, e.heure_debut, e.nb_inscrits DESC"
+        self.examens = db.execute_to_dataframe(query, params)
+        
+        if self.examens.empty:
+            return
+        
+        # Salles encore disponibles (les plus petites d'abord: meilleur ajustement)
+        self.lieux = db.execute_to_dataframe("""
+            SELECT id, nom, capacite_examen
+            FROM lieux_examen
+            WHERE disponible = TRUE
+              AND NOT (id = ANY(%s))
+            ORDER BY capacite_examen, id
+        """, (self.lieu_ids,))
+        
+        # Jours du planning de la session (candidats pour un déplacement)
+        dates = db.execute_to_dataframe("""
+            SELECT DISTINCT date_examen
+            FROM examens
+            WHERE session_id = %s
+            ORDER BY date_examen
+        """, (self.session_id,))
+        self.dates_plan = dates['date_examen'].tolist()
+        
+        # Autres salles fermées temporairement sur ces jours
+        for f in db.get_room_closures(self.dates_plan).itertuples(index=False):
+            self.fermetures.setdefault(int(f.lieu_id), []).append((
+                None if pd.isna(f.date_debut) else f.date_debut,
+                None if pd.isna(f.date_fin) else f.date_fin
+            ))
+        
+        # Occupation des salles et des surveillants sur ces jours (toutes sessions, hors annulés)
+        autres = db.execute_to_dataframe("""
+            SELECT id, date_examen, heure_debut, duree_minutes, lieu_id, prof_surveillant_id
+            FROM examens
+            WHERE date_examen = ANY(%s)
+              AND statut IS DISTINCT FROM 'annule'
+        """, (self.dates_plan,))
+        
+        concernes = set(self.examens['id'])
+        for _, exam in autres.iterrows():
+            debut = _minutes(exam['heure_debut'])
+            intervalle = (debut, debut + int(exam['duree_minutes']))
+            
+            if exam['id'] not in concernes and pd.notna(exam['lieu_id']):
+                self.occupation_lieux.setdefault((int(exam['lieu_id']), exam['date_examen']), []).append(intervalle)
+            if pd.notna(exam['prof_surveillant_id']):
+                self.occupation_profs.setdefault(
+                    (int(exam['prof_surveillant_id']), exam['date_examen']), []
+                ).append((exam['id'], intervalle))
+        
+        # Jours où des étudiants du module ont déjà un autre examen
+        module_ids = self.examens['module_id'].tolist()
+        bloques = db.execute_to_dataframe("""
+            SELECT DISTINCT i.module_id, e.date_examen
+            FROM inscriptions i
+            JOIN inscriptions autre ON autre.etudiant_id = i.etudiant_id
+                                   AND autre.session_id = i.session_id
+                                   AND autre.module_id <> i.module_id
+            JOIN examens e ON e.module_id = autre.module_id AND e.session_id = i.session_id
+                          AND e.statut IS DISTINCT FROM 'annule'
+            WHERE i.session_id = %s
+              AND i.module_id = ANY(%s)
+        """, (self.session_id, module_ids))
+        for _, row in bloques.iterrows():
+            self.dates_bloquees.setdefault(row['module_id'], set()).add(row['date_examen'])
+        
+        # Paires de modules concernés partageant des étudiants
+        liens = db.execute_to_dataframe("""
+            SELECT DISTINCT a.module_id as module_a, b.module_id as module_b
+            FROM inscriptions a
+            JOIN inscriptions b ON b.etudiant_id = a.etudiant_id
+                               AND b.session_id = a.session_id
+                               AND b.module_id > a.module_id
+            WHERE a.session_id = %s
+              AND a.module_id = ANY(%s)
+              AND b.module_id = ANY(%s)
+        """, (self.session_id, module_ids, module_ids))
+        self.modules_lies = set(zip(liens['module_a'], liens['module_b']))
+    
+    def _room_closed(self, lieu_id, date_examen):
+        """La salle est-elle fermée temporairement ce jour-là?"""
+        return any((d is None or d <= date_examen) and (f is None or date_examen <= f)
+                   for d, f in self.fermetures.get(lieu_id, []))
+    
+    def _room_candidates(self, exam, date_examen, debut):
+        """Salles de capacité suffisante libres sur [debut, debut + durée)"""
+        fin = debut + int(exam['duree_minutes'])
+        return [
+            int(lieu['id'])
+            for _, lieu in self.lieux.iterrows()
+            if lieu['capacite_examen'] >= exam['nb_inscrits']
+            and not self._room_closed(int(lieu['id']), date_examen)
+            and _interval_free(self.occupation_lieux.get((int(lieu['id']), date_examen), []), debut, fin)
+        ]
+    
+    def _prof_free(self, exam, date_examen, debut):
+        """Le surveillant est-il libre sur ce créneau (hors examen lui-même)?"""
+        if pd.isna(exam['prof_surveillant_id']):
+            return True
+        fin = debut + int(exam['duree_minutes'])
+        occupes = self.occupation_profs.get((int(exam['prof_surveillant_id']), date_examen), [])
+        return _interval_free([i for exam_id, i in occupes if exam_id != exam['id']], debut, fin)
+    
+    def match_same_slot(self):
+        """Couplage biparti examens -> salles libres, créneau par créneau"""
+        restants = []
+        
+        groupes = self.examens.groupby(['date_examen', 'heure_debut', 'duree_minutes'], sort=True)
+        for (date_examen, heure_debut, duree), groupe in groupes:
+            debut = _minutes(heure_debut)
+            candidats = {
+                idx: self._room_candidates(exam, date_examen, debut)
+                for idx, exam in groupe.iterrows()
+            }
+            
+            # Algorithme de Kuhn (chemins augmentants), salles triées par capacité
+            affectation = {}  # lieu_id -> idx examen
+            
+            def augmenter(idx, visites):
+                for lieu_id in candidats[idx]:
+                    if lieu_id in visites:
+                        continue
+                    visites.add(lieu_id)
+                    if lieu_id not in affectation or augmenter(affectation[lieu_id], visites):
+                        affectation[lieu_id] = idx
+                        return True
+                return False
+            
+            for idx in groupe.index:
+                augmenter(idx, set())
+            
+            places = {idx: lieu_id for lieu_id, idx in affectation.items()}
+            for idx, exam in groupe.iterrows():
+                if idx in places:
+                    lieu_id = places[idx]
+                    self.occupation_lieux.setdefault((lieu_id, date_examen), []).append(
+                        (debut, debut + int(duree))
+                    )
+                    self.reaffectes.append(self._result(exam, lieu_id, date_examen, heure_debut))
+                else:
+                    restants.append(exam)
+        
+        return restants
+    
+    def solve_local(self, restants):
+        """Déplacer les examens restants (jour/créneau/salle) par une résolution locale"""
+        model = cp_model.CpModel()
+        choix = {}  # idx -> [(var, date, creneau, lieu_id)]
+        
+        for idx, exam in enumerate(restants):
+            bloques = self.dates_bloquees.get(exam['module_id'], set())
+            candidats = []
+            
+            for date_examen in self.dates_plan:
+                if date_examen != exam['date_examen'] and date_examen in bloques:
+                    continue
+                for creneau in CRENEAUX:
+                    debut = _minutes(creneau)
+                    if not self._prof_free(exam, date_examen, debut):
+                        continue
+                    for lieu_id in self._room_candidates(exam, date_examen, debut):
+                        var = model.NewBoolVar(f'x_{idx}_{date_examen}_{creneau}_{lieu_id}')
+                        candidats.append((var, date_examen, creneau, lieu_id))
+            
+            if candidats:
+                model.AddAtMostOne(c[0] for c in candidats)
+                choix[idx] = candidats
+        
+        # Une salle par créneau, un créneau par surveillant, un examen/jour par étudiant
+        par_salle = {}
+        par_prof = {}
+        for idx, candidats in choix.items():
+            prof_id = restants[idx]['prof_surveillant_id']
+            for var, date_examen, creneau, lieu_id in candidats:
+                par_salle.setdefault((lieu_id, date_examen, creneau), []).append(var)
+                if pd.notna(prof_id):
+                    par_prof.setdefault((int(prof_id), date_examen, creneau), []).append(var)
+        for variables in list(par_salle.values()) + list(par_prof.values()):
+            if len(variables) > 1:
+                model.AddAtMostOne(variables)
+        
+        for i, j in ((i, j) for i in choix for j in choix if i < j):
+            paire = tuple(sorted((restants[i]['module_id'], restants[j]['module_id'])))
+            if paire not in self.modules_lies:
+                continue
+            for date_examen in self.dates_plan:
+                jour_i = [c[0] for c in choix[i] if c[1] == date_examen]
+                jour_j = [c[0] for c in choix[j] if c[1] == date_examen]
+                if jour_i and jour_j:
+                    model.Add(sum(jour_i) + sum(jour_j) <= 1)
+        
+        # Maximiser les examens replacés, puis minimiser le déplacement
+        objectif = []
+        for idx, candidats in choix.items():
+            exam = restants[idx]
+            for var, date_examen, creneau, lieu_id in candidats:
+                cout = COUT_JOUR_DEPLACE * abs((date_examen - exam['date_examen']).days)
+                cout += COUT_CRENEAU_DEPLACE * (creneau != exam['heure_debut'])
+                objectif.append((1000 - cout) * var)
+        if objectif:
+            model.Maximize(sum(objectif))
+        
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = TEMPS_MAX_RESOLUTION_LOCALE
+        solver.parameters.num_search_workers = 4
+        status = solver.Solve(model)
+        
+        for idx, exam in enumerate(restants):
+            retenu = None
+            if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+                retenu = next((c for c in choix.get(idx, []) if solver.Value(c[0])), None)
+            if retenu is None:
+                self.non_resolus.append(self._result(exam, None, exam['date_examen'], exam['heure_debut']))
+            else:
+                _, date_examen, creneau, lieu_id = retenu
+                self.deplaces.append(self._result(exam, lieu_id, date_examen, creneau))
+    
+    def _result(self, exam, lieu_id, date_examen, heure_debut):
+        return {
+            'examen_id': int(exam['id']),
+            'code_module': exam['code_module'],
+            'ancien_lieu_id': int(exam['lieu_id']),
+            'nouveau_lieu_id': lieu_id,
+            'ancienne_date': exam['date_examen'],
+            'nouvelle_date': date_examen,
+            'ancienne_heure': exam['heure_debut'],
+            'nouvelle_heure': heure_debut,
+            'nb_inscrits': int(exam['nb_inscrits'])
+        }
+    
+    def save(self, fermer_salles=True):
+        """Enregistrer les réaffectations et fermer les salles (sur la période si précisée)
+        
+        Une seule transaction: examens déplacés et salle fermée, ou rien du tout
+        """
+        updates = [
+            (r['nouveau_lieu_id'], r['nouvelle_date'], r['nouvelle_heure'], r['examen_id'], self.session_id)
+            for r in self.reaffectes + self.deplaces
+        ]
+        tables = ['examens'] if updates else []
+        
+        with db.get_connection() as conn:
+            cursor = conn.cursor()
+            if updates:
+                cursor.executemany("""
+                    UPDATE examens
+                    SET lieu_id = %s, date_examen = %s, heure_debut = %s
+                    WHERE id = %s AND session_id = %s
+                """, updates)
+            
+            if fermer_salles and (self.date_debut or self.date_fin):
+                # Fermeture temporaire: la salle reste disponible hors de la période
+                cursor.executemany(
+                    "INSERT INTO fermetures_lieux (lieu_id, periode) VALUES (%s, daterange(%s, %s, '[]'))",
+                    [(lieu_id, self.date_debut, self.date_fin) for lieu_id in self.lieu_ids]
+                )
+                tables.append('fermetures_lieux')
+            elif fermer_salles:
+                cursor.execute("UPDATE lieux_examen SET disponible = FALSE WHERE id = ANY(%s)", (self.lieu_ids,))
+                tables.append('lieux_examen')
+        
+        if tables:
+            db.invalidate(*tables)
+        if updates:
+            db.refresh_plan_projections(self.session_id)
+
+
+def reassign_closed_rooms(session_id, lieu_ids, date_debut=None, date_fin=None, fermer_salles=True,
+                          confirmer=False):
+    """Fermer des salles et réaffecter uniquement les examens concernés
+    
+    Si des examens restent sans solution, rien n'est enregistré sauf confirmer=True
+    (résultat 'a_confirmer': True pour redemander à l'utilisateur)
+    """
+    start_time = time_module.time()
+    reassigner = RoomClosureReassigner(session_id, lieu_ids, date_debut, date_fin)
+    
+    try:
+        reassigner.load_data()
+        
+        if reassigner.examens.empty:
+            if fermer_salles:
+                reassigner.save(fermer_salles=True)
+            return {
+                'success': True,
+                'temps': time_module.time() - start_time,
+                'nb_concernes': 0,
+                'reaffectes': [],
+                'deplaces': [],
+                'non_resolus': [],
+                'message': 'Aucun examen concerné par la fermeture'
+            }
+        
+        # 1. Même créneau, autre salle (couplage biparti)
+        restants = reassigner.match_same_slot()
+        
+        # 2. Déplacement des examens restants (résolution locale)
+        if restants:
+            reassigner.solve_local(restants)
+        
+        a_confirmer = bool(reassigner.non_resolus) and not confirmer
+        if not a_confirmer:
+            reassigner.save(fermer_salles=fermer_salles)
+        temps = time_module.time() - start_time
+        
+        return {
+            'success': not reassigner.non_resolus,
+            'a_confirmer': a_confirmer,
+            'temps': temps,
+            'nb_concernes': len(reassigner.examens),
+            'reaffectes': reassigner.reaffectes,
+            'deplaces': reassigner.deplaces,
+            'non_resolus': reassigner.non_resolus,
+            'message': (
+                f"{len(reassigner.reaffectes)} examen(s) réaffecté(s), "
+                f"{len(reassigner.deplaces)} déplacé(s), "
+                f"{len(reassigner.non_resolus)} sans solution en {temps:.2f}s"
+                + (" - rien n'a été enregistré, confirmer pour fermer malgré tout" if a_confirmer else "")
+            )
+        }
+    
+    except Exception as e:
+        print(f"❌ Erreur: {e}")
+        import traceback
+        traceback.print_exc()
+        return {
+            'success': False,
+            'message': f'Erreur: {str(e)}',
+            'temps': time_module.time() - start_time
+        }
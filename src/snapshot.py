@@ -0,0 +1,220 @@
+"""
+Instantanés reproductibles d'un problème d'optimisation
+Exporte l'instance chargée (tableaux .npy mappables en mémoire), le modèle
+CP-SAT sérialisé et les paramètres du solver, puis rejoue l'instance sans
+base de données
+"""
+
+from ortools.sat.python import cp_model
+from google.protobuf import text_format
+import numpy as np
+import pandas as pd
+import json
+import os
+from datetime import datetime
+from src.optimizer import ExamScheduleOptimizer
+
+VERSION_INSTANTANE = 1
+
+# Colonnes exportées par table: (colonne, type numpy)
+COLONNES = {
+    'modules': [('id', np.int64), ('code', str), ('nom', str), ('formation_id', np.int64), ('dept_id', np.int64)],
+    'lieux': [('id', np.int64), ('nom', str), ('type', str), ('capacite_examen', np.int64), ('batiment', str)],
+    'professeurs': [('id', np.int64), ('nom', str), ('prenom', str), ('dept_id', np.int64),
+                    ('max_surveillance_jour', np.int64)],
+}
+
+
+def _save_array(directory, name, values, dtype=None):
+    """Écrire un tableau .npy (les chaînes en Unicode fixe: mappable sans pickle)"""
+    array = np.asarray(values) if dtype is not str else np.asarray(values, dtype=np.str_)
+    if dtype not in (None, str):
+        array = array.astype(dtype)
+    np.save(os.path.join(directory, f'{name}.npy'), array, allow_pickle=False)
+
+
+def _load_array(directory, name, mmap=True):
+    return np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r' if mmap else None, allow_pickle=False)
+
+
+def export_snapshot(optimizer, directory):
+    """Écrire l'instance, le modèle et les paramètres d'un optimiseur construit"""
+    os.makedirs(directory, exist_ok=True)
+    
+    # 1. Tables de l'instance, une colonne par fichier
+    for table, colonnes in COLONNES.items():
+        df = getattr(optimizer, table)
+        for colonne, dtype in colonnes:
+            _save_array(directory, f'{table}_{colonne}', df[colonne].tolist(), dtype)
+    
+    # 2. Inscriptions au format CSR (étudiant -> modules)
+    inscriptions = optimizer.inscriptions.sort_values(['etudiant_id', 'module_id'])
+    etudiants, counts = np.unique(inscriptions['etudiant_id'].to_numpy(), return_counts=True)
+    _save_array(directory, 'inscriptions_etudiant_id', etudiants, np.int64)
+    _save_array(directory, 'inscriptions_indptr', np.concatenate([[0], np.cumsum(counts)]), np.int64)
+    _save_array(directory, 'inscriptions_module_id', inscriptions['module_id'].to_numpy(), np.int64)
+    
+    # 3. Fermetures temporaires: couples (jour, indice de lieu) interdits au modèle
+    _save_array(directory, 'fermetures', np.array(sorted(optimizer.fermetures), dtype=np.int64).reshape(-1, 2))
+    
+    # 4. Correspondance module -> indices des variables (jour, créneau, lieu, prof)
+    module_ids = list(optimizer.exam_vars.keys())
+    _save_array(directory, 'variables_module_id', module_ids, np.int64)
+    _save_array(directory, 'variables_index', [
+        [optimizer.exam_vars[m][key].Index() for key in ('jour', 'creneau', 'lieu', 'prof')]
+        for m in module_ids
+    ], np.int64)
+    
+    # 5. Modèle CP-SAT et paramètres du solver (protobuf binaire)
+    with open(os.path.join(directory, 'model.pb'), 'wb') as f:
+        f.write(optimizer.model.Proto().SerializeToString())
+    # Paramètres tels que solve() les appliquera (budget de temps compris)
+    parametres = type(optimizer.solver.parameters)()
+    parametres.CopyFrom(optimizer.solver.parameters)
+    parametres.max_time_in_seconds = optimizer.time_budget()
+    with open(os.path.join(directory, 'parametres.pb'), 'wb') as f:
+        f.write(parametres.SerializeToString())
+    
+    # 6. Métadonnées
+    meta = {
+        'version': VERSION_INSTANTANE,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'session_id': int(optimizer.session_id),
+        'date_debut': optimizer.date_debut.strftime('%Y-%m-%d'),
+        'nb_jours': optimizer.nb_jours,
+        'creneaux': [c.strftime('%H:%M') for c in optimizer.creneaux],
+        'time_limit': optimizer.time_limit,
+        'stagnation_seconds': optimizer.stagnation_seconds,
+        'gap_threshold': optimizer.gap_threshold,
+        'soft_mode': optimizer.soft_mode,
+        'empreinte_donnees': optimizer.input_fingerprint(),
+    }
+    with open(os.path.join(directory, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+    
+    print(f"✓ Instantané exporté dans {directory}")
+    return directory
+
+
+def load_snapshot(directory, mmap=True):
+    """Reconstruire un optimiseur (données + paramètres) sans base de données"""
+    with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+    
+    if meta['version'] != VERSION_INSTANTANE:
+        raise ValueError(f"Version d'instantané non supportée: {meta['version']}")
+    
+    optimizer = ExamScheduleOptimizer(
+        meta['session_id'], meta['date_debut'], meta['nb_jours'],
+        time_limit=meta['time_limit'],
+        stagnation_seconds=meta['stagnation_seconds'],
+        gap_threshold=meta['gap_threshold'],
+        soft_mode=meta['soft_mode']
+    )
+    
+    for table, colonnes in COLONNES.items():
+        setattr(optimizer, table, pd.DataFrame({
+            colonne: _load_array(directory, f'{table}_{colonne}', mmap)
+            for colonne, _ in colonnes
+        }))
+    
+    # Inscriptions: décompression CSR
+    etudiants = _load_array(directory, 'inscriptions_etudiant_id', mmap)
+    indptr = _load_array(directory, 'inscriptions_indptr', mmap)
+    optimizer.inscriptions = pd.DataFrame({
+        'etudiant_id': np.repeat(etudiants, np.diff(indptr)),
+        'module_id': _load_array(directory, 'inscriptions_module_id', mmap),
+    })
+    
+    # Fermetures (absentes des instantanés antérieurs: aucune)
+    if os.path.exists(os.path.join(directory, 'fermetures.npy')):
+        optimizer.fermetures = {(int(j), int(l)) for j, l in _load_array(directory, 'fermetures', mmap=False)}
+    
+    for module_id, count in optimizer.inscriptions.groupby('module_id').size().items():
+        optimizer.etudiants_par_module[module_id] = count
+    optimizer.modules['nb_inscrits'] = optimizer.modules['id'].map(optimizer.etudiants_par_module)
+    
+    with open(os.path.join(directory, 'parametres.pb'), 'rb') as f:
+        optimizer.solver.parameters.ParseFromString(f.read())
+    
+    return optimizer
+
+
+def load_snapshot_model(directory):
+    """Charger le modèle CP-SAT exact tel qu'il a été résolu"""
+    model = cp_model.CpModel()
+    with open(os.path.join(directory, 'model.pb'), 'rb') as f:
+        model.Proto().ParseFromString(f.read())
+    return model
+
+
+def replay_snapshot(directory, rebuild=False, time_limit=None, parametres=None):
+    """Rejouer un instantané: modèle sérialisé, ou reconstruit à partir des données"""
+    optimizer = load_snapshot(directory)
+    
+    if rebuild:
+        # Reconstruire le modèle avec le code actuel (mesure l'effet d'une modification)
+        optimizer.create_variables()
+        optimizer.add_constraints()
+        optimizer.set_objective()
+    else:
+        optimizer.model = load_snapshot_model(directory)
+    
+    # Réglage: paramètres du solver ("nom: valeur") puis temps maximum. Sans réglage
+    # explicite, le temps enregistré est conservé (solve() ne recalcule pas le budget)
+    for parametre in parametres or []:
+        text_format.Merge(parametre, optimizer.solver.parameters)
+    if time_limit is not None:
+        optimizer.time_limit = time_limit
+    else:
+        optimizer.time_limit = optimizer.solver.parameters.max_time_in_seconds
+    
+    with optimizer.timed_stage('resolution'):
+        success, temps = optimizer.solve()
+    
+    return {
+        'success': success,
+        'temps': temps,
+        'statut': optimizer.solver.StatusName(optimizer.status),
+        'raison_arret': optimizer.stop_reason,
+        'objectif': optimizer.solver.ObjectiveValue() if success else None,
+        'borne': optimizer.solver.BestObjectiveBound() if success else None,
+        'nb_branches': optimizer.solver.NumBranches(),
+        'nb_conflits': optimizer.solver.NumConflicts(),
+        'nb_variables': len(optimizer.model.Proto().variables),
+        'nb_contraintes': len(optimizer.model.Proto().constraints),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Export et rejeu d'instantanés de l'optimiseur")
+    commandes = parser.add_subparsers(dest='commande', required=True)
+    
+    export = commandes.add_parser('export', help="Charger une session depuis la base et l'exporter")
+    export.add_argument('repertoire')
+    export.add_argument('--session', type=int, default=1)
+    export.add_argument('--date-debut', required=True)
+    export.add_argument('--nb-jours', type=int, default=10)
+    export.add_argument('--souple', action='store_true')
+    
+    replay = commandes.add_parser('replay', help="Rejouer un instantané sans base de données")
+    replay.add_argument('repertoire')
+    replay.add_argument('--rebuild', action='store_true', help="Reconstruire le modèle à partir des données")
+    replay.add_argument('--time-limit', type=float, default=None)
+    replay.add_argument('--param', action='append', default=[], help="Paramètre du solver, ex: 'num_search_workers: 8'")
+    
+    args = parser.parse_args()
+    
+    if args.commande == 'export':
+        optimizer = ExamScheduleOptimizer(args.session, args.date_debut, args.nb_jours, soft_mode=args.souple)
+        optimizer.load_data()
+        optimizer.create_variables()
+        optimizer.add_constraints()
+        optimizer.set_objective()
+        export_snapshot(optimizer, args.repertoire)
+    else:
+        result = replay_snapshot(args.repertoire, rebuild=args.rebuild,
+                                 time_limit=args.time_limit, parametres=args.param)
+        print(json.dumps(result, indent=2, ensure_ascii=False))
@@ -0,0 +1,175 @@
+"""
+Validation incrémentale des modifications manuelles du planning
+Vérifie une création ou un déplacement d'examen avant écriture, à partir des
+index du moteur de conflits (étudiant -> jours, (jour, salle) et (jour, surveillant)
+-> examens non annulés), en ne parcourant que les étudiants et examens concernés
+"""
+
+import numpy as np
+from psycopg2 import errors as pg_errors
+from src.db_connection import db
+from src.conflict_engine import get_conflict_engine, minutes, SEUIL_SURVEILLANCES_JOUR
+
+
+# Chevauchements refusés par les contraintes d'exclusion de examens: jamais forçables
+TYPES_BLOQUANTS = ('salle', 'surveillant')
+
+
+class ScheduleValidator:
+    """Conflits qu'une création ou un déplacement d'examen provoquerait"""
+    
+    def __init__(self, session_id=1):
+        self.session_id = session_id
+    
+    def check_create(self, module_id, date_examen, heure_debut, duree_minutes=90, lieu_id=None, prof_id=None):
+        """Conflits d'un nouvel examen (mêmes paramètres que create_exam)"""
+        engine = get_conflict_engine(self.session_id)
+        
+        # Étudiants du module absents du moteur: aucun autre examen, donc aucun conflit
+        inscrits = db.execute_to_dataframe("""
+            SELECT DISTINCT etudiant_id FROM inscriptions WHERE session_id = %s AND module_id = %s
+        """, (self.session_id, module_id))['etudiant_id'].to_numpy(dtype=np.int64)
+        positions = np.searchsorted(engine.etudiant_ids, inscrits)
+        trouves = positions < len(engine.etudiant_ids)
+        positions, inscrits_trouves = positions[trouves], inscrits[trouves]
+        etudiants = positions[engine.etudiant_ids[positions] == inscrits_trouves]
+        
+        conflits = []
+        doublons = np.flatnonzero(engine.exam_modules == module_id)
+        for j in doublons:
+            conflits.append(self._conflict(engine, 'doublon', j, "Le module a déjà un examen dans la session"))
+        
+        return conflits + self._check(engine, -1, etudiants, len(inscrits), date_examen,
+                                      minutes(heure_debut), duree_minutes, lieu_id, prof_id)
+    
+    def check_update(self, exam_id, **changes):
+        """Conflits du déplacement d'un examen (mêmes champs que update_exam)"""
+        engine = get_conflict_engine(self.session_id)
+        i = engine.exam_index[exam_id]
+        
+        lieu_id = changes['lieu_id'] if 'lieu_id' in changes else (
+            engine.lieu_ids[engine.exam_lieux[i]] if engine.exam_lieux[i] >= 0 else None)
+        prof_id = changes['prof_surveillant_id'] if 'prof_surveillant_id' in changes else (
+            engine.prof_ids[engine.exam_profs[i]] if engine.exam_profs[i] >= 0 else None)
+        
+        return self._check(
+            engine, i, engine.exam_students(i), engine.exam_nb_inscrits[i],
+            changes.get('date_examen', engine.dates[engine.exam_jours[i]]),
+            minutes(changes['heure_debut']) if 'heure_debut' in changes else engine.exam_debuts[i],
+            changes.get('duree_minutes', engine.exam_durees[i]), lieu_id, prof_id
+        )
+    
+    def _check(self, engine, i, etudiants, nb_inscrits, date_examen, debut, duree, lieu_id, prof_id):
+        """Vérifier un examen (indice i, -1 si nouveau) placé à date_examen/debut"""
+        conflits = []
+        jour = engine.date_index.get(date_examen)
+        ancien_jour = engine.exam_jours[i] if i >= 0 else -1
+        
+        if jour is not None:
+            # Étudiants: autres examens (non annulés) le même jour, regroupés par examen
+            autres = engine.etudiant_jour[etudiants, jour] - (1 if jour == ancien_jour else 0)
+            _, examens = engine.student_exams(etudiants[autres > 0])
+            examens = examens[(engine.exam_jours[examens] == jour) & (examens != i) & engine.exam_actifs[examens]]
+            for j, n in zip(*np.unique(examens, return_counts=True)):
+                conflits.append(self._conflict(engine, 'etudiants', j,
+                                               f"{n} étudiant(s) ont déjà cet examen le même jour"))
+            
+            # Créneaux qui se chevauchent: seulement les examens du jour dans la salle / du surveillant
+            if lieu_id is not None and lieu_id in engine.lieu_index:
+                for j in self._overlaps(engine, engine.salle_examens, jour, engine.lieu_index[lieu_id], i, debut, duree):
+                    conflits.append(self._conflict(engine, 'salle', j, "Salle déjà occupée sur ce créneau"))
+            
+            if prof_id is not None and prof_id in engine.prof_index:
+                p = engine.prof_index[prof_id]
+                for j in self._overlaps(engine, engine.prof_examens, jour, p, i, debut, duree):
+                    conflits.append(self._conflict(engine, 'surveillant', j, "Surveillant déjà affecté sur ce créneau"))
+                
+                charge = len(engine.prof_examens.get((jour, p), set()) - {i}) + 1
+                if charge > SEUIL_SURVEILLANCES_JOUR:
+                    conflits.append({
+                        'type': 'surveillance', 'bloquant': False, 'examen_id': None, 'code_module': None,
+                        'description': f"{engine.prof_noms[p]}: {charge} surveillances ce jour "
+                                       f"(max {SEUIL_SURVEILLANCES_JOUR})"
+                    })
+        
+        # Capacité de la salle
+        if lieu_id is not None and lieu_id in engine.lieu_index:
+            capacite = engine.lieu_capacites[engine.lieu_index[lieu_id]]
+            if nb_inscrits > capacite:
+                conflits.append({
+                    'type': 'capacite', 'bloquant': False, 'examen_id': None, 'code_module': None,
+                    'description': f"{nb_inscrits} inscrits pour {capacite} places"
+                })
+        
+        return conflits
+    
+    @staticmethod
+    def _overlaps(engine, index, jour, cle, i, debut, duree):
+        """Examens de index[(jour, cle)] (hors i) dont le créneau chevauche debut/duree"""
+        autres = np.array(sorted(index.get((jour, cle), set()) - {i}), dtype=np.int64)
+        return autres[(engine.exam_debuts[autres] < debut + duree)
+                      & (debut < engine.exam_debuts[autres] + engine.exam_durees[autres])]
+    
+    @staticmethod
+    def _conflict(engine, type_conflit, j, description):
+        return {
+            'type': type_conflit,
+            'bloquant': type_conflit in TYPES_BLOQUANTS,
+            'examen_id': int(engine.exam_ids[j]),
+            'code_module': engine.exam_codes[j],
+            'description': description,
+        }
+
+
+def _refus(conflits, force):
+    """Résultat de refus, ou None si l'écriture peut avoir lieu
+    
+    force lève seulement les conflits à l'échelle du jour (étudiants, charge du
+    surveillant, capacité, doublon): salle ou surveillant déjà occupés restent refusés
+    """
+    bloquants = [c for c in conflits if c['bloquant']]
+    if bloquants:
+        return {'success': False, 'conflits': conflits,
+                'message': f"{len(bloquants)} conflit(s) bloquant(s): salle ou surveillant déjà occupé"}
+    if conflits and not force:
+        return {'success': False, 'message': f"{len(conflits)} conflit(s) détecté(s)", 'conflits': conflits}
+    return None
+
+
+def _exclusion(conflits):
+    """Refus d'une écriture rejetée par une contrainte d'exclusion (index en retard)"""
+    return {'success': False, 'conflits': conflits,
+            'message': "Salle ou surveillant déjà occupé sur ce créneau (contrainte d'exclusion)"}
+
+
+def create_exam_checked(module_id, session_id, date_examen, heure_debut, duree_minutes=90,
+                        lieu_id=None, prof_id=None, force=False):
+    """Créer un examen après validation (force=True: enregistrer malgré les conflits non bloquants)"""
+    conflits = ScheduleValidator(session_id).check_create(
+        module_id, date_examen, heure_debut, duree_minutes, lieu_id, prof_id
+    )
+    refus = _refus(conflits, force)
+    if refus:
+        return refus
+    
+    try:
+        exam_id = db.create_exam(module_id, session_id, date_examen, heure_debut, duree_minutes, lieu_id, prof_id)
+    except pg_errors.ExclusionViolation:
+        return _exclusion(conflits)
+    return {'success': True, 'message': f"Examen créé (ID: {exam_id})", 'conflits': conflits, 'examen_id': exam_id}
+
+
+def update_exam_checked(exam_id, session_id=1, force=False, **changes):
+    """Modifier un examen après validation (force=True: enregistrer malgré les conflits non bloquants)"""
+    conflits = ScheduleValidator(session_id).check_update(exam_id, **changes)
+    refus = _refus(conflits, force)
+    if refus:
+        return refus
+    
+    try:
+        modifie = db.update_exam(exam_id, session_id=session_id, **changes)
+    except pg_errors.ExclusionViolation:
+        return _exclusion(conflits)
+    if not modifie:
+        return {'success': False, 'message': "Examen introuvable dans cette session", 'conflits': conflits}
+    return {'success': True, 'message': "Examen modifié", 'conflits': conflits, 'examen_id': exam_id}
@@ -0,0 +1,72 @@
+"""
+Fixtures communes: données de session synthétiques pour les moteurs en mémoire
+(ConflictEngine, RoomOccupancy, ProctorAnalytics), sans base de données
+"""
+
+import os
+import sys
+from contextlib import contextmanager
+from datetime import date, time
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import db_connection
+from src.db_connection import db
+
+JOUR = date(2026, 1, 26)
+
+
+def examens_df(lignes):
+    """DataFrame au format de ConflictEngine.load (valeurs par défaut complétées)"""
+    defauts = {'date_examen': JOUR, 'heure_debut': time(8, 30), 'duree_minutes': 90,
+               'lieu_id': 1, 'prof_surveillant_id': 1, 'nb_inscrits': 10, 'statut': 'planifie'}
+    df = pd.DataFrame([{**defauts, **ligne} for ligne in lignes])
+    df['code'] = 'M' + df['module_id'].astype(str)
+    return df
+
+
+@pytest.fixture
+def lieux():
+    return pd.DataFrame({
+        'id': [1, 2, 3],
+        'nom': ['Amphi A', 'Salle B', 'Salle C'],
+        'capacite_examen': [200, 30, 30],
+        'disponible': [True, True, True],
+        'type': ['Amphi', 'Salle', 'Salle'],
+    })
+
+
+@pytest.fixture
+def professeurs():
+    return pd.DataFrame({'id': [1, 2], 'nom': ['Martin', 'Durand'], 'prenom': ['Anne', 'Luc']})
+
+
+@pytest.fixture
+def base_enregistree(monkeypatch):
+    """Remplace la connexion de db: les lignes passées à execute_values sont conservées"""
+    lignes = []
+    
+    class Curseur:
+        rowcount = 0
+        
+        def execute(self, query, params=None):
+            pass
+    
+    class Connexion:
+        def cursor(self):
+            return Curseur()
+    
+    @contextmanager
+    def connexion(readonly=False):
+        yield Connexion()
+    
+    def execute_values(cursor, query, argslist, page_size=100, fetch=False):
+        lignes.extend(argslist)
+        return [(True,)] * len(argslist) if fetch else None
+    
+    monkeypatch.setattr(db, 'get_connection', connexion)
+    monkeypatch.setattr(db_connection, 'execute_values', execute_values)
+    return lignes
@@ -0,0 +1,131 @@
+"""
+Tests des indicateurs d'équité des surveillances (src/analytics.py)
+"""
+
+from datetime import time, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.analytics import ProctorAnalytics, gini
+from tests.conftest import JOUR
+
+
+@pytest.fixture
+def professeurs():
+    return pd.DataFrame({
+        'id': [1, 2, 3, 4],
+        'professeur': ['Martin Anne', 'Durand Luc', 'Petit Marie', 'Roux Paul'],
+        'dept_id': [10, 10, 20, 20],
+        'departement': ['Informatique', 'Informatique', 'Chimie', 'Chimie'],
+        'max_surveillance_jour': [2, 2, 1, 2],
+    })
+
+
+def affectations(lignes):
+    defauts = {'date_examen': JOUR, 'duree_minutes': 90, 'dept_examen': 10}
+    return pd.DataFrame([{**defauts, **ligne} for ligne in lignes],
+                        columns=['prof_surveillant_id', 'date_examen', 'heure_debut', 'duree_minutes', 'dept_examen'])
+
+
+def analyse(professeurs, lignes):
+    return ProctorAnalytics(1).build(professeurs, affectations(lignes))
+
+
+def test_gini():
+    assert gini([]) == 0.0
+    assert gini([0, 0, 0]) == 0.0
+    assert gini([3, 3, 3, 3]) == pytest.approx(0.0)
+    assert gini([0, 0, 0, 8]) == pytest.approx(0.75)  # (n - 1) / n
+    assert gini([1, 2, 3, 4]) == pytest.approx(0.25)
+    assert gini([4, 1, 3, 2]) == gini([1, 2, 3, 4])
+
+
+def test_gini_formule_des_differences_absolues():
+    x = np.random.default_rng(0).integers(0, 12, 50)
+    attendu = np.abs(x[:, None] - x[None, :]).sum() / (2 * len(x) ** 2 * x.mean())
+    assert gini(x) == pytest.approx(attendu)
+
+
+def test_charges_et_depassements(professeurs):
+    resultat = analyse(professeurs, [
+        {'prof_surveillant_id': 1, 'heure_debut': time(8, 30)},
+        {'prof_surveillant_id': 1, 'heure_debut': time(11)},
+        {'prof_surveillant_id': 1, 'heure_debut': time(14)},
+        {'prof_surveillant_id': 1, 'heure_debut': time(8, 30), 'date_examen': JOUR + timedelta(days=1)},
+        {'prof_surveillant_id': 3, 'heure_debut': time(8, 30)},
+        {'prof_surveillant_id': 3, 'heure_debut': time(14)},
+    ]).par_professeur.set_index('id')
+    
+    assert list(resultat['nb_surveillances']) == [4, 0, 2, 0]
+    assert list(resultat['nb_jours']) == [2, 0, 1, 0]
+    assert list(resultat['max_par_jour']) == [3, 0, 2, 0]
+    assert list(resultat['depassements']) == [1, 0, 1, 0]
+
+
+def test_creneaux_consecutifs(professeurs):
+    resultat = analyse(professeurs, [
+        # Professeur 1: 08:30-10:00 puis 10:30 (écart 30 min) puis 12:00 (écart 0)
+        {'prof_surveillant_id': 1, 'heure_debut': time(8, 30)},
+        {'prof_surveillant_id': 1, 'heure_debut': time(12)},
+        {'prof_surveillant_id': 1, 'heure_debut': time(10, 30)},
+        # Professeur 2: 08:30-10:00 puis 10:31 (écart 31 min), puis le lendemain à 08:30
+        {'prof_surveillant_id': 2, 'heure_debut': time(8, 30)},
+        {'prof_surveillant_id': 2, 'heure_debut': time(10, 31)},
+        {'prof_surveillant_id': 2, 'heure_debut': time(8, 30), 'date_examen': JOUR + timedelta(days=1)},
+        # Professeur 3: deux surveillances qui se chevauchent, puis après la pause déjeuner
+        {'prof_surveillant_id': 3, 'heure_debut': time(8, 30)},
+        {'prof_surveillant_id': 3, 'heure_debut': time(9)},
+        {'prof_surveillant_id': 3, 'heure_debut': time(14), 'duree_minutes': np.nan},
+    ])
+    
+    assert list(resultat.par_professeur['creneaux_consecutifs']) == [2, 0, 0, 0]
+    assert resultat.nb_consecutifs == 2
+
+
+def test_equilibre_par_departement(professeurs):
+    resultat = analyse(professeurs, [
+        {'prof_surveillant_id': 1, 'heure_debut': time(8, 30)},
+        {'prof_surveillant_id': 1, 'heure_debut': time(14), 'dept_examen': 20},
+        {'prof_surveillant_id': 2, 'heure_debut': time(8, 30)},
+        {'prof_surveillant_id': 2, 'heure_debut': time(14)},
+        {'prof_surveillant_id': 3, 'heure_debut': time(8, 30), 'dept_examen': 20},
+        {'prof_surveillant_id': 3, 'heure_debut': time(14), 'dept_examen': 20},
+        {'prof_surveillant_id': 3, 'heure_debut': time(8, 30), 'date_examen': JOUR + timedelta(days=1)},
+        {'prof_surveillant_id': 3, 'heure_debut': time(14), 'date_examen': JOUR + timedelta(days=1)},
+    ])
+    depts = resultat.par_departement.set_index('dept_id')
+    
+    assert depts.loc[10, 'gini'] == pytest.approx(0.0)
+    assert depts.loc[20, 'gini'] == pytest.approx(gini([4, 0]))
+    assert list(depts['nb_surveillances']) == [4, 4]
+    assert list(depts['part_surveillances']) == [50.0, 50.0]
+    assert list(depts['part_professeurs']) == [50.0, 50.0]
+    assert resultat.gini == pytest.approx(gini([2, 2, 4, 0]))
+    assert resultat.score_equite == round(100 * (1 - gini([2, 2, 4, 0])))
+    
+    chimie = resultat.department_proctors(20)
+    assert list(zip(chimie['surveillant'], chimie['Surveillances'])) == [('Petit Marie', 2), ('Martin Anne', 1)]
+    assert resultat.department_proctors(99).empty
+
+
+def test_distribution(professeurs):
+    resultat = analyse(professeurs, [
+        {'prof_surveillant_id': 1, 'heure_debut': time(8, 30)},
+        {'prof_surveillant_id': 2, 'heure_debut': time(8, 30)},
+        {'prof_surveillant_id': 2, 'heure_debut': time(14)},
+    ])
+    dist = resultat.distribution()
+    
+    assert list(zip(dist['Nombre de surveillances'], dist['Nombre de professeurs'])) == [(0, 2), (1, 1), (2, 1)]
+
+
+def test_session_sans_affectation(professeurs):
+    resultat = analyse(professeurs, [])
+    
+    assert list(resultat.par_professeur['nb_surveillances']) == [0, 0, 0, 0]
+    assert resultat.gini == 0.0
+    assert resultat.score_equite == 100
+    assert resultat.nb_depassements == 0
+    assert resultat.nb_consecutifs == 0
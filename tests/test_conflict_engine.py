@@ -0,0 +1,174 @@
+"""
+Tests du moteur de conflits en mémoire (src/conflict_engine.py)
+"""
+
+from datetime import time, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import conflict_engine
+from src.conflict_engine import ConflictEngine, SEUIL_SURVEILLANCES_JOUR
+from tests.conftest import JOUR, examens_df
+
+
+def moteur(examens, inscriptions, lieux, professeurs, session_id=1):
+    return ConflictEngine(session_id).build(examens, inscriptions, lieux, professeurs)
+
+
+def test_deux_examens_d_un_module_ont_des_cles_distinctes(monkeypatch, lieux, professeurs, base_enregistree):
+    # Module 10 réparti sur deux salles trop petites, même créneau
+    examens = examens_df([
+        {'id': 1, 'module_id': 10, 'lieu_id': 2, 'nb_inscrits': 40},
+        {'id': 2, 'module_id': 10, 'lieu_id': 3, 'nb_inscrits': 40, 'prof_surveillant_id': 2},
+    ])
+    inscriptions = pd.DataFrame({'etudiant_id': [100, 101], 'module_id': [10, 10]})
+    engine = moteur(examens, inscriptions, lieux, professeurs)
+    monkeypatch.setattr(conflict_engine, 'get_conflict_engine', lambda session_id: engine)
+    
+    result = conflict_engine.detect_and_store_conflicts(1)
+    
+    cles = [ligne[3] for ligne in base_enregistree]
+    assert len(cles) == len(set(cles))
+    assert {(ligne[0], ligne[4]) for ligne in base_enregistree} >= {(1, 'capacite'), (2, 'capacite')}
+    assert result['total'] == len(base_enregistree)
+
+
+def test_doublon_meme_creneau_fusionne_avant_upsert(monkeypatch, lieux, professeurs, base_enregistree):
+    # Doublon forcé dans la même salle au même créneau (l'un annulé): même clé
+    examens = examens_df([
+        {'id': 1, 'module_id': 10, 'lieu_id': 2, 'nb_inscrits': 40},
+        {'id': 2, 'module_id': 10, 'lieu_id': 2, 'nb_inscrits': 60, 'statut': 'annule'},
+    ])
+    inscriptions = pd.DataFrame({'etudiant_id': [100], 'module_id': [10]})
+    engine = moteur(examens, inscriptions, lieux, professeurs)
+    monkeypatch.setattr(conflict_engine, 'get_conflict_engine', lambda session_id: engine)
+    
+    conflict_engine.detect_and_store_conflicts(1)
+    
+    capacite = [ligne for ligne in base_enregistree if ligne[4] == 'capacite']
+    assert len(capacite) == 1
+    assert capacite[0][6] == 5  # sévérité maximale conservée
+    cles = [ligne[3] for ligne in base_enregistree]
+    assert len(cles) == len(set(cles))
+
+
+def test_cle_stable_si_le_module_garde_son_creneau(lieux, professeurs):
+    inscriptions = pd.DataFrame({'etudiant_id': [100], 'module_id': [10]})
+    avant = moteur(examens_df([{'id': 1, 'module_id': 10, 'lieu_id': 2, 'nb_inscrits': 40}]),
+                   inscriptions, lieux, professeurs)
+    regenere = moteur(examens_df([{'id': 57, 'module_id': 10, 'lieu_id': 2, 'nb_inscrits': 40}]),
+                      inscriptions, lieux, professeurs)
+    deplace = moteur(examens_df([{'id': 57, 'module_id': 10, 'lieu_id': 2, 'nb_inscrits': 40,
+                                  'heure_debut': time(14)}]), inscriptions, lieux, professeurs)
+    
+    assert avant.conflict_records()[0][2] == regenere.conflict_records()[0][2]
+    assert avant.conflict_records()[0][2] != deplace.conflict_records()[0][2]
+
+
+# =====================================================
+# PARITÉ AVEC LES FONCTIONS SQL detecter_*
+# =====================================================
+
+def session_aleatoire(graine):
+    """Session synthétique: 120 modules, 400 étudiants, 5 jours, 6 salles, 8 surveillants"""
+    rng = np.random.default_rng(graine)
+    jours = [JOUR + timedelta(days=d) for d in range(5)]
+    nb = 120
+    examens = examens_df([{
+        'id': 1000 + m, 'module_id': m,
+        'date_examen': jours[rng.integers(0, 5)],
+        'lieu_id': int(rng.integers(1, 7)) if rng.random() > 0.1 else None,
+        'prof_surveillant_id': int(rng.integers(1, 9)) if rng.random() > 0.1 else None,
+        'nb_inscrits': int(rng.integers(5, 120)),
+    } for m in range(1, nb + 1)])
+    inscriptions = pd.DataFrame({'etudiant_id': rng.integers(1, 401, 2000),
+                                 'module_id': rng.integers(1, nb + 1, 2000)})
+    lieux = pd.DataFrame({'id': np.arange(1, 7), 'nom': [f'L{i}' for i in range(1, 7)],
+                          'capacite_examen': rng.integers(20, 150, 6)})
+    professeurs = pd.DataFrame({'id': np.arange(1, 9), 'nom': 'Nom', 'prenom': [f'P{i}' for i in range(1, 9)]})
+    return examens, inscriptions, lieux, professeurs, jours, rng
+
+
+def reference_sql(examens, inscriptions, lieux, professeurs):
+    """Mêmes jointures et regroupements que detecter_conflits_etudiants/professeurs/depassement_capacite"""
+    jointure = inscriptions.merge(examens, on='module_id')
+    etudiants = jointure.groupby(['etudiant_id', 'date_examen'])['id'].nunique()
+    etudiants = {(int(e), d, int(n)) for (e, d), n in etudiants[etudiants > 1].items()}
+    
+    surveillances = examens.dropna(subset=['prof_surveillant_id']).groupby(
+        ['prof_surveillant_id', 'date_examen']).size()
+    surveillances = {(int(p), d, int(n)) for (p, d), n in
+                     surveillances[surveillances > SEUIL_SURVEILLANCES_JOUR].items()}
+    
+    capacite = examens.dropna(subset=['lieu_id']).merge(lieux, left_on='lieu_id', right_on='id', suffixes=('', '_lieu'))
+    capacite = capacite[capacite['nb_inscrits'] > capacite['capacite_examen']]
+    capacite = {(int(r.id), int(r.nb_inscrits - r.capacite_examen)) for r in capacite.itertuples()}
+    return etudiants, surveillances, capacite
+
+
+def resultats_moteur(engine):
+    etudiants = engine.student_conflicts()
+    professeurs = engine.professor_conflicts()
+    capacite = engine.capacity_conflicts()
+    return (
+        {(int(e), d, int(n)) for e, d, n in zip(etudiants['etudiant_id'], etudiants['date_examen'], etudiants['nb_examens'])},
+        {(int(p), d, int(n)) for p, d, n in zip(professeurs['professeur_id'], professeurs['date_examen'], professeurs['nb_surveillances'])},
+        {(int(e), int(d)) for e, d in zip(capacite['examen_id'], capacite['depassement'])},
+    )
+
+
+@pytest.mark.parametrize('graine', [0, 1, 2])
+def test_parite_avec_les_fonctions_sql(graine):
+    examens, inscriptions, lieux, professeurs, _, _ = session_aleatoire(graine)
+    engine = moteur(examens, inscriptions, lieux, professeurs)
+    
+    attendu = reference_sql(examens, inscriptions, lieux, professeurs)
+    assert all(attendu)  # la session exerce les trois détections
+    assert resultats_moteur(engine) == attendu
+
+
+def test_liste_modules_comme_string_agg():
+    examens, inscriptions, lieux, professeurs, _, _ = session_aleatoire(0)
+    engine = moteur(examens, inscriptions, lieux, professeurs)
+    
+    codes = dict(zip(examens['id'], examens['code']))
+    jointure = inscriptions.drop_duplicates().merge(examens, on='module_id')
+    for row in engine.student_conflicts().itertuples(index=False):
+        attendus = jointure[(jointure['etudiant_id'] == row.etudiant_id) & (jointure['date_examen'] == row.date_examen)]
+        assert sorted(row.liste_modules.split(', ')) == sorted(codes[e] for e in attendus['id'])
+
+
+@pytest.mark.parametrize('graine', [0, 1])
+def test_parite_apres_deplacements(graine):
+    examens, inscriptions, lieux, professeurs, jours, rng = session_aleatoire(graine)
+    engine = moteur(examens, inscriptions, lieux, professeurs)
+    
+    for k in range(60):
+        ligne = int(rng.integers(0, len(examens)))
+        # Une date hors session de temps en temps (nouvelle colonne de compteurs)
+        changes = {
+            'date_examen': jours[rng.integers(0, 5)] if k % 7 else JOUR + timedelta(days=30),
+            'prof_surveillant_id': int(rng.integers(1, 9)) if k % 3 else None,
+            'lieu_id': int(rng.integers(1, 7)),
+        }
+        engine.move_exam(int(examens.at[ligne, 'id']), **changes)
+        for champ, valeur in changes.items():
+            examens.at[ligne, champ] = valeur
+    
+    assert resultats_moteur(engine) == reference_sql(examens, inscriptions, lieux, professeurs)
+    assert resultats_moteur(moteur(examens, inscriptions, lieux, professeurs)) == resultats_moteur(engine)
+
+
+def test_copie_independante():
+    examens, inscriptions, lieux, professeurs, jours, _ = session_aleatoire(0)
+    engine = moteur(examens, inscriptions, lieux, professeurs)
+    avant = resultats_moteur(engine)
+    
+    simulation = engine.copy()
+    for exam_id in examens['id'][:20]:
+        simulation.move_exam(int(exam_id), date_examen=jours[0], prof_surveillant_id=1)
+    
+    assert resultats_moteur(engine) == avant
+    assert resultats_moteur(simulation) != avant
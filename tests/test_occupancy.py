@@ -0,0 +1,161 @@
+"""
+Tests de la grille d'occupation des salles (src/occupancy.py)
+"""
+
+from datetime import time, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import occupancy
+from src.db_connection import db
+from src.occupancy import RoomOccupancy
+from tests.conftest import JOUR
+
+
+def examens(lignes):
+    defauts = {'date_examen': JOUR, 'heure_debut': time(8, 30), 'duree_minutes': 90, 'statut': 'planifie'}
+    return pd.DataFrame([{**defauts, **ligne} for ligne in lignes],
+                        columns=['id', 'lieu_id', 'date_examen', 'heure_debut', 'duree_minutes', 'statut'])
+
+
+def fermetures(lignes=()):
+    return pd.DataFrame(list(lignes), columns=['lieu_id', 'date_debut', 'date_fin'])
+
+
+def grille(lieux, lignes, closes=()):
+    return RoomOccupancy(1).build(lieux, examens(lignes), fermetures(closes))
+
+
+def libres(occupation, heure, duree=90, date_examen=JOUR, min_capacity=0):
+    return list(occupation.free_rooms(date_examen, heure, duree, min_capacity)['id'])
+
+
+def test_salle_occupee_sur_la_plage(lieux):
+    occupation = grille(lieux, [{'id': 1, 'lieu_id': 2}])  # 08:30 - 10:00
+    
+    assert libres(occupation, time(9)) == [1, 3]
+    assert libres(occupation, time(7, 45), 60) == [1, 3]
+    assert libres(occupation, time(10)) == [1, 2, 3]  # fin exclue
+    assert libres(occupation, time(7), 30) == [1, 2, 3]
+    assert libres(occupation, time(9), date_examen=JOUR + timedelta(days=1)) == [1, 2, 3]
+
+
+def test_plage_arrondie_au_pas_englobant(lieux):
+    occupation = grille(lieux, [{'id': 1, 'lieu_id': 2, 'heure_debut': time(8, 35), 'duree_minutes': 80}])
+    
+    # 08:35 - 09:55 occupe les pas de 08:30 à 10:00
+    assert 2 not in libres(occupation, time(8), 40)
+    assert 2 not in libres(occupation, time(9, 55), 5)
+    assert 2 in libres(occupation, time(10), 30)
+
+
+def test_salles_indisponibles_capacite_et_ordre(lieux):
+    lieux.loc[lieux['id'] == 3, 'disponible'] = False
+    occupation = grille(lieux, [])
+    
+    assert libres(occupation, time(9)) == [1, 2]
+    assert libres(occupation, time(9), min_capacity=31) == [1]
+    assert list(occupation.free_rooms(JOUR, time(9), 90).columns) == list(lieux.columns)
+
+
+def test_fermetures_temporaires(lieux):
+    occupation = grille(lieux, [], [
+        (2, JOUR, JOUR + timedelta(days=1)),
+        (3, JOUR + timedelta(days=2), pd.NaT),  # sans date de fin
+        (99, JOUR, JOUR),  # salle inconnue ignorée
+    ])
+    
+    assert libres(occupation, time(9)) == [1, 3]
+    assert libres(occupation, time(9), date_examen=JOUR + timedelta(days=1)) == [1, 3]
+    assert libres(occupation, time(9), date_examen=JOUR + timedelta(days=2)) == [1, 2]
+    assert libres(occupation, time(9), date_examen=JOUR + timedelta(days=60)) == [1, 2]
+
+
+def test_examen_annule_et_duree_absente(lieux):
+    occupation = grille(lieux, [
+        {'id': 1, 'lieu_id': 2, 'statut': 'annule'},
+        {'id': 2, 'lieu_id': 3, 'duree_minutes': np.nan},
+        {'id': 3, 'lieu_id': None},
+    ])
+    
+    assert 1 not in occupation.placements
+    assert occupation.placements[2][3] == 90
+    assert libres(occupation, time(9, 45), 15) == [1, 2]
+    assert libres(occupation, time(10)) == [1, 2, 3]
+
+
+def test_taux_occupation_par_creneau(lieux):
+    occupation = grille(lieux, [{'id': 1, 'lieu_id': 1}, {'id': 2, 'lieu_id': 2, 'heure_debut': time(9)}])
+    taux = occupation.slot_occupancy().set_index('heure')
+    
+    assert taux.loc['08:00', 'nb_salles_occupees'] == 0
+    assert taux.loc['08:30', 'nb_salles_occupees'] == 1
+    assert taux.loc['09:00', 'taux_occupation'] == round(2 * 100 / 3, 2)
+    assert taux.loc['10:00', 'nb_salles_occupees'] == 1
+    assert taux.loc['10:30', 'nb_salles_occupees'] == 0
+
+
+def test_mises_a_jour_incrementales_egales_a_la_reconstruction(lieux):
+    rng = np.random.default_rng(0)
+    jours = [JOUR + timedelta(days=d) for d in range(3)]
+    lignes = {eid: {'id': eid, 'lieu_id': int(rng.integers(1, 4)), 'date_examen': jours[rng.integers(0, 3)],
+                    'heure_debut': time(int(rng.integers(8, 17)), 15 * int(rng.integers(0, 4)))}
+              for eid in range(1, 31)}
+    occupation = grille(lieux, lignes.values())
+    
+    for k in range(100):
+        eid = int(rng.integers(1, 41))
+        if k % 9 == 0:
+            occupation.remove_exam(eid)
+            lignes.pop(eid, None)
+            continue
+        changes = {'lieu_id': int(rng.integers(1, 4)) if k % 5 else None,
+                   'date_examen': jours[rng.integers(0, 3)] if k % 11 else JOUR + timedelta(days=10),
+                   'heure_debut': time(int(rng.integers(8, 17)), 15 * int(rng.integers(0, 4))),
+                   'duree_minutes': int(rng.choice([60, 90, 120]))}
+        if k % 13 == 0:
+            changes['statut'] = 'annule'
+        occupation.move_exam(eid, **changes)
+        lignes[eid] = {**lignes.get(eid, {'id': eid}), **changes}
+    
+    reference = grille(lieux, lignes.values())
+    assert occupation.placements == reference.placements
+    for date_examen in set(occupation.dates) | set(reference.dates):
+        for heure in (time(8), time(10, 15), time(14, 45)):
+            assert libres(occupation, heure, date_examen=date_examen) == libres(reference, heure, date_examen=date_examen)
+
+
+def test_report_seulement_si_seule_ecriture(monkeypatch, lieux):
+    occupation = grille(lieux, [{'id': 1, 'lieu_id': 2}])
+    occupation.versions = db.cache.versions(occupancy.TABLES_SOURCES)
+    monkeypatch.setattr(occupancy, '_grilles', {1: occupation})
+    
+    db.cache.bump('examens')
+    assert occupancy.apply_exam_change(1, 1, {'lieu_id': 3})
+    assert libres(occupation, time(9)) == [1, 2]
+    
+    # Deux écritures depuis le chargement: la grille sera rechargée
+    db.cache.bump('examens')
+    db.cache.bump('examens')
+    assert not occupancy.apply_exam_change(1, 1, {'lieu_id': 2})
+    assert libres(occupation, time(9)) == [1, 2]
+
+
+def test_examen_annule_modifie_reste_hors_grille(monkeypatch, lieux):
+    occupation = grille(lieux, [{'id': 1, 'lieu_id': 2, 'statut': 'annule'}, {'id': 2, 'lieu_id': 3}])
+    occupation.versions = db.cache.versions(occupancy.TABLES_SOURCES)
+    monkeypatch.setattr(occupancy, '_grilles', {1: occupation})
+    
+    db.cache.bump('examens')
+    assert occupancy.apply_exam_change(1, 1, {'date_examen': JOUR, 'heure_debut': time(9), 'lieu_id': 1})
+    assert libres(occupation, time(9)) == [1, 2]
+    
+    db.cache.bump('examens')
+    assert occupancy.apply_exam_change(1, 2, {'statut': 'annule'})
+    assert libres(occupation, time(9)) == [1, 2, 3]
+    
+    # Réactivation: placement inconnu de la grille, rechargement
+    db.cache.bump('examens')
+    assert not occupancy.apply_exam_change(1, 2, {'statut': 'planifie'})
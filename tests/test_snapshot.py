@@ -0,0 +1,76 @@
+"""
+Tests de l'aller-retour export/rejeu des instantanés (src/snapshot.py)
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.optimizer import ExamScheduleOptimizer
+from src.snapshot import export_snapshot, load_snapshot, load_snapshot_model
+
+
+def optimiseur(soft_mode=False, nb_modules=12, nb_etudiants=60, nb_lieux=8, nb_profs=10):
+    """Petite instance synthétique (quatre modules par étudiant dans sa formation)"""
+    rng = np.random.default_rng(0)
+    optimizer = ExamScheduleOptimizer(1, '2026-01-26', 5, time_limit=5, soft_mode=soft_mode)
+    optimizer.modules = pd.DataFrame({
+        'id': np.arange(1, nb_modules + 1),
+        'code': [f'M{i}' for i in range(1, nb_modules + 1)],
+        'nom': 'Module', 'formation_id': np.arange(nb_modules) // 6 + 1, 'dept_id': 1,
+    })
+    lignes = [(e, f * 6 + m + 1)
+              for e in range(1, nb_etudiants + 1)
+              for f in [rng.integers(0, nb_modules // 6)]
+              for m in rng.choice(6, 4, replace=False)]
+    # Ordre de load_data (ORDER BY etudiant_id, module_id)
+    optimizer.inscriptions = pd.DataFrame(lignes, columns=['etudiant_id', 'module_id']).sort_values(
+        ['etudiant_id', 'module_id'], ignore_index=True)
+    optimizer.lieux = pd.DataFrame({
+        'id': np.arange(1, nb_lieux + 1), 'nom': [f'L{i}' for i in range(nb_lieux)],
+        'type': ['Amphi'] * 2 + ['Salle'] * (nb_lieux - 2),
+        'capacite_examen': [200] * 2 + [30] * (nb_lieux - 2), 'batiment': 'A',
+    })
+    optimizer.professeurs = pd.DataFrame({
+        'id': np.arange(1, nb_profs + 1), 'nom': 'Nom', 'prenom': 'Prénom',
+        'dept_id': 1, 'max_surveillance_jour': 3,
+    })
+    for module_id, count in optimizer.inscriptions.groupby('module_id').size().items():
+        optimizer.etudiants_par_module[module_id] = count
+    optimizer.modules['nb_inscrits'] = optimizer.modules['id'].map(optimizer.etudiants_par_module)
+    optimizer.fermetures = {(0, 0), (3, 1)}
+    return optimizer
+
+
+def construire(optimizer):
+    optimizer.create_variables()
+    optimizer.add_constraints()
+    optimizer.set_objective()
+    return optimizer
+
+
+def test_aller_retour_donnees_et_parametres(tmp_path):
+    source = construire(optimiseur())
+    export_snapshot(source, tmp_path)
+    
+    copie = load_snapshot(tmp_path)
+    
+    for table in ('modules', 'lieux', 'professeurs'):
+        assert getattr(copie, table)['id'].tolist() == getattr(source, table)['id'].tolist()
+    assert (copie.inscriptions.to_numpy() == source.inscriptions[['etudiant_id', 'module_id']].to_numpy()).all()
+    assert copie.fermetures == source.fermetures
+    assert copie.solver.parameters.max_time_in_seconds == source.time_budget()
+    assert copie.input_fingerprint() == source.input_fingerprint()
+
+
+@pytest.mark.parametrize('soft_mode', [False, True])
+def test_modele_reconstruit_identique_au_modele_resolu(tmp_path, soft_mode):
+    source = construire(optimiseur(soft_mode))
+    export_snapshot(source, tmp_path)
+    
+    reconstruit = construire(load_snapshot(tmp_path)).model.Proto()
+    enregistre = load_snapshot_model(tmp_path).Proto()
+    
+    assert len(reconstruit.variables) == len(enregistre.variables)
+    assert len(reconstruit.constraints) == len(enregistre.constraints)
+    assert reconstruit.SerializeToString(deterministic=True) == enregistre.SerializeToString(deterministic=True)
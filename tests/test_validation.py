@@ -0,0 +1,74 @@
+"""
+Tests de la validation des modifications manuelles (src/validation.py)
+"""
+
+from datetime import time, timedelta
+
+import pandas as pd
+import pytest
+
+from src import validation
+from src.conflict_engine import ConflictEngine
+from src.db_connection import db
+from tests.conftest import JOUR, examens_df
+
+
+@pytest.fixture
+def engine(monkeypatch, lieux, professeurs):
+    """Examen 1 (salle 1, prof 1) et examen 2 annulé au même créneau; examen 3 le lendemain"""
+    examens = examens_df([
+        {'id': 1, 'module_id': 10, 'nb_inscrits': 50},
+        {'id': 2, 'module_id': 11, 'statut': 'annule'},
+        {'id': 3, 'module_id': 12, 'date_examen': JOUR + timedelta(days=1), 'lieu_id': 2,
+         'prof_surveillant_id': 2},
+    ])
+    inscriptions = pd.DataFrame({'etudiant_id': [100, 100, 100, 101], 'module_id': [10, 11, 12, 12]})
+    engine = ConflictEngine(1).build(examens, inscriptions, lieux, professeurs)
+    monkeypatch.setattr(validation, 'get_conflict_engine', lambda session_id: engine)
+    return engine
+
+
+def types(conflits):
+    return sorted((c['type'], c['examen_id']) for c in conflits)
+
+
+def test_deplacement_sur_un_creneau_occupe(engine):
+    conflits = validation.ScheduleValidator(1).check_update(3, date_examen=JOUR, lieu_id=1, prof_surveillant_id=1)
+    
+    assert types(conflits) == [('etudiants', 1), ('salle', 1), ('surveillant', 1)]
+    assert [c['bloquant'] for c in conflits if c['type'] in ('salle', 'surveillant')] == [True, True]
+
+
+def test_examen_annule_ignore(engine):
+    engine.move_exam(1, statut='annule')
+    
+    assert validation.ScheduleValidator(1).check_update(3, date_examen=JOUR, lieu_id=1) == []
+
+
+def test_creneau_sans_chevauchement(engine):
+    conflits = validation.ScheduleValidator(1).check_update(3, date_examen=JOUR, heure_debut=time(14), lieu_id=1)
+    
+    assert types(conflits) == [('etudiants', 1)]
+
+
+def test_index_suit_les_deplacements(engine):
+    engine.move_exam(1, date_examen=JOUR + timedelta(days=1), heure_debut=time(14))
+    
+    assert validation.ScheduleValidator(1).check_update(3, lieu_id=1, heure_debut=time(14)) != []
+    assert validation.ScheduleValidator(1).check_update(3, date_examen=JOUR, lieu_id=1) == []
+
+
+def test_capacite(engine):
+    assert validation.ScheduleValidator(1).check_update(1, lieu_id=1) == []
+    assert [c['type'] for c in validation.ScheduleValidator(1).check_update(1, lieu_id=2)] == ['capacite']
+
+
+def test_force_ne_leve_pas_les_chevauchements(engine, monkeypatch):
+    ecrits = []
+    monkeypatch.setattr(db, 'update_exam', lambda exam_id, *args, **changes: ecrits.append(exam_id) or True)
+    
+    refus = validation.update_exam_checked(3, session_id=1, force=True, date_examen=JOUR, lieu_id=1)
+    assert not refus['success'] and ecrits == []
+    
+    accepte = validation.update_exam_checked(3, session_id=1, force=True, date_examen=JOUR, heure_debut=time(14))
+    assert accepte['success'] and ecrits == [3]